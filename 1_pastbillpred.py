@@ -1,9 +1,10 @@
 import streamlit as st
 import pandas as pd
 import re
-import pdfplumber
 from streamlit_geolocation import streamlit_geolocation
 from datetime import datetime, timedelta
+from invoice_parser import ingest_invoices
+from purchase_history import format_amount, item_key, purchase_history_for
 
 st.set_page_config(
     page_title="Grocery Cart Compare",
@@ -98,83 +99,44 @@ preferences = show_preferences()
 st.session_state.preferences = preferences
 
 # 📦 PDF Parsing Utilities
-def parse_weight_unit(text):
-    match = re.search(r'(\d+(?:\.\d+)?)\s*(kg|g|ml|l|L)\b', text, re.IGNORECASE)
-    if match:
-        value = float(match.group(1))
-        unit = match.group(2).lower()
-        cleaned = re.sub(r',?\s*\d+(?:\.\d+)?\s*(kg|g|ml|l|L)\b', '', text, flags=re.IGNORECASE).strip().rstrip(',')
-        return value, unit, cleaned
-    return None, None, text.strip().rstrip(',')
-
-def extract_items_from_invoice(uploaded_file):
-    items = []
-    try:
-        with pdfplumber.open(uploaded_file) as pdf:
-            page = pdf.pages[0]
-            text = page.extract_text()
-            lines = text.split('\n')
-
-            start, end = None, None
-            for i, line in enumerate(lines):
-                if line.strip().startswith('FOOD ITEMS'):
-                    start = i + 1
-                if line.strip().startswith('Summary'):
-                    end = i
-                    break
-
-            if start is not None and end is not None:
-                for line in lines[start:end]:
-                    if not line.strip() or line.strip().startswith(('S. No', 'Item')):
-                        continue
-
-                    m = re.match(r'\s*\d+\s+(.+?)\s+\d{8,}\s+(\d+)\s+', line)
-                    if m:
-                        item_full, qty = m.groups()
-                        qty = int(qty)
-                        value, unit, name = parse_weight_unit(item_full)
-                        brand = extract_brand(name)
-                        name_cleaned = remove_brand_from_name(name, brand)
-                        quantity = f"{int(value)} {unit}" if value and unit else str(qty)
-                        items.append({
-                            "product_title": name_cleaned,
-                            "brand": brand,
-                            "quantity": quantity,
-                            "lock_brand": False,
-                            "lock_qty": False
-                        })
-    except Exception as e:
-        st.error(f"Error processing PDF: {e}")
-        return pd.DataFrame(columns=["product_title", "brand", "quantity", "lock_brand", "lock_qty"])
-
-    df = pd.DataFrame(items)
-    df = df.drop_duplicates(subset=["product_title"])
-    return df
-
-def extract_brand(name):
-    match = re.search(r'by\s+(.+?)(?:,|$)', name, re.IGNORECASE)
-    return match.group(1).strip() if match else name.split()[0] if name else ""
-
-def remove_brand_from_name(name, brand):
-    name = re.sub(r'by\s+.+?(,|$)', '', name, flags=re.IGNORECASE).strip()
-    return name[len(brand):].strip(" ,") if name.lower().startswith(brand.lower()) else name.strip()
+ITEM_COLUMNS = ["product_title", "brand", "quantity", "lock_brand", "lock_qty"]
+
+def extract_items_from_invoices(uploaded_files):
+    """Parse uploaded invoices in parallel, reporting each file as it completes.
+
+    Each parsed invoice is also recorded in the purchase history; invoices
+    recorded before (e.g. on a rerun) are skipped by their content hash.
+    """
+    frames = []
+    history = purchase_history_for(st)
+    progress = st.progress(0.0, text="🔍 Processing invoices...")
+    files = [(file.name, file.getvalue()) for file in uploaded_files]
+    for done, (name, key, items, error) in enumerate(ingest_invoices(files), start=1):
+        if error is not None:
+            st.error(f"Error processing PDF {name}: {error}")
+        else:
+            history.add_invoice(key, items, source=name)
+            frames.append(pd.DataFrame(items, columns=ITEM_COLUMNS))
+        progress.progress(done / len(files), text=f"🔍 Processed {done}/{len(files)} invoices")
+    progress.empty()
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ITEM_COLUMNS)
 
 # 🧾 Main UI Logic
 st.title("🧾 Upload Grocery Bills")
 
+# Subscription labels shown here -> platform names used by the compare pages
+SUBSCRIPTION_PLATFORMS = {"Swiggy": "Swiggy", "Zepto": "Zepto", "Big Basket": "Bigbasket", "Blinkit": "Blinkit"}
+
 platforms = st.multiselect(
     "🔍 Do you have any Platform Subscriptions that Eliminate Delivery Fee?",
-    ["Swiggy", "Zepto", "Big Basket", "Blinkit"]
+    list(SUBSCRIPTION_PLATFORMS)
 )
+st.session_state.subscriptions = [SUBSCRIPTION_PLATFORMS[p] for p in platforms]
 
 uploaded_files = st.file_uploader("Upload Invoice PDFs", type=["pdf"], accept_multiple_files=True)
 
 if uploaded_files:
-    with st.spinner("🔍 Processing invoices..."):
-        all_items = pd.concat(
-            [extract_items_from_invoice(file) for file in uploaded_files],
-            ignore_index=True
-        )
+    all_items = extract_items_from_invoices(uploaded_files)
 
     if not all_items.empty:
         st.success(f"✅ Extracted {len(all_items)} unique items.")
@@ -246,12 +208,30 @@ if uploaded_files:
             st.markdown("---")
             st.subheader("📊 Monthly Estimation")
             monthly_multiplier = st.slider("How many weeks worth of groceries is this?", 1, 4, 1)
-            
-            if monthly_multiplier > 1:
+            forecasts = purchase_history_for(st).forecast(horizon_days=7 * monthly_multiplier)
+            forecast_by_item = {f['item_key']: f for f in forecasts}
+
+            if forecasts:
+                st.markdown("#### 📈 Forecast from your purchase history")
+                st.dataframe(pd.DataFrame([{
+                    "Product": f['product_title'],
+                    "Brand": f['brand'],
+                    "Purchases": f['purchases'],
+                    "Last bought": f['last_purchase'],
+                    "Next purchase": f['next_purchase'] or "—",
+                    "Per purchase": format_amount(round(f['amount_per_purchase'], 1), f['unit']),
+                    f"Next {monthly_multiplier} week(s)": format_amount(round(f['expected_amount'], 1), f['unit']),
+                } for f in forecasts]), hide_index=True)
+
+            if monthly_multiplier > 1 or any(f['next_purchase'] for f in forecasts):
                 monthly_items = []
                 for item in st.session_state.cart_items:
                     monthly_item = item.copy()
-                    if 'g' in item['quantity'].lower():
+                    forecast = forecast_by_item.get(item_key(item['product_title'], item['brand']))
+                    if forecast and forecast['next_purchase'] and not item['lock_qty']:
+                        # Bought at least twice: use the observed consumption rate
+                        monthly_item['quantity'] = format_amount(round(forecast['expected_amount']), forecast['unit'])
+                    elif 'g' in item['quantity'].lower():
                         qty = float(re.search(r'\d+', item['quantity']).group())
                         monthly_item['quantity'] = f"{int(qty * monthly_multiplier)}g"
                     monthly_items.append(monthly_item)
@@ -0,0 +1,75 @@
+"""Cart-split optimizer: solve time and savings over the best single platform.
+
+Each snapshot is turned into one cart item whose offers are the cheapest
+per-gram product on every platform, as page 2 would pick them. Carts of
+several sizes are sampled from those items; each is solved with and
+without an order limit, and compared with what page 3 used to suggest:
+the single platform with the lowest item total (fees added afterwards).
+
+Usage (from the repository root):
+    python -m benchmarks.bench_cart_optimizer
+"""
+import random
+import time
+
+from benchmarks.bench_ranking import load_page
+from benchmarks.corpus import load_snapshots
+from cart_optimizer import optimize_cart, order_fee
+from ranking import top_per_platform
+
+CART_SIZES = (5, 10, 25, 100)
+SAMPLES = 20
+
+
+def snapshot_offers(page):
+    platforms = list(page.PLATFORM_CONFIG)
+    offers = []
+    for data in load_snapshots().values():
+        if not (isinstance(data, list) and all(isinstance(p, dict) and 'data' in p for p in data)):
+            continue
+        top = top_per_platform(page.process_platform_data(data), platforms)
+        item_offers = [items[0] for items in top.values() if items[0]['price'] > 0]
+        if item_offers:
+            offers.append(item_offers)
+    return offers
+
+
+def single_platform_total(cart):
+    """Page 3's former pick: cheapest platform carrying every item, plus its fee"""
+    totals = {}
+    for platform in {offer['platform'] for offers in cart.values() for offer in offers}:
+        prices = [min((o['price'] for o in offers if o['platform'] == platform), default=None)
+                  for offers in cart.values()]
+        if None not in prices:
+            totals[platform] = sum(prices) + order_fee(platform, sum(prices))
+    return min(totals.values(), default=None)
+
+
+def main():
+    page = load_page()
+    delivery_times = {p: config['delivery_time'] for p, config in page.PLATFORM_CONFIG.items()}
+    offers = snapshot_offers(page)
+    rng = random.Random(0)
+    print(f"{len(offers)} snapshot items, {SAMPLES} carts per size")
+
+    for size in CART_SIZES:
+        for max_orders in (2, None):
+            timings, savings, methods = [], [], set()
+            for _ in range(SAMPLES):
+                cart = {f"item{i}": rng.choice(offers) for i in range(size)}
+                start = time.perf_counter()
+                result = optimize_cart(cart, delivery_times, max_orders=max_orders)
+                timings.append(time.perf_counter() - start)
+                methods.add(result['method'])
+                single = single_platform_total(cart)
+                if single:
+                    savings.append(1 - result['total'] / single)
+            label = f"{size} items, max_orders={max_orders}"
+            saving = f"{sum(savings) / len(savings) * 100:5.1f}%" if savings else "  n/a"
+            print(f"{label:<28} mean {sum(timings) / len(timings) * 1e3:7.2f} ms"
+                  f"  max {max(timings) * 1e3:7.2f} ms  saving vs one platform {saving}"
+                  f"  ({'/'.join(sorted(methods))})")
+
+
+if __name__ == "__main__":
+    main()
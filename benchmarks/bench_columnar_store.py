@@ -0,0 +1,70 @@
+"""Load time and Python heap use per snapshot: raw JSON vs the columnar store.
+
+Each snapshot is loaded with ``json.load`` of the original file, with the
+store's ``platform_data`` (the nested shape the compare page consumes) and
+with a price-only column read. Store reads are timed both cold (store
+reopened for every file) and with the store already open, as it is in a
+running Streamlit process. Memory-mapped column pages are file-backed and do
+not count towards the Python heap. The store is built into a temporary
+directory, leaving the app's own store under ``data/`` untouched.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_columnar_store
+"""
+import json
+import tempfile
+import tracemalloc
+
+from benchmarks.corpus import DATA_DIR, best_of, snapshot_paths
+from columnar_store import ColumnarSnapshotStore, build_store
+
+
+def measure(fn, repeat=5):
+    """Best time over ``repeat`` runs, and peak traced heap of one run"""
+    elapsed = best_of(fn, repeat)
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as store_dir:
+        build_store(str(DATA_DIR), store_dir)
+        run(store_dir)
+
+
+def run(store_dir):
+    paths = snapshot_paths()
+
+    store = ColumnarSnapshotStore(store_dir)
+    price_columns = ('platform', 'price', 'amount')
+
+    totals = {}
+    for path in paths:
+        for label, fn in (
+            ('json.load', lambda: load_json(path)),
+            ('platform_data, cold', lambda: ColumnarSnapshotStore(store_dir).platform_data(path.name)),
+            ('platform_data, open', lambda: store.platform_data(path.name)),
+            ('price columns, cold', lambda: ColumnarSnapshotStore(store_dir).columns(price_columns, path.name)),
+            ('price columns, open', lambda: store.columns(price_columns, path.name)),
+        ):
+            elapsed, peak = measure(fn)
+            total = totals.setdefault(label, [0.0, 0])
+            total[0] += elapsed
+            total[1] = max(total[1], peak)
+
+    print(f"{len(paths)} snapshots")
+    for label, (elapsed, peak) in totals.items():
+        print(f"{label:<22} {elapsed * 1e3:8.2f} ms total  {peak / 1024:9.1f} KiB max peak heap per file")
+
+
+if __name__ == "__main__":
+    main()
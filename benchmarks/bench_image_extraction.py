@@ -0,0 +1,66 @@
+"""Per-item cost of product image extraction, BeautifulSoup vs image_extraction.
+
+The stored snapshots keep only the ``images`` array, so each item gets a
+product card rebuilt in the shape the QuickCompare API returns (platform
+icon first, then the product image) before both extractors run over it.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_image_extraction
+"""
+from html import escape
+
+from bs4 import BeautifulSoup
+
+from benchmarks.corpus import best_of, iter_items, load_snapshots, report
+from image_extraction import PRODUCT_IMAGE_CLASS, extract_image_from_html
+
+CARD_TEMPLATE = (
+    '<div class="flex flex-col rounded-lg border p-2">'
+    '<div class="flex items-center gap-1"><img class="h-4 w-4 rounded" src="{icon}" alt="{platform}">'
+    '<span class="text-xs">{sla}</span></div>'
+    '<a href="{deeplink}" target="_blank" rel="noopener">'
+    '<img class="{image_class}" src="{image}" alt="{name}" loading="lazy"></a>'
+    '<p class="line-clamp-2 text-sm font-medium">{name}</p>'
+    '<div class="flex justify-between"><span>{quantity}</span>'
+    '<span class="font-semibold">&#8377;{price}</span></div></div>'
+)
+
+
+def bs4_extract_image_from_html(html_snippet):
+    """The original per-item implementation"""
+    soup = BeautifulSoup(html_snippet, 'html.parser')
+    img_tag = soup.find('img', class_=PRODUCT_IMAGE_CLASS)
+    return img_tag['src'] if img_tag and img_tag.get('src') else ""
+
+
+def build_card(item):
+    platform = item.get('platform') or {}
+    return CARD_TEMPLATE.format(
+        icon=escape(platform.get('icon', '')),
+        platform=escape(platform.get('name', '')),
+        sla=escape(platform.get('sla', '')),
+        deeplink=escape(item.get('deeplink', '')),
+        image_class=PRODUCT_IMAGE_CLASS,
+        image=escape(next(iter(item.get('images', [])), '')),
+        name=escape(item.get('name', '')),
+        quantity=escape(str(item.get('quantity', ''))),
+        price=item.get('offer_price', ''),
+    )
+
+
+def main():
+    cards = [build_card(item) for item in iter_items(load_snapshots()) if 'name' in item]
+    mismatches = sum(
+        bs4_extract_image_from_html(card) != extract_image_from_html(card) for card in cards
+    )
+    print(f"{len(cards)} items, {mismatches} mismatches between implementations")
+
+    before = best_of(lambda: [bs4_extract_image_from_html(card) for card in cards], repeat=3)
+    after = best_of(lambda: [extract_image_from_html(card) for card in cards])
+    report('BeautifulSoup (before)', before, len(cards))
+    report('image_extraction (after)', after, len(cards))
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Invoice ingestion: serial parsing vs the process pool vs the content-hash cache.
+
+The repository ships no invoices, so point this at a directory of invoice
+PDFs (e.g. a year of exported bills). "Serial" is the page's former list
+comprehension over files; "pool" is ``invoice_parser.ingest_invoices`` on
+a cold cache, measured after the pool has started (it lives for the whole
+server process); "cached" is the same upload again, as on a rerun.
+
+For the largest file, peak traced memory of the page-at-a-time parser is
+compared with extracting every page's text first and parsing it at once
+(tracemalloc slows both down several times, so only their ratio matters).
+
+Usage (from the repository root):
+    python -m benchmarks.bench_invoice_ingestion path/to/invoices
+"""
+import io
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import pdfplumber
+
+import invoice_parser
+from invoice_parser import ingest_invoices, parse_invoice_bytes, parse_invoice_text
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def all_pages_at_once(content):
+    with pdfplumber.open(io.BytesIO(content)) as pdf:
+        text = '\n'.join(page.extract_text() or '' for page in pdf.pages)
+    return parse_invoice_text(text)
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit(__doc__.split('Usage')[1].strip(' :\n'))
+    files = [(path.name, path.read_bytes()) for path in sorted(Path(sys.argv[1]).glob('*.pdf'))]
+    if not files:
+        sys.exit(f"No PDFs in {sys.argv[1]}")
+
+    # Start the workers (and their imports) outside the measurement
+    list(invoice_parser.get_pool().map(len, [b''] * invoice_parser.INVOICE_PARSE_WORKERS))
+
+    serial = timed(lambda: [parse_invoice_bytes(content) for _, content in files])
+    invoice_parser.INVOICE_CACHE.clear()
+    pool = timed(lambda: list(ingest_invoices(files)))
+    cached = timed(lambda: list(ingest_invoices(files)))
+
+    print(f"{len(files)} invoices, {invoice_parser.INVOICE_PARSE_WORKERS} workers")
+    for label, seconds in (('serial', serial), ('process pool', pool), ('cached (rerun)', cached)):
+        print(f"{label:<16} {seconds * 1e3:9.2f} ms total  {seconds / len(files) * 1e3:8.2f} ms/invoice")
+    print(f"speedup: pool {serial / pool:.1f}x, cached {serial / cached:.0f}x")
+
+    name, content = max(files, key=lambda file: len(file[1]))
+    with pdfplumber.open(io.BytesIO(content)) as pdf:
+        pages = len(pdf.pages)
+    items = len(parse_invoice_bytes(content))
+    print(f"largest: {name}, {pages} pages, {items} items")
+    for label, fn in (('all pages at once', all_pages_at_once), ('page at a time', parse_invoice_bytes)):
+        print(f"{label:<18} peak {peak_memory(lambda: fn(content)) / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
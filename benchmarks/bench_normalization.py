@@ -0,0 +1,118 @@
+"""Name, quantity and price normalization over the snapshot corpus, before vs after.
+
+"Before" is the per-keyword ``re.sub`` loop and split-based parsers the
+compare pages used to carry (minus their Streamlit warnings); "after" is
+normalization.py, measured both with cold memo caches and warm ones (the
+common case: the same names recur across platforms and Streamlit reruns).
+
+Usage (from the repository root):
+    python -m benchmarks.bench_normalization
+"""
+import re
+
+import normalization
+from benchmarks.corpus import best_of, iter_items, load_snapshots, report
+from normalization import EXCLUDE_KEYWORDS, clean_product_name, get_price, parse_quantity
+
+
+def legacy_clean_product_name(name, exclude_keywords):
+    name_clean = name
+    for kw in exclude_keywords:
+        name_clean = re.sub(r'\b' + re.escape(kw) + r'\b', '', name_clean, flags=re.IGNORECASE)
+        name_clean = re.sub(re.escape(kw), '', name_clean, flags=re.IGNORECASE)
+    name_clean = re.sub(r'\s+', ' ', name_clean)
+    return name_clean.strip()
+
+
+def legacy_parse_quantity(quantity_str):
+    try:
+        if not quantity_str or not isinstance(quantity_str, str):
+            return None
+        multiplier = 1.0
+        if 'x' in quantity_str:
+            parts = quantity_str.lower().split('x')
+            if len(parts) != 2:
+                return None
+            multiplier = float(parts[1].strip()) if parts[1].strip() else 1.0
+            base_str = parts[0].strip()
+        else:
+            base_str = quantity_str.strip()
+        if 'kg' in base_str:
+            grams = float(re.sub(r'[^\d.]', '', base_str)) * 1000
+        else:
+            grams = float(re.sub(r'[^\d.]', '', base_str))
+        total_grams = grams * multiplier
+        return total_grams if total_grams > 0 else None
+    except Exception:
+        return None
+
+
+def legacy_get_price(item):
+    for key in ['offer_price', 'unit_level_price', 'mrp']:
+        try:
+            raw_value = item.get(key)
+            if raw_value is None:
+                continue
+            price_str = str(raw_value).strip()
+            if not any(c.isdigit() for c in price_str):
+                continue
+            price = float(re.sub(r'[^\d.]', '', price_str))
+            if price <= 0:
+                continue
+            return price
+        except Exception:
+            continue
+    return None
+
+
+def legacy_pass(items):
+    exclude_keywords = list(EXCLUDE_KEYWORDS)
+    return [
+        (legacy_clean_product_name(item['name'].strip().lower(), exclude_keywords),
+         legacy_parse_quantity(item.get('quantity')),
+         legacy_get_price(item))
+        for item in items
+    ]
+
+
+def new_pass(items):
+    return [
+        (clean_product_name(item['name'].strip().lower()),
+         parse_quantity(item.get('quantity')),
+         get_price(item))
+        for item in items
+    ]
+
+
+def clear_caches():
+    normalization._clean_product_name.cache_clear()
+    normalization.parse_quantity_unit.cache_clear()
+    normalization.unit_rate_price.cache_clear()
+
+
+def cold_pass(items):
+    clear_caches()
+    return new_pass(items)
+
+
+def main():
+    items = [item for item in iter_items(load_snapshots()) if 'name' in item]
+    before, after = legacy_pass(items), cold_pass(items)
+    name_diffs = sum(b[0] != a[0] for b, a in zip(before, after))
+    qty_diffs = sum(b[1] != a[1] for b, a in zip(before, after))
+    newly_parsed = sum(b[1] is None and a[1] is not None for b, a in zip(before, after))
+    price_diffs = sum(b[2] != a[2] for b, a in zip(before, after))
+    print(f"{len(items)} items: {name_diffs} name differences, {qty_diffs} quantity differences "
+          f"({newly_parsed} quantities the old parser rejected), {price_diffs} price differences")
+
+    legacy = best_of(lambda: legacy_pass(items), repeat=3)
+    cold = best_of(lambda: cold_pass(items))
+    warm = best_of(lambda: new_pass(items))
+    report('legacy (before)', legacy, len(items))
+    report('normalization, cold cache', cold, len(items))
+    report('normalization, warm cache', warm, len(items))
+    print(f"speedup: {legacy / cold:.1f}x cold, {legacy / warm:.1f}x warm")
+
+
+if __name__ == "__main__":
+    main()
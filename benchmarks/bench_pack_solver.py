@@ -0,0 +1,63 @@
+"""Pack-combination solver over the snapshot corpus: solve time and savings.
+
+Every snapshot is treated as one cart line and solved for a few billed
+quantities on every platform (with the quantity parser's memo cleared, as
+for a new cart). The result is compared with what page 2 did before: take the cheapest per-gram pack
+and buy as many of it as the quantity needs.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_pack_solver
+"""
+import math
+
+from benchmarks.bench_ranking import load_page
+from benchmarks.corpus import best_of, load_snapshots, report
+from normalization import parse_quantity_unit
+from pack_solver import combinations_per_platform, target_quantity
+from ranking import top_per_platform
+
+QUANTITIES = ('500 g', '1 kg', '2.5 kg', '5 kg', '1 l')
+
+
+def per_gram_multiples(record, quantity):
+    """Price of covering ``quantity`` with copies of one record, or None"""
+    target, parsed = target_quantity(quantity), parse_quantity_unit(record['quantity'])
+    if not target or not parsed or parsed[1] != target[1] or record['price'] <= 0:
+        return None
+    return math.ceil(target[0] / parsed[0]) * record['price']
+
+
+def main():
+    page = load_page()
+    platforms = list(page.PLATFORM_CONFIG)
+    carts = [page.process_platform_data(data) for data in load_snapshots().values()
+             if isinstance(data, list) and all(isinstance(p, dict) and 'data' in p for p in data)]
+    lines = len(carts) * len(QUANTITIES)
+
+    def solve_all():
+        return [combinations_per_platform(records, quantity, platforms)
+                for records in carts for quantity in QUANTITIES]
+
+    def cold():
+        parse_quantity_unit.cache_clear()
+        return solve_all()
+
+    report('per cart line', best_of(cold), lines, unit='line')
+
+    compared, saved, cheaper = 0, 0.0, 0
+    for records in carts:
+        top = top_per_platform(records, platforms)
+        for quantity in QUANTITIES:
+            for platform, record in combinations_per_platform(records, quantity, platforms).items():
+                baseline = per_gram_multiples(top[platform][0], quantity) if platform in top else None
+                if baseline is None:
+                    continue
+                compared += 1
+                saved += baseline - record['price']
+                cheaper += record['price'] < baseline - 1e-9
+    print(f"{compared} platform/quantity pairs vs per-gram pick in multiples: "
+          f"{cheaper} cheaper, mean saving Rs {saved / max(compared, 1):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Price history index: ingestion and range queries vs re-scanning raw snapshots.
+
+The corpus holds one snapshot per product, so a synthetic history is made
+by re-emitting every snapshot every other day for ``DAYS`` days with
+jittered prices. The index is built from scratch, then topped up with one
+more day (the incremental path). "Lowest price over 30 days" for every
+product is then answered from the index and, as a baseline, by opening and
+parsing every raw snapshot file in the window.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_price_history
+"""
+import json
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from benchmarks.corpus import best_of, load_snapshots
+from price_history import PriceHistory, snapshot_prices
+from snapshot_index import parse_snapshot_name
+
+DAYS = 90
+START = datetime(2026, 1, 1)
+
+
+def emit(directory, snapshots, day, rng):
+    for filename, data in snapshots.items():
+        slug = parse_snapshot_name(filename)[0]
+        for platform_data in data if isinstance(data, list) else []:
+            for item in platform_data.get('data', []) if isinstance(platform_data, dict) else []:
+                try:
+                    item['offer_price'] = str(round(float(item.get('offer_price') or item.get('mrp')) * rng.uniform(0.85, 1.1)))
+                except (TypeError, ValueError):
+                    pass
+        stamp = (START + timedelta(days=day, hours=rng.randint(6, 22))).strftime('%Y%m%d_%H%M%S')
+        with open(Path(directory) / f'qc_{slug}_{stamp}.json', 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+
+def scan_lowest(directory, product, since):
+    """Lowest price per SKU of one product since ``since``, from the raw files"""
+    lowest = {}
+    for path in Path(directory).glob(f'qc_{product}_*.json'):
+        if parse_snapshot_name(path.name)[1] < since:
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for key, listing in snapshot_prices(json.load(f)).items():
+                lowest[key] = min(lowest.get(key, listing['price']), listing['price'])
+    return lowest
+
+
+def main():
+    rng = random.Random(0)
+    snapshots = load_snapshots()
+    products = sorted({parse_snapshot_name(name)[0] for name in snapshots})
+    with tempfile.TemporaryDirectory() as tmp:
+        for day in range(0, DAYS, 2):
+            emit(tmp, snapshots, day, rng)
+        history = PriceHistory(str(Path(tmp) / 'price_history.sqlite'))
+        start = time.perf_counter()
+        files = history.ingest(tmp)
+        print(f"full ingestion: {files} snapshots in {time.perf_counter() - start:.2f} s")
+        emit(tmp, snapshots, DAYS, rng)
+        start = time.perf_counter()
+        files = history.ingest(tmp)
+        print(f"incremental ingestion: {files} snapshots in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+        as_of = (START + timedelta(days=DAYS)).date()
+        since = (as_of - timedelta(days=30)).isoformat()
+        indexed = best_of(lambda: [history.lowest_price(p, days=30, as_of=as_of) for p in products])
+        scanned = best_of(lambda: [scan_lowest(tmp, p, since) for p in products], repeat=2)
+        print(f"30-day low for {len(products)} products: index {indexed * 1e3:.1f} ms, "
+              f"raw scan {scanned * 1e3:.1f} ms ({scanned / indexed:.0f}x)")
+        rolling = best_of(lambda: [history.rolling(p, 30) for p in products])
+        print(f"rolling 30-day min/median for {len(products)} products: {rolling * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Product matcher over the snapshot corpus: query latency and match recall.
+
+Every listing in the corpus (name and brand) is indexed once; top-10
+searches are then timed for queries made from listing names, as typed and
+with one character dropped from each longer word. Recall is the share of
+queries whose source listing (or one with the same name) is among the top
+10, next to the share the live compare page's former exact substring test
+would have kept. Short queries of common words tie across many listings,
+so recall stays below 100% even as typed.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_product_matcher
+"""
+import random
+import time
+
+from benchmarks.corpus import iter_items, load_snapshots
+from product_matcher import ProductMatcher, tokenize
+
+QUERIES = 500
+
+
+def drop_a_letter(word, rng):
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1:]
+
+
+def main():
+    rng = random.Random(0)
+    items = [item for item in iter_items(load_snapshots()) if isinstance(item.get('name'), str)]
+    start = time.perf_counter()
+    matcher = ProductMatcher()
+    for i, item in enumerate(items):
+        matcher.add(i, item['name'], item.get('brand'))
+    print(f"indexed {len(matcher)} listings in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    # Two or three consecutive words of a listing's name, as a shopper would type them
+    queries = []
+    for i in rng.sample(range(len(items)), QUERIES):
+        words = [w for w in items[i]['name'].lower().split() if tokenize(w)]
+        if len(words) >= 2:
+            size = min(len(words), rng.choice((2, 3)))
+            first = rng.randrange(len(words) - size + 1)
+            queries.append((i, ' '.join(words[first:first + size])))
+
+    for label, typo in (('as typed', False), ('with typos', True)):
+        texts = [(i, ' '.join(drop_a_letter(w, rng) for w in q.split()) if typo else q) for i, q in queries]
+        matcher.search('warm up', k=10)
+        start = time.perf_counter()
+        results = [matcher.search(q, k=10) for _, q in texts]
+        elapsed = time.perf_counter() - start
+        # The same product is often listed on several platforms under one name
+        found = sum(items[i]['name'] in {items[doc]['name'] for doc, _, _ in hits}
+                    for (i, _), hits in zip(texts, results))
+        substring = sum(q in items[i]['name'].lower() for i, q in texts)
+        print(f"{label:<11} top-10 search {elapsed / len(texts) * 1e6:7.1f} us/query, "
+              f"source in top 10: {found / len(texts):.0%}, substring match: {substring / len(texts):.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Purchase history: cost of adding one invoice as the history grows.
+
+A synthetic household buys from a fixed basket every week (the repository
+ships no invoices). After every ``STEP`` invoices the next one is timed
+twice: added incrementally (``PurchaseHistory.add_invoice``), and as a full
+recompute would do it, replaying every item's rows from the start. The
+incremental cost should stay flat while the recompute grows with history.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_purchase_history
+"""
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from purchase_history import PurchaseHistory
+
+BASKET = 60
+INVOICES = 520
+STEP = 104
+PACKS = ('200 g', '500 g', '1 kg', '1 l', '6')
+
+
+def weekly_invoice(week, rng):
+    day = date(2015, 1, 5) + timedelta(days=7 * week + rng.randint(-2, 2))
+    return [{
+        'product_title': f'Item {i}', 'brand': f'Brand {i % 7}', 'quantity': PACKS[i % len(PACKS)],
+        'units': rng.randint(1, 3), 'price': float(rng.randint(20, 400)), 'invoice_date': day.isoformat(),
+    } for i in rng.sample(range(BASKET), BASKET // 2)]
+
+
+def full_recompute(history):
+    with history._connect() as conn:
+        keys = [row[0] for row in conn.execute("SELECT DISTINCT item_key FROM purchases")]
+        for key in keys:
+            history._rebuild_forecast(conn, key)
+
+
+def main():
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        history = PurchaseHistory(str(Path(tmp) / 'history.sqlite'))
+        print(f"{'invoices':>8} {'incremental add':>16} {'full recompute':>16}")
+        for week in range(INVOICES):
+            items = weekly_invoice(week, rng)
+            start = time.perf_counter()
+            history.add_invoice(f'invoice-{week}', items)
+            added = time.perf_counter() - start
+            if week % STEP == 0 or week == INVOICES - 1:
+                start = time.perf_counter()
+                full_recompute(history)
+                recomputed = time.perf_counter() - start
+                print(f"{week + 1:>8} {added * 1e3:13.2f} ms {recomputed * 1e3:13.2f} ms")
+        start = time.perf_counter()
+        forecasts = history.forecast(horizon_days=30)
+        print(f"forecast of {len(forecasts)} items: {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
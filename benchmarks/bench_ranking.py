@@ -0,0 +1,114 @@
+"""Candidate processing and per-platform ranking: per-dict loop vs columnar pipeline.
+
+"Before" is the webscrap page's former loop (a dict per item, the
+quadratic platform scan, then ``sorted`` per platform); "after" is the page's
+current ``process_platform_data`` plus ``ranking.top_per_platform``. Both use
+the same normalization functions, so only the pipeline shape differs. The
+corpus is processed snapshot by snapshot, as the page does per cart item,
+and again as one concatenated response.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_ranking
+"""
+import importlib.util
+import logging
+from collections import defaultdict
+
+from benchmarks.corpus import REPO_ROOT, best_of, load_snapshots, report
+from normalization import clean_product_name, get_price, parse_quantity
+from ranking import top_per_platform
+
+
+def load_page():
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    spec = importlib.util.spec_from_file_location(
+        'compare_prices_webscrap', REPO_ROOT / 'pages' / '2_compare_prices_webscrap.py'
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_process(data, config, first_http_image):
+    processed = []
+    platform_items = defaultdict(list)
+    platform_top_items = {}
+    for platform in data:
+        for item in platform.get('data', []):
+            try:
+                image_url = first_http_image(item)
+                platform_name = item.get('platform', {}).get('name', '').title()
+                if not platform_name or platform_name not in config:
+                    continue
+                price = get_price(item) or 0.0
+                quantity = item.get('quantity', '')
+                grams = parse_quantity(quantity) or 1
+                name = clean_product_name(item.get('name', '').strip().lower())
+                price_per_g = float(price / grams) if grams and price else 0.0
+                entry = {
+                    'title': name,
+                    'platform': platform_name,
+                    'platform_logo': config[platform_name]['logo'],
+                    'price': price,
+                    'quantity': quantity,
+                    'grams': grams,
+                    'image_url': image_url,
+                    'delivery_time': '1 day' if config[platform_name]['delivery_time'] == 1440 else f"{config[platform_name]['delivery_time']} mins",
+                    'price_per_g': price_per_g
+                }
+                platform_items[platform_name].append(entry)
+                current_top = platform_top_items.get(platform_name, {'price_per_g': float('inf')})
+                if not platform_top_items.get(platform_name) or price_per_g < current_top['price_per_g']:
+                    platform_top_items[platform_name] = entry
+                processed.append(entry)
+            except Exception:
+                continue
+        for platform_name in config:
+            if platform_name not in platform_items:
+                continue
+            if not any(item['platform'] == platform_name for item in processed):
+                processed.append(platform_top_items[platform_name])
+    return processed
+
+
+def legacy_top(results, platforms):
+    groups = defaultdict(list)
+    for item in results:
+        if item['platform'] in platforms:
+            groups[item['platform']].append(item)
+    return {
+        platform: sorted(groups[platform], key=lambda x: x['price_per_g'])[:1]
+        for platform in platforms if groups.get(platform)
+    }
+
+
+def main():
+    page = load_page()
+    config, platforms = page.PLATFORM_CONFIG, list(page.PLATFORM_CONFIG)
+    responses = [data for data in load_snapshots().values()
+                 if isinstance(data, list) and all(isinstance(p, dict) and 'data' in p for p in data)]
+    combined = [platform_data for data in responses for platform_data in data]
+    items = sum(len(p['data']) for p in combined)
+
+    def before(batch):
+        return [legacy_top(legacy_process(data, config, page.first_http_image), platforms) for data in batch]
+
+    def after(batch):
+        return [top_per_platform(page.process_platform_data(data), platforms) for data in batch]
+
+    mismatches = sum(
+        {p: [r['title'] for r in v] for p, v in b.items()} != {p: [r['title'] for r in v] for p, v in a.items()}
+        for b, a in zip(before(responses), after(responses))
+    )
+    print(f"{len(responses)} snapshots, {items} items, {mismatches} snapshots with a different top pick")
+
+    for label, batch in (('per snapshot', responses), ('one combined response', [combined])):
+        legacy = best_of(lambda: before(batch))
+        columnar = best_of(lambda: after(batch))
+        report(f'loop, {label}', legacy, items)
+        report(f'columnar, {label}', columnar, items)
+        print(f"speedup ({label}): {legacy / columnar:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Pricing a cart against a degraded upstream: the compare page's former
+retry loop vs ``resilience.ResilientCaller``.
+
+The former loop retried each lookup at once, up to three times, each with
+the full read timeout. The resilient caller backs off with jitter between
+attempts, spends retries from a shared budget, stops at the cart deadline
+and opens its breaker after repeated failures. Each scenario prices a
+``CART_SIZE``-item cart on ``THREADS`` threads against
+``benchmarks.mock_upstream``:
+
+- healthy: every lookup answers in 20 ms;
+- flaky: 30% of lookups answer 503;
+- failing: every lookup answers 503;
+- hung: no lookup answers within the read timeout.
+
+Timeouts, deadlines, backoff and the breaker cool-down are scaled down
+10x from their defaults so a run takes seconds. Reported per scenario:
+wall time, items priced, and requests the upstream received.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_resilience
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.mock_upstream import MockUpstream
+from resilience import CircuitBreaker, Deadline, ResilientCaller
+from upstream import UpstreamClient
+
+CART_SIZE = 16
+THREADS = 8
+SCALE = 0.1
+READ_TIMEOUT = 10 * SCALE
+QUERIES = ('toor dal', 'sugar', 'tomato ketchup', 'jaggery', 'red chilli powder', 'rice bran oil',
+           'basmati rice', 'moong dal')
+SCENARIOS = (
+    ('healthy', {'latency': 0.02}),
+    ('flaky', {'latency': 0.02, 'error_rate': 0.3}),
+    ('failing', {'latency': 0.02, 'error_rate': 1.0}),
+    ('hung', {'latency': READ_TIMEOUT * 3}),
+)
+
+
+def former_lookup(client, url, params, deadline):
+    """The compare page's loop before the resilience layer"""
+    for attempt in range(3):
+        try:
+            return client.get_json(url, params)
+        except Exception:
+            if attempt == 2:
+                raise
+
+
+def resilient_lookup(caller):
+    def lookup(client, url, params, deadline):
+        return caller.call(client.get_json, url, params, deadline=deadline)
+    return lookup
+
+
+def price_cart(server, lookup):
+    client = UpstreamClient(read_timeout=READ_TIMEOUT, http2=False)
+    params = [{'lat': 19.076, 'lon': 72.8777, 'type': 'groupsearch', 'query': QUERIES[i % len(QUERIES)]}
+              for i in range(CART_SIZE)]
+    deadline = Deadline(30 * SCALE)
+
+    def priced(p):
+        try:
+            lookup(client, server.url, p, deadline)
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        ok = sum(executor.map(priced, params))
+    elapsed = time.perf_counter() - start
+    client.close()
+    return elapsed, ok
+
+
+def main():
+    print(f"{CART_SIZE}-item cart, {THREADS} threads, read timeout {READ_TIMEOUT:.1f}s")
+    for scenario, options in SCENARIOS:
+        for label in ('former loop', 'resilient'):
+            server = MockUpstream(setup_delay=0, **options).start()
+            if label == 'resilient':
+                caller = ResilientCaller(base_delay=2 * SCALE, max_delay=20 * SCALE, request_deadline=12 * SCALE,
+                                         breaker=CircuitBreaker(reset_timeout=30 * SCALE))
+                lookup = resilient_lookup(caller)
+            else:
+                lookup = former_lookup
+            try:
+                elapsed, ok = price_cart(server, lookup)
+            finally:
+                server.stop()
+            print(f"{scenario:<8} {label:<12} {elapsed:6.2f} s  priced {ok:2}/{CART_SIZE}  "
+                  f"upstream requests {server.counts['requests']:3}")
+
+
+if __name__ == "__main__":
+    main()
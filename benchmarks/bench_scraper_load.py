@@ -0,0 +1,137 @@
+"""Load test of the scrape route: the former blocking handler vs the async one.
+
+Both handlers run in this process against local stand-ins: the upstream is
+``benchmarks.mock_upstream`` answering after ``UPSTREAM_MS``, Cosmos DB is
+``benchmarks.mock_cosmos`` taking ``READ_MS`` per point read and
+``WRITE_MS`` per upsert. Every request is a cache miss (each one asks for a
+new location), so it reads Cosmos, calls the upstream and writes the
+result back. The former handler, rebuilt from the sync helpers the batch
+route still uses, runs on a thread pool the size the Python worker uses by
+default, ``min(32, CPUs + 4)``; the async handler runs on one event loop,
+as the worker runs ``async def`` functions.
+
+Closed-loop clients are added step by step; each step runs for
+``STEP_SECONDS`` and reports requests/sec and p95 latency. The summary is
+the best throughput each handler sustained with p95 at or under
+``P95_TARGET_MS``. The stand-ins share this machine's CPUs with the
+handlers. Because Cosmos is mocked, the real async Cosmos client (its
+creation per event loop and its close at loop shutdown) is never
+exercised here; nor is Cosmos network latency beyond the fixed delays.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_scraper_load
+"""
+import asyncio
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import azure.functions as func
+
+import function_app
+import upstream
+from benchmarks import mock_cosmos
+from benchmarks.mock_upstream import MockUpstream
+
+UPSTREAM_MS = 80
+READ_MS = 10
+WRITE_MS = 20
+STEP_SECONDS = 3
+CONCURRENCY = (1, 2, 4, 8, 16, 32, 64)
+P95_TARGET_MS = 300
+SYNC_THREADS = min(32, (os.cpu_count() or 1) + 4)
+QUERIES = ('toor dal', 'sugar', 'tomato ketchup', 'jaggery', 'red chilli powder', 'rice bran oil',
+           'basmati rice', 'moong dal')
+
+_locations = itertools.count()
+
+
+def next_request():
+    """A scrape request for a location no earlier request used"""
+    i = next(_locations)
+    body = {'query': QUERIES[i % len(QUERIES)], 'lat': 12.0 + (i % 1000) * 0.05, 'lon': 70.0 + (i // 1000) * 0.05}
+    return func.HttpRequest(method='POST', url='http://localhost/api/scrape', headers={},
+                            body=json.dumps(body).encode())
+
+
+def former_scraper(req):
+    """The scrape route's body before it went async"""
+    req_body = req.get_json()
+    product_query = req_body.get('query', '').strip()
+    lat = float(req_body.get('lat', 19.0760))
+    lon = float(req_body.get('lon', 72.8777))
+    platforms = req_body.get('platforms') or None
+    cached, stale = function_app.get_cached_results(product_query, lat, lon, platforms)
+    if cached:
+        if stale:
+            function_app.schedule_refresh(product_query, lat, lon, platforms)
+        return func.HttpResponse(json.dumps(function_app.filter_platforms(cached, platforms)))
+    results = function_app.scrape_coalesced(product_query, lat, lon, platforms)
+    return func.HttpResponse(json.dumps(function_app.filter_platforms(results, platforms)))
+
+
+def async_scraper():
+    handlers = {f.get_function_name(): f.get_user_function() for f in function_app.app.get_functions()}
+    return handlers['QuickCompareScraper']
+
+
+async def run_step(call, clients):
+    latencies = []
+    errors = 0
+    stop = time.perf_counter() + STEP_SECONDS
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            response = await call(next_request())
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code != 200 or response.get_body() == b'[]'
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    # Let background Cosmos writes land before the next step
+    while function_app._background_tasks:
+        await asyncio.sleep(0.01)
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[int(0.95 * (len(latencies) - 1))] * 1e3, errors
+
+
+async def load(label, call):
+    print(f"{label}:")
+    await call(next_request())
+    best = None
+    for clients in CONCURRENCY:
+        rps, p95, errors = await run_step(call, clients)
+        print(f"  {clients:3} clients  {rps:7.1f} req/s  p95 {p95:7.1f} ms  {errors} failed")
+        if p95 <= P95_TARGET_MS and (best is None or rps > best[0]):
+            best = (rps, clients)
+        if p95 > 4 * P95_TARGET_MS:
+            break
+    return best
+
+
+async def main():
+    server = MockUpstream(setup_delay=0, latency=UPSTREAM_MS / 1e3).start()
+    upstream.QC_API_URL = server.url
+    mock_cosmos.install(function_app, READ_MS / 1e3, WRITE_MS / 1e3)
+    print(f"upstream {UPSTREAM_MS} ms, Cosmos read {READ_MS} ms / write {WRITE_MS} ms, "
+          f"{STEP_SECONDS} s per step, {os.cpu_count()} CPU(s)")
+    try:
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=SYNC_THREADS) as pool:
+            former = await load(f"former handler, {SYNC_THREADS} threads",
+                                lambda req: loop.run_in_executor(pool, former_scraper, req))
+        current = await load("async handler", async_scraper())
+    finally:
+        server.stop()
+    print(f"best req/s with p95 <= {P95_TARGET_MS} ms:")
+    for label, best in (('former', former), ('async', current)):
+        print(f"  {label:<7} " + (f"{best[0]:7.1f} ({best[1]} clients)" if best else "none"))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
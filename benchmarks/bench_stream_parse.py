@@ -0,0 +1,102 @@
+"""Response parsing: ``json.load`` of the whole body vs ``response_parser``.
+
+The snapshots in ``data/`` were saved without the upstream's HTML card
+snippets, so each item gets a synthetic ``html`` snippet of about 2 KB with
+its product image in it, as live responses carry. Response bodies are built
+by repeating the largest snapshot's groups ``1x`` to ``64x`` and are read
+from a temporary file, as from a socket. For each size the time to a parsed
+result, the time through ``candidate_columns`` (which extracts each item's
+image, a step slimmed items have already paid for), and the peak Python
+heap while parsing (tracemalloc, in a separate run) are reported for the
+parsers below. The peak is split into the parsed result that is kept
+(still allocated when parsing returns) and the parser's own overhead on
+top of it: the kept items necessarily grow with the response, the overhead
+of a streaming parse should not.
+
+- ``json.load``: the former path, the whole payload decoded;
+- ``stream``: ``parse_qc_response`` with ijson, every platform kept;
+- ``stream, 20 min``: the same, keeping only the platforms delivering
+  within 20 minutes (Blinkit, Zepto, Bigbasket);
+- ``load + slim``: ``parse_qc_response`` without ijson installed.
+
+Requires ``ijson`` for the streaming rows.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_stream_parse
+"""
+import json
+import os
+import tempfile
+import tracemalloc
+
+import response_parser
+from benchmarks.corpus import best_of, snapshot_paths
+from image_extraction import PRODUCT_IMAGE_CLASS
+from ranking import candidate_columns
+from response_parser import parse_qc_response
+
+SCALES = (1, 4, 16, 64)
+FAST_PLATFORMS = ('Blinkit', 'Zepto', 'Bigbasket')
+_FILLER = '<span class="text-xs text-gray-500 line-clamp-2">' + 'x' * 120 + '</span>'
+
+
+def with_html(groups):
+    for group in groups:
+        for item in group.get('data', []):
+            image = next(iter(item.get('images') or []), '')
+            item['html'] = (f'<div class="flex flex-col"><img class="{PRODUCT_IMAGE_CLASS}" src="{image}" '
+                            f'alt="{item.get("name", "")}">' + _FILLER * 12 + '</div>')
+    return groups
+
+
+def parse_file(path, parse):
+    with open(path, 'rb') as f:
+        return parse(f)
+
+
+def peak_memory(path, parse):
+    """Peak heap while parsing, the part of it the result still holds, and the item count"""
+    tracemalloc.start()
+    result = parse_file(path, parse)
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, kept, sum(len(group['data']) for group in result)
+
+
+def load_and_slim(f):
+    ijson, response_parser.ijson = response_parser.ijson, None
+    try:
+        return parse_qc_response(f)
+    finally:
+        response_parser.ijson = ijson
+
+
+def main():
+    if response_parser.ijson is None:
+        raise SystemExit("ijson is not installed: pip install ijson")
+    largest = max(snapshot_paths(), key=lambda path: path.stat().st_size)
+    with open(largest, 'r', encoding='utf-8') as f:
+        groups = with_html(json.load(f))
+    parsers = (
+        ('json.load', json.load),
+        ('stream', parse_qc_response),
+        ('stream, 20 min', lambda f: parse_qc_response(f, FAST_PLATFORMS)),
+        ('load + slim', load_and_slim),
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in SCALES:
+            path = os.path.join(tmp, f'response_{scale}.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(groups * scale, f)
+            print(f"{scale:2}x {largest.name}: {os.path.getsize(path) / 1e6:.1f} MB body")
+            for label, parse in parsers:
+                parsed = best_of(lambda: parse_file(path, parse))
+                columns = best_of(lambda: candidate_columns(parse_file(path, parse)))
+                peak, kept, items = peak_memory(path, parse)
+                print(f"    {label:<15} parse {parsed * 1e3:7.1f} ms  to columns {columns * 1e3:7.1f} ms  "
+                      f"peak {peak / 1e6:6.2f} MB = kept {kept / 1e6:6.2f} + parser {(peak - kept) / 1e6:5.2f}  "
+                      f"{items:5} items")
+
+
+if __name__ == "__main__":
+    main()
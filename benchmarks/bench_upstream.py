@@ -0,0 +1,62 @@
+"""Upstream lookups: a bare ``requests.get`` per call vs the shared pooled client.
+
+Runs against ``benchmarks.mock_upstream`` on localhost, which charges
+``SETUP_MS`` per new connection for the DNS/TCP/TLS round trips to the
+real host. Lookups are made one after another and from ``THREADS``
+threads, as the compare page and the batch route do. The mock speaks
+HTTP/1.1 only, so this measures keep-alive pooling; the HTTP/2 path is
+taken against the real host when httpx is installed.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_upstream
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.mock_upstream import MockUpstream
+from upstream import UpstreamClient
+
+SETUP_MS = 60
+LOOKUPS = 48
+THREADS = 8
+QUERIES = ('toor dal', 'sugar', 'tomato ketchup', 'jaggery', 'red chilli powder', 'rice bran oil')
+
+
+def bare_get(url, params):
+    response = requests.get(url, params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+def run(server, get_json, threads):
+    params = [{'lat': 19.076, 'lon': 72.8777, 'type': 'groupsearch', 'query': QUERIES[i % len(QUERIES)]}
+              for i in range(LOOKUPS)]
+    before = dict(server.counts)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda p: get_json(server.url, p), params))
+    elapsed = time.perf_counter() - start
+    assert all(isinstance(r, list) for r in results)
+    return elapsed, server.counts['connections'] - before['connections']
+
+
+def main():
+    server = MockUpstream(setup_delay=SETUP_MS / 1e3).start()
+    try:
+        client = UpstreamClient(http2=False)
+        client.get_json(server.url, {'query': 'warm up'})
+        print(f"{LOOKUPS} lookups, {SETUP_MS} ms simulated connection setup")
+        for threads in (1, THREADS):
+            for label, get_json in (('requests.get', bare_get), ('pooled client', client.get_json)):
+                elapsed, connections = run(server, get_json, threads)
+                print(f"{threads} thread(s), {label:<14} {elapsed * 1e3:8.1f} ms total "
+                      f"{elapsed / LOOKUPS * 1e3:7.2f} ms/lookup  {connections:3} new connections")
+        client.close()
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
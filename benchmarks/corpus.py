@@ -0,0 +1,42 @@
+"""Helpers shared by the benchmark scripts: the data/qc_*.json snapshot corpus and timing."""
+import json
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = REPO_ROOT / 'data'
+
+
+def snapshot_paths(data_dir=DATA_DIR):
+    return sorted(Path(data_dir).glob('qc_*.json'))
+
+
+def load_snapshots(data_dir=DATA_DIR):
+    """Parsed snapshot files keyed by file name"""
+    snapshots = {}
+    for path in snapshot_paths(data_dir):
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshots[path.name] = json.load(f)
+    return snapshots
+
+
+def iter_items(snapshots):
+    """Every raw upstream item in the corpus, across all platforms"""
+    for data in snapshots.values():
+        for platform_data in data:
+            if isinstance(platform_data, dict):
+                yield from platform_data.get('data', [])
+
+
+def best_of(fn, repeat=5):
+    """Best wall-clock time of ``fn()`` over ``repeat`` runs, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(label, seconds, count, unit='item'):
+    print(f"{label:<28} {seconds * 1e3:9.2f} ms total  {seconds / count * 1e6:9.2f} us/{unit}")
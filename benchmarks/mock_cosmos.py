@@ -0,0 +1,85 @@
+"""In-process stand-ins for Cosmos DB container clients.
+
+``MockContainer`` offers the calls function_app.py makes on a sync
+container (``read_item``, ``read_items``, ``upsert_item``) and
+``AsyncMockContainer`` those it makes on an ``azure.cosmos.aio`` one. Both
+keep documents in a dict they can share and sleep for a fixed latency per
+call, standing in for the network round trip to Cosmos DB. ``install``
+puts a pair of them in place of the function's container handles.
+"""
+import asyncio
+import copy
+import threading
+import time
+
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
+
+
+class MockContainer:
+    """Dict-backed container whose calls block for ``read_latency`` / ``write_latency`` seconds"""
+
+    def __init__(self, store=None, read_latency=0.01, write_latency=0.02):
+        self.store = {} if store is None else store
+        self.read_latency = read_latency
+        self.write_latency = write_latency
+        self.counts = {'reads': 0, 'writes': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _read(self, item, partition_key):
+        self._count('reads')
+        document = self.store.get((partition_key, item))
+        if document is None:
+            raise CosmosResourceNotFoundError(status_code=404, message=f"{item} not found")
+        return copy.deepcopy(document)
+
+    def _write(self, body):
+        self._count('writes')
+        self.store[(body['pk'], body['id'])] = copy.deepcopy(body)
+        return body
+
+    def read_item(self, item, partition_key):
+        time.sleep(self.read_latency)
+        return self._read(item, partition_key)
+
+    def read_items(self, items):
+        time.sleep(self.read_latency)
+        found = []
+        for item, partition_key in items:
+            try:
+                found.append(self._read(item, partition_key))
+            except CosmosResourceNotFoundError:
+                pass
+        return found
+
+    def upsert_item(self, body):
+        time.sleep(self.write_latency)
+        return self._write(body)
+
+
+class AsyncMockContainer(MockContainer):
+    """The same container with ``azure.cosmos.aio`` style coroutine methods"""
+
+    async def read_item(self, item, partition_key):
+        await asyncio.sleep(self.read_latency)
+        return self._read(item, partition_key)
+
+    async def upsert_item(self, body):
+        await asyncio.sleep(self.write_latency)
+        return self._write(body)
+
+
+def install(function_app, read_latency=0.01, write_latency=0.02):
+    """Stand in for the function's Cosmos containers; returns the sync and async containers"""
+    store = {}
+    container = MockContainer(store, read_latency, write_latency)
+    async_container = AsyncMockContainer(store, read_latency, write_latency)
+    function_app._containers[function_app.CONTAINER_NAME] = container
+    async def get_async_container(container_name=function_app.CONTAINER_NAME):
+        return async_container
+
+    function_app.get_async_container = get_async_container
+    return container, async_container
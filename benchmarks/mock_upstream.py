@@ -0,0 +1,129 @@
+"""Local stand-in for the QuickCompare ``getQCResults`` API.
+
+Answers ``GET /getQCResults?query=...`` with the best matching snapshot from
+``data/`` (or ``[]``), over HTTP/1.1 keep-alive. Each new connection waits
+``setup_delay`` seconds before it is served, standing in for the DNS, TCP
+and TLS round trips to the real host, so connection reuse shows up in
+timings. A share of requests can be failed with a 503 (``error_rate``) and
+every answer delayed (``latency``) to play a degraded upstream. Connections,
+requests and injected errors are counted.
+
+Run it on its own and point the app at it:
+    python -m benchmarks.mock_upstream --port 8765 --setup-ms 60
+    QC_API_URL=http://127.0.0.1:8765/getQCResults streamlit run 1_pastbillpred.py
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.corpus import DATA_DIR
+from snapshot_index import SnapshotIndex
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        self.server.count('connections')
+        time.sleep(self.server.setup_delay)
+        super().setup()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/getQCResults':
+            self.send_error(404)
+            return
+        self.server.count('requests')
+        time.sleep(self.server.latency)
+        if self.server.should_fail():
+            self.server.count('errors')
+            self.send_error(503)
+            return
+        body = self.server.body_for(parse_qs(url.query).get('query', [''])[0])
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockUpstream(ThreadingHTTPServer):
+    """Threaded mock server; ``start()`` serves it from a background thread"""
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), setup_delay=0.06, latency=0.0, error_rate=0.0,
+                 data_dir=DATA_DIR, seed=0):
+        super().__init__(address, _Handler)
+        self.setup_delay = setup_delay
+        self.latency = latency
+        self.error_rate = error_rate
+        self.index = SnapshotIndex(str(data_dir))
+        self.counts = {'connections': 0, 'requests': 0, 'errors': 0}
+        self._filenames = {}
+        self._bodies = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/getQCResults"
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def should_fail(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-answer; that is expected here
+        pass
+
+    def body_for(self, query):
+        if query not in self._filenames:
+            self._filenames[query] = self.index.lookup(query)
+        filename = self._filenames[query]
+        if filename is None:
+            return b'[]'
+        body = self._bodies.get(filename)
+        if body is None:
+            with open(os.path.join(self.index.data_dir, filename), 'rb') as f:
+                body = self._bodies[filename] = f.read()
+        return body
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--setup-ms', type=float, default=60, help="delay before serving each new connection")
+    parser.add_argument('--latency-ms', type=float, default=0, help="delay before answering each request")
+    parser.add_argument('--error-rate', type=float, default=0, help="share of requests answered with a 503")
+    args = parser.parse_args()
+    server = MockUpstream(('127.0.0.1', args.port), args.setup_ms / 1e3, args.latency_ms / 1e3, args.error_rate)
+    print(f"Serving {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Cache keys for the QuickCompare scrape cache in Cosmos DB.
+
+Every cached document carries an ``id`` built from the normalized query and
+a geohash bucket of the user's location, plus a ``pk`` partition key taken
+from the normalized query's first token. Lookups know both values up front,
+so they are single-partition point reads instead of cross-partition SQL
+queries.
+
+Locations are bucketed rather than used raw so that users served by the same
+dark store share results. The bucket size follows the platforms involved:
+quick-commerce stores serve a few kilometres around them, while next-day
+platforms price the same across a whole city.
+"""
+import os
+import re
+
+# Characters Cosmos DB does not allow in document ids
+_INVALID_ID_CHARS = re.compile(r'[/\\?#]')
+_WHITESPACE = re.compile(r'\s+')
+
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Geohash precision per platform: 6 is ~1.2 x 0.6 km, 5 ~4.9 x 4.9 km,
+# 4 ~39 x 19.5 km. Override with e.g. CACHE_GEOHASH_PRECISION="zepto=5,dmart=3".
+PLATFORM_GEOHASH_PRECISION = {
+    'blinkit': 6,
+    'zepto': 6,
+    'swiggy': 6,
+    'bigbasket': 6,
+    'jiomart': 4,
+    'dmart': 4,
+}
+DEFAULT_GEOHASH_PRECISION = 6
+
+
+def _load_precision_overrides(spec):
+    """Parse ``platform=precision`` pairs from the environment"""
+    overrides = {}
+    for pair in filter(None, (part.strip() for part in spec.split(','))):
+        platform, _, precision = pair.partition('=')
+        overrides[platform.strip().lower()] = int(precision)
+    return overrides
+
+
+PLATFORM_GEOHASH_PRECISION.update(
+    _load_precision_overrides(os.environ.get('CACHE_GEOHASH_PRECISION', ''))
+)
+
+
+def normalize_query(query):
+    """Lowercase a search query, collapse whitespace and sort its tokens"""
+    return ' '.join(sorted(_WHITESPACE.split(str(query).strip().lower()))).strip()
+
+
+def partition_key_for(normalized_query):
+    """Partition key for a normalized query: its first token"""
+    return normalized_query.split(' ', 1)[0] or '_'
+
+
+def geohash_encode(lat, lon, precision=DEFAULT_GEOHASH_PRECISION):
+    """Standard base32 geohash of a coordinate"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, interval = (lon, lon_range) if even else (lat, lat_range)
+        mid = (interval[0] + interval[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            interval[0] = mid
+        else:
+            bits <<= 1
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def bucket_precision(platforms=None):
+    """Geohash precision for a request: the finest any requested platform needs"""
+    if not platforms:
+        platforms = PLATFORM_GEOHASH_PRECISION
+    return max(
+        PLATFORM_GEOHASH_PRECISION.get(str(p).lower(), DEFAULT_GEOHASH_PRECISION)
+        for p in platforms
+    )
+
+
+def make_cache_key(query, lat, lon, precision=None):
+    """Return the ``(id, partition_key)`` pair for a query at a location"""
+    normalized = normalize_query(query)
+    cell = geohash_encode(float(lat), float(lon), precision or bucket_precision())
+    doc_id = _INVALID_ID_CHARS.sub('-', f"{normalized}|{cell}")
+    return doc_id, partition_key_for(normalized)
+
+
+def parse_legacy_id(doc_id):
+    """Split a legacy ``{query}_{lat}_{lon}`` document id into its parts"""
+    query, lat, lon = doc_id.rsplit('_', 2)
+    return query, float(lat), float(lon)
@@ -0,0 +1,244 @@
+"""Split a cart across platforms to minimise item prices plus delivery fees.
+
+Every cart item has one offer per platform (the cheapest product page 2
+found there). An assignment picks one offer per item; each platform that
+receives items becomes one order, which pays that platform's delivery fee
+unless the user subscribes to it or the order clears its free-delivery
+threshold, and which must reach the platform's minimum order value.
+Offers slower than ``max_minutes`` are ignored and at most ``max_orders``
+platforms may be used.
+
+Small carts are solved exactly by branch and bound; larger ones by a
+per-platform-subset greedy assignment refined with single-item moves.
+"""
+from collections import defaultdict
+from itertools import combinations
+
+# Approximate fee schedules in rupees; subscriptions waive ``delivery_fee``
+PLATFORM_FEES = {
+    'Blinkit': {'delivery_fee': 30.0, 'free_delivery_above': 199.0, 'min_order': 0.0},
+    'Zepto': {'delivery_fee': 30.0, 'free_delivery_above': 99.0, 'min_order': 0.0},
+    'Swiggy': {'delivery_fee': 35.0, 'free_delivery_above': 199.0, 'min_order': 0.0},
+    'JioMart': {'delivery_fee': 49.0, 'free_delivery_above': 499.0, 'min_order': 0.0},
+    'Dmart': {'delivery_fee': 49.0, 'free_delivery_above': 999.0, 'min_order': 0.0},
+    'Bigbasket': {'delivery_fee': 30.0, 'free_delivery_above': 299.0, 'min_order': 0.0},
+}
+
+# Carts up to this many items are solved exactly
+EXACT_MAX_ITEMS = 10
+# Branch-and-bound gives up (keeping its best assignment) after this many nodes
+EXACT_NODE_LIMIT = 50_000
+# Passes of single-item moves in the heuristic
+LOCAL_SEARCH_PASSES = 8
+# Cost added per order below its platform's minimum order value
+MIN_ORDER_PENALTY = 1e6
+
+
+def order_fee(platform, subtotal, subscriptions=(), fees=PLATFORM_FEES):
+    """Delivery fee of one order, plus ``MIN_ORDER_PENALTY`` if it is too small"""
+    if subtotal <= 0:
+        return 0.0
+    schedule = fees.get(platform, {})
+    fee = 0.0
+    if subtotal < schedule.get('min_order', 0.0):
+        fee += MIN_ORDER_PENALTY
+    if platform not in subscriptions and subtotal < schedule.get('free_delivery_above', 0.0):
+        fee += schedule.get('delivery_fee', 0.0)
+    return fee
+
+
+def _eligible_offers(cart_offers, delivery_times, max_minutes):
+    """Per item, ``{platform: (price, offer)}`` keeping the cheapest offer per platform"""
+    eligible = {}
+    for key, offers in cart_offers.items():
+        choices = {}
+        for offer in offers:
+            platform, price = offer.get('platform'), offer.get('price')
+            if not price or price <= 0:
+                continue
+            if max_minutes is not None and delivery_times.get(platform, float('inf')) > max_minutes:
+                continue
+            if platform not in choices or price < choices[platform][0]:
+                choices[platform] = (float(price), offer)
+        eligible[key] = choices
+    return eligible
+
+
+def _total_cost(assignment, prices, subscriptions, fees):
+    subtotals = defaultdict(float)
+    for i, platform in enumerate(assignment):
+        subtotals[platform] += prices[i][platform]
+    return sum(subtotals.values()) + sum(
+        order_fee(p, s, subscriptions, fees) for p, s in subtotals.items()
+    )
+
+
+def _heuristic(prices, platforms, max_orders, subscriptions, fees):
+    """Best (cost, assignment) over platform subsets of size <= ``max_orders``"""
+    subsets = []
+    for size in range(1, min(max_orders, len(platforms)) + 1):
+        for subset in combinations(platforms, size):
+            bound, covered = 0.0, True
+            for choices in prices:
+                cheapest = min((choices[p] for p in subset if p in choices), default=None)
+                if cheapest is None:
+                    covered = False
+                    break
+                bound += cheapest
+            if covered:
+                subsets.append((bound, subset))
+    subsets.sort()
+
+    best_cost, best_assignment = float('inf'), None
+    for bound, subset in subsets:
+        # Prices are a lower bound on the cost of any assignment within the subset
+        if bound >= best_cost:
+            break
+        cost, assignment = _improve(prices, subset, subscriptions, fees)
+        if cost < best_cost:
+            best_cost, best_assignment = cost, assignment
+    return best_cost, best_assignment
+
+
+def _improve(prices, subset, subscriptions, fees):
+    """Cheapest offer per item within ``subset``, then improving single-item moves"""
+    options = [[(choices[p], p) for p in subset if p in choices] for choices in prices]
+    assignment = [min(opts)[1] for opts in options]
+    subtotals, counts = defaultdict(float), defaultdict(int)
+    for i, platform in enumerate(assignment):
+        subtotals[platform] += prices[i][platform]
+        counts[platform] += 1
+
+    for _ in range(LOCAL_SEARCH_PASSES):
+        improved = False
+        for i, opts in enumerate(options):
+            current = assignment[i]
+            price = prices[i][current]
+            sub = subtotals[current]
+            # Moving the last item away closes the order, whatever float residue is left
+            after = sub - price if counts[current] > 1 else 0.0
+            leave = order_fee(current, after, subscriptions, fees) - order_fee(current, sub, subscriptions, fees)
+            best_delta, best_platform = -1e-9, None
+            for alt_price, alt in opts:
+                if alt == current:
+                    continue
+                alt_sub = subtotals[alt] if counts[alt] else 0.0
+                delta = (alt_price - price + leave
+                         + order_fee(alt, alt_sub + alt_price, subscriptions, fees)
+                         - order_fee(alt, alt_sub, subscriptions, fees))
+                if delta < best_delta:
+                    best_delta, best_platform = delta, alt
+            if best_platform is not None:
+                subtotals[current] -= price
+                subtotals[best_platform] += prices[i][best_platform]
+                counts[current] -= 1
+                counts[best_platform] += 1
+                assignment[i] = best_platform
+                improved = True
+        if not improved:
+            break
+    return _total_cost(assignment, prices, subscriptions, fees), assignment
+
+
+def _branch_and_bound(prices, max_orders, subscriptions, fees, best_cost, best_assignment):
+    """Exact search, seeded with a known assignment as the upper bound.
+
+    Returns ``(cost, assignment, complete)``; ``complete`` is False when the
+    node limit was hit before the search space was exhausted.
+    """
+    # Branch on items with the widest price spread first: they decide the most
+    order = sorted(range(len(prices)), key=lambda i: min(prices[i].values()) - max(prices[i].values()))
+    ordered = [sorted(prices[i].items(), key=lambda kv: kv[1]) for i in order]
+    remaining = [0.0] * (len(order) + 1)
+    for depth in range(len(order) - 1, -1, -1):
+        remaining[depth] = remaining[depth + 1] + ordered[depth][0][1]
+    # Most an open order on each platform can still grow by from a given depth
+    platforms = {p for choices in prices for p in choices}
+    headroom = {p: [0.0] * (len(order) + 1) for p in platforms}
+    for p, suffix in headroom.items():
+        for depth in range(len(order) - 1, -1, -1):
+            suffix[depth] = suffix[depth + 1] + prices[order[depth]].get(p, 0.0)
+
+    subtotals = defaultdict(float)
+    counts = defaultdict(int)  # items per platform; subtotals alone carry float residue
+    chosen = [None] * len(order)
+    best = {'cost': best_cost, 'assignment': best_assignment, 'nodes': 0}
+
+    def unavoidable_fees(depth):
+        # Fees of open orders that stay below threshold even if they get every remaining item
+        return sum(order_fee(p, subtotals[p] + headroom[p][depth], subscriptions, fees)
+                   for p, n in counts.items() if n)
+
+    def search(depth, spent, used):
+        best['nodes'] += 1
+        if best['nodes'] > EXACT_NODE_LIMIT:
+            return
+        if depth == len(order):
+            cost = spent + unavoidable_fees(depth)
+            if cost < best['cost'] - 1e-9:
+                assignment = [None] * len(order)
+                for position, i in enumerate(order):
+                    assignment[i] = chosen[position]
+                best['cost'], best['assignment'] = cost, assignment
+            return
+        for platform, price in ordered[depth]:
+            if spent + price + remaining[depth + 1] >= best['cost']:
+                break
+            opens = not counts[platform]
+            if opens and used >= max_orders:
+                continue
+            subtotals[platform] += price
+            counts[platform] += 1
+            if spent + price + remaining[depth + 1] + unavoidable_fees(depth + 1) < best['cost']:
+                chosen[depth] = platform
+                search(depth + 1, spent + price, used + opens)
+            subtotals[platform] -= price
+            counts[platform] -= 1
+
+    search(0, 0.0, 0)
+    return best['cost'], best['assignment'], best['nodes'] <= EXACT_NODE_LIMIT
+
+
+def optimize_cart(cart_offers, delivery_times, max_minutes=None, max_orders=None,
+                  subscriptions=(), fees=PLATFORM_FEES):
+    """Cheapest split of a cart into at most ``max_orders`` platform orders.
+
+    ``cart_offers`` maps each cart item to its offers (dicts with at least
+    ``platform`` and ``price``); ``delivery_times`` maps platforms to
+    minutes. Returns a dict with the chosen offer per item (``assignment``),
+    per-platform ``orders`` (items, subtotal, fee), the ``total``, the
+    ``unassigned`` items that have no eligible offer, and the ``method``
+    used ('exact' or 'heuristic').
+    """
+    eligible = _eligible_offers(cart_offers, delivery_times, max_minutes)
+    keys = [key for key, choices in eligible.items() if choices]
+    unassigned = [key for key, choices in eligible.items() if not choices]
+    result = {'assignment': {}, 'orders': {}, 'total': 0.0, 'unassigned': unassigned, 'method': 'exact'}
+    if not keys:
+        return result
+
+    prices = [{p: price for p, (price, _) in eligible[key].items()} for key in keys]
+    platforms = sorted({p for choices in prices for p in choices})
+    max_orders = len(platforms) if max_orders is None else max(1, max_orders)
+
+    cost, assignment = _heuristic(prices, platforms, max_orders, subscriptions, fees)
+    method = 'heuristic'
+    if len(keys) <= EXACT_MAX_ITEMS:
+        cost, assignment, complete = _branch_and_bound(prices, max_orders, subscriptions, fees, cost, assignment)
+        method = 'exact' if complete else 'heuristic'
+    if assignment is None or cost >= MIN_ORDER_PENALTY:
+        # No split within max_orders covers every item and meets minimum orders
+        result['unassigned'] = list(cart_offers)
+        return result
+
+    orders = {}
+    for key, platform in zip(keys, assignment):
+        price, offer = eligible[key][platform]
+        result['assignment'][key] = offer
+        order = orders.setdefault(platform, {'items': [], 'subtotal': 0.0, 'fee': 0.0})
+        order['items'].append(key)
+        order['subtotal'] += price
+    for platform, order in orders.items():
+        order['fee'] = order_fee(platform, order['subtotal'], subscriptions, fees)
+    result.update(orders=orders, total=cost, method=method)
+    return result
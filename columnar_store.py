@@ -0,0 +1,239 @@
+"""Compact, memory-mappable columnar copy of the ``data/qc_*.json`` snapshots.
+
+Each snapshot keeps only the fields the compare pages read, so readers
+memory-map them instead of parsing multi-megabyte JSON. Low-cardinality
+strings (platforms, brands, quantities) are interned into a dictionary and
+stored as integer codes; free-text strings (names, image URLs, SKU ids,
+sibling ids) are stored as one UTF-8 buffer plus offsets. Prices are stored
+already resolved to a pack price with ``normalization.get_price``, as the
+pages would compute them from the JSON. Columns of one kind form one 2-D
+array, and the arrays are laid out back to back in a single ``columns.bin``
+so opening the store costs one memory map; their dtypes, shapes and
+offsets are listed in ``manifest.json`` along with each snapshot's
+contiguous row range.
+
+Build or rebuild the store with:
+    python columnar_store.py [data_dir]
+"""
+import json
+import logging
+import mmap
+import os
+import sys
+
+import numpy as np
+
+from normalization import get_price, parse_quantity_unit
+from snapshot_index import parse_snapshot_name
+
+STORE_DIRNAME = 'columnar'
+MANIFEST_VERSION = 2
+
+DICT_COLUMNS = ('platform', 'brand', 'quantity', 'unit')
+TEXT_COLUMNS = ('name', 'image_url', 'sku_id', 'siblings')
+NUMERIC_COLUMNS = ('price', 'amount')
+DATA_FILENAME = 'columns.bin'
+
+# Joins an item's sibling ids in the ``siblings`` text column
+_LIST_SEPARATOR = '\x1f'
+
+
+def _first_image(item):
+    return next((img for img in item.get('images', []) or []
+                 if isinstance(img, str) and img.startswith(('http://', 'https://'))), '')
+
+
+def extract_rows(data):
+    """The columns kept from one parsed snapshot, as a list of row dicts"""
+    rows = []
+    for platform_data in data if isinstance(data, list) else []:
+        if not isinstance(platform_data, dict):
+            continue
+        for item in platform_data.get('data', []):
+            if not isinstance(item, dict) or 'name' not in item:
+                continue
+            quantity = item.get('quantity')
+            parsed = parse_quantity_unit(quantity)
+            price = get_price(item)
+            rows.append({
+                'platform': (item.get('platform') or {}).get('name', ''),
+                'brand': item.get('brand') or '',
+                'quantity': quantity,
+                'unit': parsed[1] if parsed else '',
+                'name': item.get('name') or '',
+                'image_url': _first_image(item),
+                'sku_id': str(item.get('id') or item.get('xid') or ''),
+                'siblings': _LIST_SEPARATOR.join(str(s) for s in item.get('siblings') or ()),
+                'price': np.nan if price is None else price,
+                'amount': parsed[0] if parsed else np.nan,
+            })
+    return rows
+
+
+def build_store(data_dir='./data', store_dir=None):
+    """Convert every snapshot in ``data_dir`` into a fresh columnar store"""
+    store_dir = store_dir or os.path.join(data_dir, STORE_DIRNAME)
+    os.makedirs(store_dir, exist_ok=True)
+
+    rows, snapshots = [], {}
+    for filename in sorted(os.listdir(data_dir)):
+        if parse_snapshot_name(filename) is None:
+            continue
+        path = os.path.join(data_dir, filename)
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot_rows = extract_rows(json.load(f))
+        snapshots[filename] = {
+            'start': len(rows),
+            'stop': len(rows) + len(snapshot_rows),
+            'mtime_ns': os.stat(path).st_mtime_ns,
+        }
+        rows.extend(snapshot_rows)
+
+    dictionaries, codes = {}, np.zeros((len(DICT_COLUMNS), len(rows)), dtype=np.int32)
+    for i, column in enumerate(DICT_COLUMNS):
+        values = [row[column] for row in rows]
+        dictionary = sorted(set(values), key=lambda v: (v is None, v or ''))
+        lookup = {value: code for code, value in enumerate(dictionary)}
+        codes[i] = [lookup[v] for v in values]
+        dictionaries[column] = dictionary
+
+    # Text columns one after another in one buffer; (column i, row r) is
+    # bytes[offsets[i * rows + r]:offsets[i * rows + r + 1]]
+    encoded = [row[column].encode('utf-8') for column in TEXT_COLUMNS for row in rows]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+    arrays = {
+        'codes': codes,
+        'numbers': np.array([[row[column] for row in rows] for column in NUMERIC_COLUMNS], dtype=np.float64),
+        'text.offsets': offsets,
+        'text.bytes': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+    }
+    # Written aside and swapped in, so processes still mapping the old file keep reading it
+    layout = {}
+    data_path = os.path.join(store_dir, DATA_FILENAME)
+    with open(f'{data_path}.tmp', 'wb') as f:
+        for name, array in arrays.items():
+            f.write(b'\0' * (-f.tell() % 8))
+            layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': f.tell()}
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(f'{data_path}.tmp', data_path)
+
+    # Files left by an older layout
+    for filename in os.listdir(store_dir):
+        if filename.endswith('.npy'):
+            os.remove(os.path.join(store_dir, filename))
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'rows': len(rows),
+        'snapshots': snapshots,
+        'dictionaries': dictionaries,
+        'layout': layout,
+    }
+    with open(os.path.join(store_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+class ColumnarSnapshotStore:
+    """Read-only, memory-mapped view of a store written by ``build_store``"""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported columnar store version {manifest.get('version')}")
+        self.rows = manifest['rows']
+        self.snapshots = manifest['snapshots']
+        self.dictionaries = manifest['dictionaries']
+        self._layout = manifest['layout']
+        self._arrays = {}
+        self._buffer = None
+
+    def covers(self, filename, data_dir):
+        """Whether the store holds an up-to-date copy of a snapshot file"""
+        entry = self.snapshots.get(filename)
+        if entry is None:
+            return False
+        try:
+            return os.stat(os.path.join(data_dir, filename)).st_mtime_ns == entry['mtime_ns']
+        except FileNotFoundError:
+            return False
+
+    def _array(self, name):
+        if name not in self._arrays:
+            if self._buffer is None:
+                with open(os.path.join(self.store_dir, DATA_FILENAME), 'rb') as f:
+                    self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            spec = self._layout[name]
+            self._arrays[name] = np.frombuffer(
+                self._buffer, dtype=spec['dtype'], count=int(np.prod(spec['shape'])), offset=spec['offset']
+            ).reshape(spec['shape'])
+        return self._arrays[name]
+
+    def column(self, name, snapshot):
+        """One column's values for a snapshot: an array, or a list of strings"""
+        entry = self.snapshots[snapshot]
+        start, stop = entry['start'], entry['stop']
+        if name in DICT_COLUMNS:
+            dictionary = self.dictionaries[name]
+            codes = self._array('codes')[DICT_COLUMNS.index(name), start:stop]
+            return [dictionary[code] for code in codes.tolist()]
+        if name in TEXT_COLUMNS:
+            first = TEXT_COLUMNS.index(name) * self.rows
+            offsets = self._array('text.offsets')[first + start:first + stop + 1].tolist()
+            raw = self._array('text.bytes')[offsets[0]:offsets[-1]].tobytes()
+            base = offsets[0]
+            return [raw[a - base:b - base].decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+        return self._array('numbers')[NUMERIC_COLUMNS.index(name), start:stop]
+
+    def columns(self, names, snapshot):
+        return {name: self.column(name, snapshot) for name in names}
+
+    def platform_data(self, snapshot):
+        """A snapshot in the upstream ``[{'data': [item, ...]}]`` shape, with only the fields the pages read.
+
+        The resolved pack price is given as ``offer_price``; SKU and sibling
+        ids come back as strings.
+        """
+        cols = self.columns(('platform', 'brand', 'quantity', 'name', 'image_url', 'sku_id', 'siblings', 'price'),
+                            snapshot)
+        items = []
+        for name, brand, quantity, platform, image_url, sku_id, siblings, price in zip(
+                cols['name'], cols['brand'], cols['quantity'], cols['platform'], cols['image_url'],
+                cols['sku_id'], cols['siblings'], cols['price'].tolist()):
+            item = {
+                'id': sku_id or None,
+                'name': name,
+                'brand': brand,
+                'quantity': quantity,
+                'images': [image_url] if image_url else [],
+                'platform': {'name': platform},
+            }
+            if siblings:
+                item['siblings'] = siblings.split(_LIST_SEPARATOR)
+            if price == price:  # skip NaN (no price)
+                item['offer_price'] = price
+            items.append(item)
+        return [{'data': items}]
+
+
+def open_store(data_dir='./data'):
+    """The store under ``data_dir``, or None if it has not been built in the current format"""
+    store_dir = os.path.join(data_dir, STORE_DIRNAME)
+    if not os.path.exists(os.path.join(store_dir, 'manifest.json')):
+        return None
+    try:
+        return ColumnarSnapshotStore(store_dir)
+    except ValueError as e:
+        logging.warning(f"Ignoring columnar store, rebuild it with 'python columnar_store.py': {str(e)}")
+        return None
+
+
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else './data'
+    manifest = build_store(data_dir)
+    print(f"Wrote {manifest['rows']} rows from {len(manifest['snapshots'])} snapshots "
+          f"to {os.path.join(data_dir, STORE_DIRNAME)}")
@@ -1,33 +1,16 @@
-import requests
 import pandas as pd
-from bs4 import BeautifulSoup
-
-def extract_image_from_html(html_snippet):
-    """Extract image URL from product HTML snippet"""
-    soup = BeautifulSoup(html_snippet, 'html.parser')
-    img_tag = soup.find('img', class_='h-24 w-full bg-transparent object-contain gap-2')
-    return img_tag['src'] if img_tag and img_tag.get('src') else ""
+from image_extraction import get_image_url
+from upstream import fetch_qc_results
 
 def scrape_quickcompare(product_query, lat=19.0760, lon=72.8777):
-    url = "https://yr338c15si.execute-api.ap-south-1.amazonaws.com/getQCResults"
-    params = {
-        'lat': lat,
-        'lon': lon,
-        'type': 'groupsearch',
-        'query': product_query
-    }
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        data = fetch_qc_results(product_query, lat, lon)
 
         results = []
         for platform_data in data:
             for item in platform_data.get('data', []):
                 # Extract image from HTML first
-                html_image = extract_image_from_html(item.get("html", ""))
-                images = item.get("images", [])
-                image_url = html_image if html_image else (images[0] if images else "")
+                image_url = get_image_url(item)
                                 
                 # Ensure all required fields exist
                 entry = {
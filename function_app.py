@@ -1,84 +1,488 @@
 import azure.functions as func
+import asyncio
 import logging
-import requests
 import pandas as pd
-from bs4 import BeautifulSoup
 import json
 from datetime import datetime, timedelta
 import azure.cosmos.cosmos_client as cosmos_client
+from azure.cosmos.aio import CosmosClient as AsyncCosmosClient
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
 import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cache_keys import bucket_precision, make_cache_key, normalize_query
+from ttl_cache import TTLCache
+from singleflight import AsyncSingleFlight, SingleFlight, SingleFlightTimeout
+from image_extraction import get_image_url
+from resilience import Deadline
+from snapshot_index import SnapshotIndex
+from upstream import UPSTREAM_CALLER, fetch_qc_results, fetch_qc_results_async
 
 # Environment variables for Cosmos DB (set in Azure Function configuration)
 COSMOS_ENDPOINT = os.environ.get('COSMOS_ENDPOINT')
 COSMOS_KEY = os.environ.get('COSMOS_KEY')
 
 DATABASE_NAME = 'QuickCompareCache'
-CONTAINER_NAME = 'ProductCache'
+# Partitioned on /pk (see cache_keys.py); migrate_cache.py copies entries
+# over from the legacy, id-partitioned container.
+CONTAINER_NAME = 'ProductCacheV2'
+LEGACY_CONTAINER_NAME = 'ProductCache'
+PARTITION_KEY_PATH = '/pk'
+# Entries older than the soft TTL are served stale while a background refresh
+# runs; only entries past the hard TTL (CACHE_TTL_SECONDS) block on upstream.
+CACHE_TTL_SECONDS = 86400
+CACHE_SOFT_TTL_SECONDS = int(os.environ.get('CACHE_SOFT_TTL_SECONDS', 6 * 3600))
+
+# In-process L1 tier in front of Cosmos DB, kept for the life of a warm worker
+L1_CACHE = TTLCache(
+    max_entries=int(os.environ.get('L1_CACHE_MAX_ENTRIES', 2048)),
+    max_bytes=int(os.environ.get('L1_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    ttl=CACHE_TTL_SECONDS
+)
+
+# Concurrent misses for the same cache key share one upstream fetch
+SCRAPE_FLIGHTS = SingleFlight()
+SINGLEFLIGHT_WAIT_SECONDS = float(os.environ.get('SINGLEFLIGHT_WAIT_SECONDS', 15))
+
+# Background refreshes outlive the request that triggered them on a warm worker
+REFRESH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('CACHE_REFRESH_WORKERS', 4)),
+    thread_name_prefix='cache-refresh'
+)
+_refresh_lock = threading.Lock()
+_refreshing = set()
+
+MAX_BATCH_QUERIES = int(os.environ.get('MAX_BATCH_QUERIES', 100))
+BATCH_SCRAPE_WORKERS = int(os.environ.get('BATCH_SCRAPE_WORKERS', 8))
+# Upstream time budget shared by all cache misses of one batch
+BATCH_DEADLINE_SECONDS = float(os.environ.get('BATCH_DEADLINE_SECONDS', 25))
+
+# Saved snapshots answer cache misses while the upstream is failing
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', './data')
+_snapshot_lock = threading.Lock()
+_snapshot_index = None
+
+# Cosmos handles are created once per worker process and reused across warm
+# invocations; the lock only guards first-time initialization.
+_cosmos_lock = threading.RLock()
+_cosmos_client = None
+_containers = {}
+
+# The async scrape route's counterparts, only touched from the worker's event
+# loop. The async Cosmos client belongs to the loop it was created on:
+# event loop -> (client, its container handles, the generator closing it at
+# the loop's shutdown). Background tasks (Cosmos writes, refreshes) outlive
+# the request that started them; holding them keeps them from being garbage
+# collected.
+ASYNC_SCRAPE_FLIGHTS = AsyncSingleFlight()
+_async_cosmos = {}
+_background_tasks = set()
+
+_metrics_lock = threading.Lock()
+METRICS = Counter()
+
+def record_metric(name, value=1):
+    """Increment a process-wide counter reported by the metrics route"""
+    with _metrics_lock:
+        METRICS[name] += value
+
+def get_metrics():
+    """Snapshot of all counters for reporting"""
+    with _metrics_lock:
+        return dict(METRICS)
+
+def record_cache_lookup(precision, hit):
+    """Count a cache lookup overall and per geohash precision"""
+    outcome = 'hits' if hit else 'misses'
+    record_metric(f'cache_{outcome}')
+    record_metric(f'cache_{outcome}_p{precision}')
+
+def cache_hit_rates(metrics):
+    """Hit rate overall and per geohash precision, for tuning bucket sizes"""
+    rates = {}
+    for name in metrics:
+        for outcome in ('cache_hits', 'cache_misses'):
+            if name.startswith(outcome):
+                suffix = name[len(outcome):]
+                hits = metrics.get('cache_hits' + suffix, 0)
+                misses = metrics.get('cache_misses' + suffix, 0)
+                rates['cache_hit_rate' + suffix] = round(hits / (hits + misses), 4)
+    return rates
 
 def get_cosmos_client():
-    """Create Cosmos DB client with environment variables"""
-    return cosmos_client.CosmosClient(COSMOS_ENDPOINT, COSMOS_KEY)
+    """Return the shared Cosmos DB client, creating it on first use"""
+    global _cosmos_client
+    if _cosmos_client is None:
+        with _cosmos_lock:
+            if _cosmos_client is None:
+                record_metric('cosmos_client_created')
+                _cosmos_client = cosmos_client.CosmosClient(COSMOS_ENDPOINT, COSMOS_KEY)
+    return _cosmos_client
 
-def extract_image_from_html(html_snippet):
-    """Extract image URL from product HTML snippet"""
-    soup = BeautifulSoup(html_snippet, 'html.parser')
-    img_tag = soup.find('img', class_='h-24 w-full bg-transparent object-contain gap-2')
-    return img_tag['src'] if img_tag and img_tag.get('src') else ""
+def get_container(container_name=CONTAINER_NAME):
+    """Return a cached container handle, resolving it only on a cold worker"""
+    container = _containers.get(container_name)
+    if container is not None:
+        record_metric('cosmos_container_hits')
+        return container
 
-def get_cached_results(query, lat, lon):
-    """Get cached results from Cosmos DB with parameterized query"""
+    with _cosmos_lock:
+        container = _containers.get(container_name)
+        if container is None:
+            record_metric('cosmos_container_misses')
+            database = get_cosmos_client().get_database_client(DATABASE_NAME)
+            container = database.get_container_client(container_name)
+            _containers[container_name] = container
+        else:
+            record_metric('cosmos_container_hits')
+    return container
+
+async def get_async_container(container_name=CONTAINER_NAME):
+    """Async counterpart of ``get_container``, on a client shared by the running event loop.
+
+    The client is closed when its loop shuts down its async generators, as
+    ``asyncio.run`` does before closing the loop.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_cosmos.get(loop)
+    if entry is None:
+        record_metric('cosmos_client_created')
+        client = AsyncCosmosClient(COSMOS_ENDPOINT, COSMOS_KEY)
+        closer = _close_cosmos_at_shutdown(loop, client)
+        _async_cosmos[loop] = entry = (client, {}, closer)
+        # Runs to the yield, registering the generator with the loop's shutdown
+        await closer.__anext__()
+    client, containers, _ = entry
+
+    container = containers.get(container_name)
+    if container is not None:
+        record_metric('cosmos_container_hits')
+        return container
+    record_metric('cosmos_container_misses')
+    database = client.get_database_client(DATABASE_NAME)
+    container = containers[container_name] = database.get_container_client(container_name)
+    return container
+
+async def _close_cosmos_at_shutdown(loop, client):
     try:
-        client = get_cosmos_client()
-        database = client.get_database_client(DATABASE_NAME)
-        container = database.get_container_client(CONTAINER_NAME)
-        
-        # Parameterized query for security
-        cache_key = f"{query}_{lat}_{lon}"
-        query_spec = {
-            'query': "SELECT * FROM c WHERE c.id = @id",
-            'parameters': [{'name': '@id', 'value': cache_key}]
-        }
-        
-        items = list(container.query_items(query=query_spec, enable_cross_partition_query=True))
-        
-        if items and datetime.fromisoformat(items[0]['timestamp']) > datetime.now() - timedelta(hours=24):
-            return items[0]['results']
+        yield
+    finally:
+        _async_cosmos.pop(loop, None)
+        await client.close()
+
+def run_in_background(coro):
+    """Start ``coro`` on the event loop without waiting for it"""
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+def is_stale(fetched_at):
+    """Whether a cached entry is past the soft TTL and due for a refresh"""
+    return datetime.now() - fetched_at > timedelta(seconds=CACHE_SOFT_TTL_SECONDS)
+
+def promote_cosmos_entry(item):
+    """Copy a Cosmos document into L1; returns ``(results, stale)`` or None if expired"""
+    fetched_at = datetime.fromisoformat(item['timestamp'])
+    age = datetime.now() - fetched_at
+    if age >= timedelta(seconds=CACHE_TTL_SECONDS):
         return None
+    L1_CACHE.set(item['id'], (item['results'], fetched_at), ttl=CACHE_TTL_SECONDS - age.total_seconds())
+    return item['results'], is_stale(fetched_at)
+
+def get_cached_results(query, lat, lon, platforms=None):
+    """Get cached results from the L1 cache, then a Cosmos DB point read.
+
+    Returns ``(results, stale)``. Entries past the hard TTL count as misses
+    and come back as ``(None, False)``.
+    """
+    try:
+        precision = bucket_precision(platforms)
+        doc_id, partition_key = make_cache_key(query, lat, lon, precision)
+
+        if (entry := L1_CACHE.get(doc_id)) is not None:
+            results, fetched_at = entry
+            record_cache_lookup(precision, hit=True)
+            return results, is_stale(fetched_at)
+
+        container = get_container()
+        try:
+            item = container.read_item(item=doc_id, partition_key=partition_key)
+        except CosmosResourceNotFoundError:
+            record_cache_lookup(precision, hit=False)
+            return None, False
+        
+        if (hit := promote_cosmos_entry(item)) is not None:
+            record_cache_lookup(precision, hit=True)
+            return hit
+        record_cache_lookup(precision, hit=False)
+        return None, False
     except Exception as e:
         logging.error(f"Cache access error: {str(e)}")
-        return None
+        return None, False
+
+def get_cached_batch(queries, lat, lon, platforms=None):
+    """Resolve many queries against L1, then a single multi-item Cosmos read.
+
+    Returns ``{query: (results, stale)}`` for the queries that hit.
+    """
+    precision = bucket_precision(platforms)
+    found = {}
+    pending = {}  # doc id -> (partition key, queries sharing that id)
+    for query in queries:
+        doc_id, partition_key = make_cache_key(query, lat, lon, precision)
+        if (entry := L1_CACHE.get(doc_id)) is not None:
+            found[query] = (entry[0], is_stale(entry[1]))
+        else:
+            pending.setdefault(doc_id, (partition_key, []))[1].append(query)
 
-def cache_results(query, lat, lon, results):
-    """Cache results in Cosmos DB with TTL"""
+    if pending:
+        try:
+            items = get_container().read_items(
+                items=[(doc_id, partition_key) for doc_id, (partition_key, _) in pending.items()]
+            )
+            for item in items:
+                if (hit := promote_cosmos_entry(item)) is not None:
+                    for query in pending.get(item['id'], (None, []))[1]:
+                        found[query] = hit
+        except Exception as e:
+            logging.error(f"Batch cache access error: {str(e)}")
+
+    for query in queries:
+        record_cache_lookup(precision, hit=query in found)
+    return found
+
+async def get_cached_results_async(query, lat, lon, platforms=None):
+    """``get_cached_results`` with a non-blocking Cosmos DB point read"""
     try:
-        client = get_cosmos_client()
-        database = client.get_database_client(DATABASE_NAME)
-        container = database.get_container_client(CONTAINER_NAME)
-        
-        cache_entry = {
-            'id': f"{query}_{lat}_{lon}",
-            'timestamp': datetime.now().isoformat(),
-            'results': results,
-            'ttl': 86400  # 24-hour expiration
-        }
-        
-        container.upsert_item(cache_entry)
+        precision = bucket_precision(platforms)
+        doc_id, partition_key = make_cache_key(query, lat, lon, precision)
+
+        if (entry := L1_CACHE.get(doc_id)) is not None:
+            results, fetched_at = entry
+            record_cache_lookup(precision, hit=True)
+            return results, is_stale(fetched_at)
+
+        try:
+            container = await get_async_container()
+            item = await container.read_item(item=doc_id, partition_key=partition_key)
+        except CosmosResourceNotFoundError:
+            record_cache_lookup(precision, hit=False)
+            return None, False
+
+        if (hit := promote_cosmos_entry(item)) is not None:
+            record_cache_lookup(precision, hit=True)
+            return hit
+        record_cache_lookup(precision, hit=False)
+        return None, False
+    except Exception as e:
+        logging.error(f"Cache access error: {str(e)}")
+        return None, False
+
+def cache_l1(query, lat, lon, results, platforms=None):
+    """Put results in the L1 cache and return the Cosmos DB document to write through"""
+    doc_id, partition_key = make_cache_key(query, lat, lon, bucket_precision(platforms))
+    fetched_at = datetime.now()
+    L1_CACHE.set(doc_id, (results, fetched_at))
+    return {
+        'id': doc_id,
+        'pk': partition_key,
+        'query': normalize_query(query),
+        'lat': lat,
+        'lon': lon,
+        'timestamp': fetched_at.isoformat(),
+        'results': results,
+        'ttl': CACHE_TTL_SECONDS  # 24-hour expiration
+    }
+
+def cache_results(query, lat, lon, results, platforms=None):
+    """Cache results in the L1 cache and write them through to Cosmos DB"""
+    try:
+        cache_entry = cache_l1(query, lat, lon, results, platforms)
+        get_container().upsert_item(cache_entry)
     except Exception as e:
         logging.error(f"Cache write error: {str(e)}")
 
-def scrape_quickcompare(product_query, lat=19.0760, lon=72.8777):
-    """Scrape product data with enhanced error handling"""
-    url = "https://yr338c15si.execute-api.ap-south-1.amazonaws.com/getQCResults"
-    params = {'lat': lat, 'lon': lon, 'type': 'groupsearch', 'query': product_query}
-    
+def cache_results_in_background(query, lat, lon, results, platforms=None):
+    """Cache results in L1 now and write them to Cosmos DB after the response has gone out.
+
+    L1 serves the entry meanwhile; a write lost to a recycled worker only
+    costs a later upstream fetch.
+    """
+    async def write(cache_entry):
+        try:
+            container = await get_async_container()
+            await container.upsert_item(cache_entry)
+            record_metric('cache_background_writes')
+        except Exception as e:
+            record_metric('cache_background_write_errors')
+            logging.error(f"Cache write error: {str(e)}")
+
+    try:
+        run_in_background(write(cache_l1(query, lat, lon, results, platforms)))
+    except Exception as e:
+        logging.error(f"Cache write error: {str(e)}")
+
+def scrape_quickcompare(product_query, lat=19.0760, lon=72.8777, deadline=None):
+    """Scrape product data through the shared upstream client, with retries and the circuit breaker"""
+    return process_api_response(fetch_qc_results(product_query, lat, lon, deadline=deadline))
+
+async def scrape_quickcompare_async(product_query, lat=19.0760, lon=72.8777, deadline=None):
+    """``scrape_quickcompare`` over the async upstream client"""
+    return process_api_response(await fetch_qc_results_async(product_query, lat, lon, deadline=deadline))
+
+def get_snapshot_index():
+    """Index over the saved snapshots, or None when the worker has none"""
+    global _snapshot_index
+    if _snapshot_index is None and os.path.isdir(SNAPSHOT_DIR):
+        with _snapshot_lock:
+            if _snapshot_index is None:
+                _snapshot_index = SnapshotIndex(SNAPSHOT_DIR)
+    return _snapshot_index
+
+def fallback_results(product_query, error):
+    """Results from the closest saved snapshot after a failed scrape, or none"""
+    logging.error(f"Scraping error: {str(error)}")
+    record_metric('scrape_failures')
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        return process_api_response(response.json())
+        index = get_snapshot_index()
+        filename = index.lookup(product_query) if index is not None else None
+        if filename is None:
+            return []
+        record_metric('snapshot_fallbacks_served')
+        return process_api_response(index.load(filename))
     except Exception as e:
-        logging.error(f"Scraping error: {str(e)}")
+        logging.error(f"Snapshot fallback error: {str(e)}")
         return []
 
+def fetch_and_cache(product_query, lat, lon, platforms=None, deadline=None):
+    """Scrape upstream and cache the results, unless a racing call just did"""
+    doc_id, _ = make_cache_key(product_query, lat, lon, bucket_precision(platforms))
+    entry = L1_CACHE.get(doc_id)
+    if entry is not None and not is_stale(entry[1]):
+        return entry[0]
+    try:
+        results = scrape_quickcompare(product_query, lat, lon, deadline)
+    except Exception as e:
+        # Snapshot data is never cached as if it were fresh
+        return fallback_results(product_query, e)
+    # An empty result is usually a failed scrape; never let it replace a
+    # stale-but-good entry
+    if results:
+        cache_results(product_query, lat, lon, results, platforms)
+    return results
+
+def scrape_coalesced(product_query, lat, lon, platforms=None, deadline=None):
+    """Fetch a cache miss, sharing one upstream call across identical requests"""
+    doc_id, _ = make_cache_key(product_query, lat, lon, bucket_precision(platforms))
+    wait = SINGLEFLIGHT_WAIT_SECONDS if deadline is None else min(SINGLEFLIGHT_WAIT_SECONDS, deadline.remaining())
+    try:
+        return SCRAPE_FLIGHTS.do(
+            doc_id, fetch_and_cache, product_query, lat, lon, platforms, deadline,
+            timeout=wait
+        )
+    except SingleFlightTimeout as e:
+        logging.warning(f"{str(e)}; scraping directly")
+        try:
+            return scrape_quickcompare(product_query, lat, lon, deadline)
+        except Exception as error:
+            return fallback_results(product_query, error)
+
+async def fetch_and_cache_async(product_query, lat, lon, platforms=None, deadline=None):
+    """``fetch_and_cache`` for the event loop; the Cosmos write happens in the background"""
+    doc_id, _ = make_cache_key(product_query, lat, lon, bucket_precision(platforms))
+    entry = L1_CACHE.get(doc_id)
+    if entry is not None and not is_stale(entry[1]):
+        return entry[0]
+    try:
+        results = await scrape_quickcompare_async(product_query, lat, lon, deadline)
+    except Exception as e:
+        # The snapshot index reads files; keep that off the loop
+        return await asyncio.to_thread(fallback_results, product_query, e)
+    if results:
+        cache_results_in_background(product_query, lat, lon, results, platforms)
+    return results
+
+async def scrape_coalesced_async(product_query, lat, lon, platforms=None, deadline=None):
+    """Fetch a cache miss, sharing one upstream call across identical requests on this worker"""
+    doc_id, _ = make_cache_key(product_query, lat, lon, bucket_precision(platforms))
+    wait = SINGLEFLIGHT_WAIT_SECONDS if deadline is None else min(SINGLEFLIGHT_WAIT_SECONDS, deadline.remaining())
+    try:
+        return await ASYNC_SCRAPE_FLIGHTS.do(
+            doc_id, fetch_and_cache_async, product_query, lat, lon, platforms, deadline,
+            timeout=wait
+        )
+    except SingleFlightTimeout as e:
+        # The shared fetch keeps running for the next request; answer this one from a snapshot
+        return await asyncio.to_thread(fallback_results, product_query, e)
+
+def iter_batch_results(queries, lat, lon, platforms=None):
+    """Yield ``(query, results)`` for a batch: cache hits first, then scraped misses as they finish"""
+    cached = get_cached_batch(queries, lat, lon, platforms)
+    for query, (results, stale) in cached.items():
+        if stale:
+            record_metric('cache_stale_served')
+            schedule_refresh(query, lat, lon, platforms)
+        yield query, filter_platforms(results, platforms)
+
+    misses = [query for query in queries if query not in cached]
+    if not misses:
+        return
+    deadline = Deadline(BATCH_DEADLINE_SECONDS)
+    with ThreadPoolExecutor(max_workers=min(BATCH_SCRAPE_WORKERS, len(misses))) as executor:
+        futures = {
+            executor.submit(scrape_coalesced, query, lat, lon, platforms, deadline): query
+            for query in misses
+        }
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                logging.error(f"Batch scrape error for '{futures[future]}': {str(e)}")
+                results = []
+            yield futures[future], filter_platforms(results, platforms)
+
+def schedule_refresh(product_query, lat, lon, platforms=None):
+    """Refresh a stale entry in the background, at most once per key at a time"""
+    doc_id, _ = make_cache_key(product_query, lat, lon, bucket_precision(platforms))
+    with _refresh_lock:
+        if doc_id in _refreshing:
+            return
+        _refreshing.add(doc_id)
+    record_metric('cache_refreshes_scheduled')
+
+    def refresh():
+        try:
+            scrape_coalesced(product_query, lat, lon, platforms)
+        except Exception as e:
+            logging.error(f"Background refresh error: {str(e)}")
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(doc_id)
+
+    REFRESH_EXECUTOR.submit(refresh)
+
+def schedule_refresh_async(product_query, lat, lon, platforms=None):
+    """``schedule_refresh`` as a background task on the event loop"""
+    doc_id, _ = make_cache_key(product_query, lat, lon, bucket_precision(platforms))
+    with _refresh_lock:
+        if doc_id in _refreshing:
+            return
+        _refreshing.add(doc_id)
+    record_metric('cache_refreshes_scheduled')
+
+    async def refresh():
+        try:
+            await scrape_coalesced_async(product_query, lat, lon, platforms)
+        except Exception as e:
+            logging.error(f"Background refresh error: {str(e)}")
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(doc_id)
+
+    run_in_background(refresh())
+
 def process_api_response(data):
     """Process API response with validation"""
     results = []
@@ -109,18 +513,21 @@ def validate_and_process_item(item):
         logging.warning(f"Invalid item structure: {str(e)}")
         return None
 
-def get_image_url(item):
-    """Safe image URL extraction"""
-    return (
-        extract_image_from_html(item.get("html", "")) 
-        or next(iter(item.get("images", [])), "")
-    )
+def filter_platforms(results, platforms):
+    """Keep only results from the requested platforms (all when none given)"""
+    if not platforms:
+        return results
+    wanted = {str(p).lower() for p in platforms}
+    return [r for r in results if str(r.get('platform', '')).lower() in wanted]
 
 app = func.FunctionApp()
 
 @app.function_name(name="QuickCompareScraper")
 @app.route(route="scrape", auth_level=func.AuthLevel.FUNCTION)
-def quick_compare_scraper(req: func.HttpRequest) -> func.HttpResponse:
+async def quick_compare_scraper(req: func.HttpRequest) -> func.HttpResponse:
+    """Price one query. Async end to end, so one worker interleaves many
+    requests while they wait on Cosmos DB and the upstream; the cache write
+    finishes after the response is returned."""
     logging.info('Python HTTP trigger function processed a request.')
 
     try:
@@ -128,17 +535,81 @@ def quick_compare_scraper(req: func.HttpRequest) -> func.HttpResponse:
         product_query = req_body.get('query', '').strip()
         lat = float(req_body.get('lat', 19.0760))
         lon = float(req_body.get('lon', 72.8777))
+        # Optional platform filter; it also lets next-day-only requests use
+        # a coarser, more widely shared location bucket
+        platforms = req_body.get('platforms') or None
         
         if not product_query:
             return func.HttpResponse("Product query required", status_code=400)
 
-        if cached := get_cached_results(product_query, lat, lon):
-            return func.HttpResponse(json.dumps(cached), mimetype="application/json")
+        cached, stale = await get_cached_results_async(product_query, lat, lon, platforms)
+        if cached:
+            if stale:
+                record_metric('cache_stale_served')
+                schedule_refresh_async(product_query, lat, lon, platforms)
+            return func.HttpResponse(json.dumps(filter_platforms(cached, platforms)), mimetype="application/json")
 
-        results = scrape_quickcompare(product_query, lat, lon)
-        cache_results(product_query, lat, lon, results)
-        return func.HttpResponse(json.dumps(results), mimetype="application/json")
+        results = await scrape_coalesced_async(product_query, lat, lon, platforms)
+        return func.HttpResponse(json.dumps(filter_platforms(results, platforms)), mimetype="application/json")
 
     except Exception as e:
         logging.error(f"Request processing error: {str(e)}")
         return func.HttpResponse(f"Error: {str(e)}", status_code=500)
+
+
+@app.function_name(name="QuickCompareBatchScraper")
+@app.route(route="scrape/batch", methods=["POST"], auth_level=func.AuthLevel.FUNCTION)
+def quick_compare_batch_scraper(req: func.HttpRequest) -> func.HttpResponse:
+    """Price a whole cart in one call.
+
+    Body: ``{"queries": [...], "lat": ..., "lon": ..., "platforms": [...]}``.
+    Returns ``{query: results}``, or with ``?format=ndjson`` the same
+    results newline-delimited, buffered: one ``{"query": ..., "results":
+    [...]}`` line per query in completion order, sent together once the
+    whole batch is done (``func.HttpResponse`` takes a complete body), so
+    clients cannot render lines as they arrive.
+    """
+    logging.info('Python HTTP trigger function processed a batch request.')
+
+    try:
+        req_body = req.get_json()
+        queries = list(dict.fromkeys(
+            q.strip() for q in req_body.get('queries', []) if isinstance(q, str) and q.strip()
+        ))
+        lat = float(req_body.get('lat', 19.0760))
+        lon = float(req_body.get('lon', 72.8777))
+        platforms = req_body.get('platforms') or None
+
+        if not queries:
+            return func.HttpResponse("Product queries required", status_code=400)
+        if len(queries) > MAX_BATCH_QUERIES:
+            return func.HttpResponse(f"At most {MAX_BATCH_QUERIES} queries per batch", status_code=400)
+
+        record_metric('batch_requests')
+        record_metric('batch_queries', len(queries))
+        batch = iter_batch_results(queries, lat, lon, platforms)
+
+        if req.params.get('format') == 'ndjson':
+            body = ''.join(
+                json.dumps({'query': query, 'results': results}) + '\n' for query, results in batch
+            )
+            return func.HttpResponse(body, mimetype="application/x-ndjson")
+        return func.HttpResponse(json.dumps(dict(batch)), mimetype="application/json")
+
+    except Exception as e:
+        logging.error(f"Batch request processing error: {str(e)}")
+        return func.HttpResponse(f"Error: {str(e)}", status_code=500)
+
+
+@app.function_name(name="QuickCompareMetrics")
+@app.route(route="metrics", methods=["GET"], auth_level=func.AuthLevel.FUNCTION)
+def quick_compare_metrics(req: func.HttpRequest) -> func.HttpResponse:
+    """Report process-level cache, connection and upstream health counters for this worker"""
+    metrics = get_metrics()
+    metrics.update(cache_hit_rates(metrics))
+    metrics.update({f'l1_{name}': value for name, value in L1_CACHE.stats().items()})
+    metrics.update({f'singleflight_{name}': value for name, value in SCRAPE_FLIGHTS.stats().items()})
+    metrics.update({f'async_singleflight_{name}': value for name, value in ASYNC_SCRAPE_FLIGHTS.stats().items()})
+    metrics.update({f'upstream_{name}': value for name, value in UPSTREAM_CALLER.stats().items()})
+    metrics['background_tasks_pending'] = len(_background_tasks)
+    return func.HttpResponse(json.dumps(metrics), mimetype="application/json")
@@ -0,0 +1,71 @@
+"""Product image extraction shared by the Azure Function and the Streamlit pages.
+
+QuickCompare returns each product card as an HTML snippet whose product
+image is the ``<img>`` carrying ``PRODUCT_IMAGE_CLASS``. Building a DOM for
+every item only to read one attribute is by far the most expensive step of
+processing a response, so tags are scanned with a precompiled regex instead.
+A streaming ``html.parser`` pass is kept as a fallback for markup the regex
+cannot make sense of.
+"""
+import re
+from html import unescape
+from html.parser import HTMLParser
+
+PRODUCT_IMAGE_CLASS = 'h-24 w-full bg-transparent object-contain gap-2'
+
+# An <img> start tag, allowing '>' inside quoted attribute values
+_IMG_TAG = re.compile(r'''<img\b((?:[^>"']|"[^"]*"|'[^']*')*)>''', re.IGNORECASE)
+_ATTRIBUTE = re.compile(r'''([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?''')
+
+
+def _attributes(attr_text):
+    """Parse the attribute section of a start tag into a dict"""
+    attrs = {}
+    for name, double, single, bare in _ATTRIBUTE.findall(attr_text):
+        attrs.setdefault(name.lower(), unescape(double or single or bare))
+    return attrs
+
+
+def _is_product_image(attrs):
+    return ' '.join(attrs.get('class', '').split()) == PRODUCT_IMAGE_CLASS
+
+
+class _ProductImageParser(HTMLParser):
+    """Event-based fallback that stops at the first product image"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.src = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.src is None and tag == 'img':
+            attrs = {name: value or '' for name, value in attrs}
+            if _is_product_image(attrs) and attrs.get('src'):
+                self.src = attrs['src']
+
+
+def extract_image_from_html(html_snippet):
+    """Extract image URL from product HTML snippet"""
+    if not html_snippet or '<img' not in html_snippet.lower():
+        return ""
+
+    for match in _IMG_TAG.finditer(html_snippet):
+        attrs = _attributes(match.group(1))
+        if _is_product_image(attrs) and attrs.get('src'):
+            return attrs['src']
+
+    # Only pay for a real parse when the class is present but the regex missed it
+    if 'object-contain' not in html_snippet:
+        return ""
+    parser = _ProductImageParser()
+    parser.feed(html_snippet)
+    parser.close()
+    return parser.src or ""
+
+
+def get_image_url(item):
+    """Image from the item's HTML snippet, falling back to its ``images`` array"""
+    return (
+        extract_image_from_html(item.get("html", ""))
+        or next(iter(item.get("images", [])), "")
+    )
@@ -0,0 +1,309 @@
+"""Invoice PDF parsing and parallel ingestion for the bill upload page.
+
+Parsing lives in this importable module (not the Streamlit page) so worker
+processes can run it. Files are keyed by the SHA-256 of their bytes: an
+invoice that was already parsed, e.g. re-sent by a Streamlit rerun, is
+served from ``INVOICE_CACHE`` without touching the process pool.
+
+Each PDF is read a page at a time: the item table is followed across pages
+according to the first matching entry in ``INVOICE_LAYOUTS``, and a page's
+parsed objects are released before the next one is opened.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import threading
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import pdfplumber
+
+from ttl_cache import TTLCache
+
+# Worker processes for parsing; 0 or 1 parses inline
+INVOICE_PARSE_WORKERS = int(os.environ.get('INVOICE_PARSE_WORKERS', min(os.cpu_count() or 1, 8)))
+
+# Parsed items by PDF content hash
+INVOICE_CACHE = TTLCache(
+    max_entries=int(os.environ.get('INVOICE_CACHE_MAX_ENTRIES', 512)),
+    ttl=int(os.environ.get('INVOICE_CACHE_TTL_SECONDS', 86400))
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def parse_weight_unit(text):
+    match = re.search(r'(\d+(?:\.\d+)?)\s*(kg|g|ml|l|L)\b', text, re.IGNORECASE)
+    if match:
+        value = float(match.group(1))
+        unit = match.group(2).lower()
+        cleaned = re.sub(r',?\s*\d+(?:\.\d+)?\s*(kg|g|ml|l|L)\b', '', text, flags=re.IGNORECASE).strip().rstrip(',')
+        return value, unit, cleaned
+    return None, None, text.strip().rstrip(',')
+
+
+def extract_brand(name):
+    match = re.search(r'by\s+(.+?)(?:,|$)', name, re.IGNORECASE)
+    return match.group(1).strip() if match else name.split()[0] if name else ""
+
+
+def remove_brand_from_name(name, brand):
+    name = re.sub(r'by\s+.+?(,|$)', '', name, flags=re.IGNORECASE).strip()
+    return name[len(brand):].strip(" ,") if name.lower().startswith(brand.lower()) else name.strip()
+
+
+class InvoiceLayout:
+    """How one invoice format lays out its item table.
+
+    The table starts after a line beginning with one of ``start`` and ends
+    at a line beginning with one of ``end``; it may run over several pages,
+    repeating its header (``skip`` prefixes) on each. ``row`` matches an
+    item line with ``name`` and ``qty`` groups and an optional ``price``
+    group holding the line amount. ``sample`` is an example item line and
+    the fields it must parse to, checked on registration.
+    """
+
+    def __init__(self, name, start, end, row, skip=(), sample=None):
+        self.name = name
+        self.start = tuple(start)
+        self.end = tuple(end)
+        self.row = re.compile(row)
+        self.skip = tuple(skip)
+        self.sample = sample
+
+    def parse_row(self, line):
+        """Cart item for one table line, or None if it is not an item row"""
+        m = self.row.match(line)
+        if not m:
+            return None
+        qty = int(float(m.group('qty')))
+        price = m.groupdict().get('price')
+        value, unit, name = parse_weight_unit(m.group('name'))
+        brand = extract_brand(name)
+        name_cleaned = remove_brand_from_name(name, brand)
+        return {
+            "product_title": name_cleaned,
+            "brand": brand,
+            "quantity": f"{int(value)} {unit}" if value and unit else str(qty),
+            "lock_brand": False,
+            "lock_qty": False,
+            "units": qty,
+            "price": float(price.replace(',', '')) if price else None
+        }
+
+
+# Known invoice layouts, tried in registration order
+INVOICE_LAYOUTS = {}
+
+
+def register_layout(layout):
+    """Add (or replace) a layout in the registry; raises ValueError if it misreads its sample"""
+    if layout.sample is not None:
+        line, expected = layout.sample
+        item = layout.parse_row(line) or {}
+        wrong = {key: item.get(key) for key, value in expected.items() if item.get(key) != value}
+        if wrong:
+            raise ValueError(f"Invoice layout {layout.name!r} reads {line!r} as {wrong}, expected {expected}")
+    INVOICE_LAYOUTS[layout.name] = layout
+    return layout
+
+
+# Food delivery style bills: "FOOD ITEMS" ... "Summary", rows carry a long HSN code
+# and end in the line amount, after the rate and any taxes
+register_layout(InvoiceLayout(
+    'food_items',
+    start=('FOOD ITEMS',),
+    end=('Summary',),
+    row=r'\s*\d+\s+(?P<name>.+?)\s+\d{8,}\s+(?P<qty>\d+)\s+(?:.*?(?P<price>\d[\d,]*(?:\.\d+)?)(?!.*\d))?',
+    skip=('S. No', 'Item'),
+    sample=('1 Sugar 1 kg by Madhur 17019990 2 @ 250.00 ₹ 1,000.00',
+            {'product_title': 'Sugar', 'quantity': '1 kg', 'units': 2, 'price': 1000.0}),
+))
+
+# Generic tax invoices: "Sr. No  Description  Qty  Rate  Amount" ... "Total"
+register_layout(InvoiceLayout(
+    'itemized',
+    start=('Sr. No', 'Sr No', 'S.No', 'Sl. No'),
+    end=('Sub Total', 'Subtotal', 'Total', 'Grand Total'),
+    row=r'\s*\d+\s+(?P<name>.+?)\s+(?P<qty>\d+(?:\.\d+)?)\s+(?:Rs\.?|₹)?\s*[\d,]+(?:\.\d+)?\s+(?:Rs\.?|₹)?\s*(?P<price>[\d,]+(?:\.\d+)?)\s*$',
+    skip=('Sr. No', 'Sr No', 'S.No', 'Sl. No', 'Description'),
+    sample=('1 Toor Dal 500 g by Tata Sampann 3 Rs. 120.00 Rs. 360.00',
+            {'product_title': 'Toor Dal', 'quantity': '500 g', 'units': 3, 'price': 360.0}),
+))
+
+
+# "Invoice Date: 12-03-2025", "Order date 12 Mar 2025", "Bill Date - 2025-03-12"
+_INVOICE_DATE = re.compile(r'(?:invoice|order|bill)\s*date\s*[:\-]?\s*(.+)', re.IGNORECASE)
+_DATE_FORMATS = ('%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y', '%Y-%m-%d', '%d-%m-%y', '%d/%m/%y',
+                 '%d %b %Y', '%d-%b-%Y', '%d %B %Y', '%b %d, %Y', '%B %d, %Y', '%b %d %Y')
+
+
+def parse_invoice_date(line):
+    """ISO date from an "Invoice/Order/Bill Date ..." line, or None"""
+    m = _INVOICE_DATE.search(line)
+    if not m:
+        return None
+    words = m.group(1).replace(',', ', ').split()
+    # The date is the first one to three words after the label
+    for size in (3, 2, 1):
+        candidate = ' '.join(words[:size]).replace(' ,', ',').rstrip(',')
+        for fmt in _DATE_FORMATS:
+            try:
+                return datetime.strptime(candidate, fmt).date().isoformat()
+            except ValueError:
+                continue
+    return None
+
+
+def iter_invoice_items(page_texts, layouts=None, meta=None):
+    """Stream cart items from an invoice's page texts, one page at a time.
+
+    The first layout whose start marker appears picks the format; the item
+    table is then followed across pages (skipping repeated headers) until
+    its end marker, after which the remaining pages are not read. The
+    invoice date, if one is printed before that, is stored in ``meta``.
+    """
+    layouts = list(INVOICE_LAYOUTS.values()) if layouts is None else list(layouts)
+    meta = {} if meta is None else meta
+    layout = None
+    for text in page_texts:
+        for line in (text or '').split('\n'):
+            stripped = line.strip()
+            if 'invoice_date' not in meta:
+                date = parse_invoice_date(stripped)
+                if date:
+                    meta['invoice_date'] = date
+            if layout is None:
+                layout = next((l for l in layouts if stripped.startswith(l.start)), None)
+                continue
+            if stripped.startswith(layout.end):
+                return
+            if not stripped or stripped.startswith(layout.skip):
+                continue
+            item = layout.parse_row(line)
+            if item is not None:
+                yield item
+
+
+def parse_invoice_text(text, layouts=None):
+    """Cart items from an invoice's text, first of each title"""
+    return unique_items(iter_invoice_items([text], layouts))
+
+
+def unique_items(items):
+    """One item per product title, in order; repeated lines add their units and price"""
+    seen = {}
+    for item in items:
+        first = seen.setdefault(item["product_title"], item)
+        if first is not item:
+            first["units"] = first.get("units", 0) + item.get("units", 0)
+            if first.get("price") is not None and item.get("price") is not None:
+                first["price"] += item["price"]
+    return list(seen.values())
+
+
+def iter_page_texts(pdf):
+    """Text of each page, releasing the page's parsed objects before the next"""
+    for page in pdf.pages:
+        try:
+            yield page.extract_text() or ''
+        finally:
+            page.close()
+
+
+def parse_invoice_bytes(content):
+    """Cart items from one invoice PDF, across all its pages; raises on unreadable files.
+
+    Each item also carries ``units``, ``price`` and the ``invoice_date``
+    (ISO string, or None when the invoice prints none).
+    """
+    meta = {}
+    with pdfplumber.open(io.BytesIO(content)) as pdf:
+        items = unique_items(iter_invoice_items(iter_page_texts(pdf), meta=meta))
+    for item in items:
+        item["invoice_date"] = meta.get("invoice_date")
+    return items
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def get_pool():
+    """Process pool shared by every session, created on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Spawned workers: forking the threaded Streamlit server is unsafe
+                _pool = ProcessPoolExecutor(
+                    max_workers=INVOICE_PARSE_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _pool
+
+
+def discard_pool(pool):
+    """Forget a broken pool so the next ingestion starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse_and_cache(key, content):
+    items = parse_invoice_bytes(content)
+    INVOICE_CACHE.set(key, items)
+    return items
+
+
+def ingest_invoices(files, max_workers=INVOICE_PARSE_WORKERS):
+    """Parse invoices in parallel, yielding ``(name, key, items, error)`` as each finishes.
+
+    ``files`` are ``(name, content_bytes)`` pairs; ``key`` is the file's
+    ``content_hash``, which identifies it even when names repeat. Cached and duplicate
+    files are yielded first; the rest are parsed on the process pool (or
+    inline when only one needs parsing or ``max_workers`` <= 1).
+    """
+    pending = {}
+    for name, content in files:
+        key = content_hash(content)
+        items = INVOICE_CACHE.get(key)
+        if items is not None:
+            yield name, key, items, None
+        else:
+            pending.setdefault(key, (content, []))[1].append(name)
+
+    if len(pending) <= 1 or max_workers <= 1:
+        for key, (content, names) in pending.items():
+            try:
+                items, error = _parse_and_cache(key, content), None
+            except Exception as e:
+                items, error = [], e
+            for name in names:
+                yield name, key, items, error
+        return
+
+    pool = get_pool()
+    futures = {pool.submit(parse_invoice_bytes, content): key for key, (content, _) in pending.items()}
+    for future in as_completed(futures):
+        key = futures[future]
+        try:
+            items, error = future.result(), None
+            INVOICE_CACHE.set(key, items)
+        except BrokenProcessPool:
+            # A worker died (or could not start): parse this file here instead
+            discard_pool(pool)
+            try:
+                items, error = _parse_and_cache(key, pending[key][0]), None
+            except Exception as e:
+                items, error = [], e
+        except Exception as e:
+            items, error = [], e
+        for name in pending[key][1]:
+            yield name, key, items, error
@@ -0,0 +1,79 @@
+"""One-off migration of the legacy ProductCache container to ProductCacheV2.
+
+Legacy documents are keyed ``{query}_{lat}_{lon}`` and partitioned on their
+id, so every lookup had to be a cross-partition query. This script creates
+the partitioned container if needed and re-keys every unexpired legacy entry
+with ``cache_keys.make_cache_key``, keeping its original timestamp and the
+remainder of its 24h TTL.
+
+Usage:
+    COSMOS_ENDPOINT=... COSMOS_KEY=... python migrate_cache.py [--dry-run]
+"""
+import argparse
+import logging
+from datetime import datetime
+
+from azure.cosmos import PartitionKey
+
+from cache_keys import make_cache_key, normalize_query, parse_legacy_id
+from function_app import (
+    CACHE_TTL_SECONDS, CONTAINER_NAME, DATABASE_NAME, LEGACY_CONTAINER_NAME,
+    PARTITION_KEY_PATH, get_cosmos_client,
+)
+
+
+def convert_legacy_entry(entry, now=None):
+    """Build the V2 document for a legacy entry, or None if it has expired"""
+    now = now or datetime.now()
+    age = (now - datetime.fromisoformat(entry['timestamp'])).total_seconds()
+    remaining_ttl = int(CACHE_TTL_SECONDS - age)
+    if remaining_ttl <= 0:
+        return None
+
+    query, lat, lon = parse_legacy_id(entry['id'])
+    doc_id, partition_key = make_cache_key(query, lat, lon)
+    return {
+        'id': doc_id,
+        'pk': partition_key,
+        'query': normalize_query(query),
+        'lat': lat,
+        'lon': lon,
+        'timestamp': entry['timestamp'],
+        'results': entry['results'],
+        'ttl': remaining_ttl
+    }
+
+
+def migrate(dry_run=False):
+    database = get_cosmos_client().get_database_client(DATABASE_NAME)
+    legacy = database.get_container_client(LEGACY_CONTAINER_NAME)
+    target = database.create_container_if_not_exists(
+        id=CONTAINER_NAME,
+        partition_key=PartitionKey(path=PARTITION_KEY_PATH),
+        default_ttl=CACHE_TTL_SECONDS
+    )
+
+    migrated = skipped = 0
+    for entry in legacy.read_all_items():
+        try:
+            document = convert_legacy_entry(entry)
+        except (KeyError, ValueError) as e:
+            logging.warning(f"Skipping malformed entry {entry.get('id')}: {str(e)}")
+            document = None
+
+        if document is None:
+            skipped += 1
+            continue
+        if not dry_run:
+            target.upsert_item(document)
+        migrated += 1
+
+    logging.info(f"Migrated {migrated} entries, skipped {skipped}")
+    return migrated, skipped
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help="Convert entries without writing them")
+    migrate(dry_run=parser.parse_args().dry_run)
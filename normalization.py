@@ -0,0 +1,159 @@
+"""Product name, quantity and price normalization shared by the compare pages.
+
+Everything here is pure and deterministic, so the hot functions are memoized:
+the same product names and pack sizes recur across platforms and reruns.
+"""
+import re
+from functools import lru_cache
+
+EXCLUDE_KEYWORDS = ('special', 'rich', 'flavourful', 'roasted', 'salted',
+                    'mini', 'tasty', 'healthy', 'classic', 'organic', 'new',
+                    'soft', 'fluffy', 'roti', 'chakki', 'refined', 'box', 'combo')
+
+# Pack-size units mapped to (factor, base unit). Volumes stay in ml and are
+# compared like grams; anything unrecognised is counted in units.
+UNITS = {
+    '': (1.0, 'g'),
+    'mg': (0.001, 'g'),
+    'g': (1.0, 'g'), 'gm': (1.0, 'g'), 'gms': (1.0, 'g'), 'gram': (1.0, 'g'), 'grams': (1.0, 'g'),
+    'kg': (1000.0, 'g'), 'kgs': (1000.0, 'g'),
+    'ml': (1.0, 'ml'),
+    'l': (1000.0, 'ml'), 'lt': (1000.0, 'ml'), 'ltr': (1000.0, 'ml'),
+    'litre': (1000.0, 'ml'), 'litres': (1000.0, 'ml'), 'liter': (1000.0, 'ml'), 'liters': (1000.0, 'ml'),
+}
+
+_WHITESPACE = re.compile(r'\s+')
+_PARENTHESES = re.compile(r'\([^)]*\)')
+_FREE = re.compile(r'\bfree\b')
+_NUMBER = re.compile(r'\d[\d,]*(?:\.\d+)?|\.\d+')
+# "(₹ 0.30 / 1 gm)", "48.5/100 g": a price per stated quantity
+_UNIT_RATE = re.compile(r'(\d[\d,]*(?:\.\d+)?|\.\d+)\s*/\s*([^)]*)')
+# [M x] N unit [x M [u]], e.g. "500 g", "2 x 200 g", "1 kg x 2", "125 g x 3 u"
+_QUANTITY_TERM = re.compile(
+    r'^(?:(\d+(?:\.\d+)?)\s*x\s*)?(\d+(?:\.\d+)?)\s*([a-z]*)\s*(?:x\s*(\d+(?:\.\d+)?)\s*(?:u|units?)?)?$'
+)
+
+PRICE_KEYS = ('offer_price', 'unit_level_price', 'mrp')
+
+
+def _exclude_patterns(exclude_keywords):
+    """Compile keywords into one alternation, factored by first letter.
+
+    Longest keywords go first so overlaps resolve as removing each keyword in
+    turn would. Returns ``(lowercase, any_case)`` patterns: callers mostly
+    pass lowercased names, and case-sensitive matching is several times faster.
+    """
+    keywords = sorted({kw.lower() for kw in exclude_keywords if kw}, key=len, reverse=True)
+    if not keywords:
+        return None, None
+    groups = {}
+    for kw in keywords:
+        groups.setdefault(kw[0], []).append(re.escape(kw[1:]))
+    alternation = '|'.join(f"{re.escape(first)}(?:{'|'.join(rest)})" for first, rest in groups.items())
+    return re.compile(alternation), re.compile(alternation, re.IGNORECASE)
+
+
+_DEFAULT_EXCLUDE = _exclude_patterns(EXCLUDE_KEYWORDS)
+
+
+@lru_cache(maxsize=8192)
+def _clean_product_name(name, exclude_keywords):
+    lowercase, any_case = (_DEFAULT_EXCLUDE if exclude_keywords == EXCLUDE_KEYWORDS
+                           else _exclude_patterns(exclude_keywords))
+    if lowercase is not None:
+        name = (lowercase if name.islower() else any_case).sub('', name)
+    return _WHITESPACE.sub(' ', name).strip()
+
+
+def clean_product_name(name, exclude_keywords=EXCLUDE_KEYWORDS):
+    """Remove exclude keywords (anywhere in the name, any case) and extra spaces"""
+    return _clean_product_name(name, tuple(exclude_keywords))
+
+
+@lru_cache(maxsize=4096)
+def parse_quantity_unit(quantity_str):
+    """Parse a pack size into ``(amount, base_unit)``.
+
+    Base units are ``'g'``, ``'ml'`` or ``'count'``. Multipacks
+    ("2 x 200 g", "1 kg x 2") and bundles ("500 g + 500 g") are totalled.
+    Returns None when nothing usable is found.
+    """
+    if not quantity_str or not isinstance(quantity_str, str):
+        return None
+
+    text = _WHITESPACE.sub(' ', _FREE.sub('', _PARENTHESES.sub('', quantity_str.lower()))).strip()
+    total, base_unit = 0.0, None
+    for term in text.split('+'):
+        match = _QUANTITY_TERM.match(term.strip())
+        if not match:
+            continue
+        before, amount, unit, after = match.groups()
+        factor, unit_base = UNITS.get(unit, (1.0, 'count'))
+        if base_unit is None:
+            base_unit = unit_base
+        elif unit_base != base_unit:
+            continue
+        total += float(amount) * factor * float(before or 1) * float(after or 1)
+
+    if base_unit is None or total <= 0:
+        return None
+    return total, base_unit
+
+
+def parse_quantity(quantity_str):
+    """Pack size in base units (grams, millilitres or count), or None"""
+    parsed = parse_quantity_unit(quantity_str)
+    return parsed[0] if parsed else None
+
+
+def to_price(value):
+    """The first number in a price value as a float, or None when it holds none.
+
+    Currency symbols and thousands separators are skipped, so "₹1,299.00"
+    is 1299.0 and "(₹ 12.50 / 100 g)" is 12.5.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = _NUMBER.search(str(value))
+    return float(match.group().replace(',', '')) if match else None
+
+
+@lru_cache(maxsize=4096)
+def unit_rate_price(rate, quantity):
+    """Price of a ``quantity`` pack at a per-unit ``rate`` such as "(₹ 0.30 / 1 gm)".
+
+    Returns None when the rate does not state its unit or the pack size is
+    not in the same base unit.
+    """
+    match = _UNIT_RATE.search(str(rate))
+    if not match:
+        return None
+    per = parse_quantity_unit(match.group(2) if any(c.isdigit() for c in match.group(2))
+                              else '1 ' + match.group(2))
+    pack = parse_quantity_unit(quantity)
+    if not per or not pack or per[1] != pack[1]:
+        return None
+    return float(match.group(1).replace(',', '')) * pack[0] / per[0]
+
+
+def key_price(item, key):
+    """An item's price under one of ``PRICE_KEYS`` as a pack price, or None.
+
+    ``unit_level_price`` is a per-unit rate, so it is scaled to the item's
+    pack size; a bare value without a unit is not used.
+    """
+    value = item.get(key)
+    if value is None:
+        return None
+    if key == 'unit_level_price':
+        return unit_rate_price(value, item.get('quantity')) if isinstance(value, str) else None
+    return to_price(value)
+
+
+def get_price(item):
+    """First positive price among ``PRICE_KEYS``, or None"""
+    for key in PRICE_KEYS:
+        price = key_price(item, key)
+        if price is not None and price > 0:
+            return price
+    return None
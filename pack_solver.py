@@ -0,0 +1,166 @@
+"""Cheapest combination of pack sizes covering a requested quantity.
+
+A bill asks for e.g. "5 kg" of sugar, but the cheapest per-gram pack on a
+platform may be 1 kg, or 2 x 2 kg + 1 x 1 kg may beat a single 5 kg bag.
+Pack variants of one product are linked through the ``siblings`` ids in the
+upstream data; for each sibling group the solver runs an unbounded covering
+knapsack (buy at least the requested amount at minimum cost). Tables are
+small (a few hundred steps of the pack sizes' gcd) and cheap next to
+grouping the records, so each one is built for the line that needs it.
+"""
+from functools import reduce
+from math import gcd, inf
+
+from normalization import parse_quantity_unit
+
+# Largest DP table (in pack-size gcd steps) built for one product
+MAX_TABLE_STEPS = 4096
+
+
+def target_quantity(quantity):
+    """``(amount, base_unit)`` for a cart quantity, or None without an explicit unit"""
+    if not isinstance(quantity, str) or not any(c.isalpha() for c in quantity):
+        return None
+    return parse_quantity_unit(quantity)
+
+
+def sibling_groups(records):
+    """Records grouped by connected ``sku_id``/``siblings`` links (same platform only)"""
+    parent = {}
+
+    def find(key):
+        while parent.setdefault(key, key) != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for index, record in enumerate(records):
+        node = (record['platform'], record.get('sku_id') or f'#{index}')
+        for sibling in record.get('siblings') or ():
+            parent[find((record['platform'], sibling))] = find(node)
+        find(node)
+
+    groups = {}
+    for index, record in enumerate(records):
+        root = find((record['platform'], record.get('sku_id') or f'#{index}'))
+        groups.setdefault(root, []).append(record)
+    return list(groups.values())
+
+
+def _cover_table(sizes, prices, steps):
+    """``cost[q]``/``choice[q]``: cheapest packs adding up to at least ``q`` steps"""
+    cost, choice = [0.0] * (steps + 1), [-1] * (steps + 1)
+    packs = list(enumerate(zip(sizes, prices)))
+    for q in range(1, steps + 1):
+        best, pick = inf, -1
+        for i, (size, price) in packs:
+            total = price + cost[q - size] if q > size else price
+            if total < best:
+                best, pick = total, i
+        cost[q], choice[q] = best, pick
+    return cost, choice
+
+
+def solve_packs(packs, amount):
+    """Cheapest pack counts whose sizes add up to at least ``amount``.
+
+    ``packs`` is a list of ``(size, price)``; returns ``(price, counts)`` with
+    one count per pack, or None when the table would exceed MAX_TABLE_STEPS.
+    """
+    if not packs or amount <= 0:
+        return None
+    sizes = [max(1, round(size)) for size, _ in packs]
+    if len(packs) == 1:
+        count = -(-round(amount) // sizes[0])
+        return count * float(packs[0][1]), [count]
+    step = reduce(gcd, sizes)
+    steps = -(-round(amount) // step)
+    if steps > MAX_TABLE_STEPS:
+        return None
+
+    # Canonical order so ties break the same way whatever the listing order
+    order = sorted(range(len(packs)), key=lambda i: (sizes[i], packs[i][1]))
+    cost, choice = _cover_table(
+        [sizes[i] // step for i in order], [float(packs[i][1]) for i in order], steps
+    )
+    counts = [0] * len(packs)
+    q = steps
+    while q > 0:
+        pick = choice[q]
+        counts[order[pick]] += 1
+        q -= sizes[order[pick]] // step
+    return cost[steps], counts
+
+
+def cheapest_combination(records, quantity):
+    """Cheapest way to buy ``quantity`` from one platform's records.
+
+    Returns ``{'price', 'amount', 'unit', 'packs': [(record, count), ...]}``
+    over all sibling groups, or None if no pack is in the requested unit.
+    """
+    target = target_quantity(quantity)
+    if target is None:
+        return None
+    amount, unit = target
+
+    # One pack per distinct size per group, the cheapest listing of it
+    candidates = []
+    for group in sibling_groups(records):
+        by_size = {}
+        for record in group:
+            parsed = parse_quantity_unit(record.get('quantity'))
+            if not parsed or parsed[1] != unit or not record.get('price') or record['price'] <= 0:
+                continue
+            size = round(parsed[0])
+            if size and (size not in by_size or record['price'] < by_size[size]['price']):
+                by_size[size] = record
+        if by_size:
+            # No combination costs less than the amount at the group's best unit price
+            bound = amount * min(record['price'] / size for size, record in by_size.items())
+            candidates.append((bound, list(by_size.items())))
+    candidates.sort(key=lambda candidate: candidate[0])
+
+    best = None
+    for bound, packs in candidates:
+        if best is not None and bound >= best['price']:
+            break
+        solved = solve_packs([(size, record['price']) for size, record in packs], amount)
+        if solved is None:
+            continue
+        price, counts = solved
+        if best is None or price < best['price']:
+            best = {
+                'price': price,
+                'amount': sum(size * count for (size, _), count in zip(packs, counts)),
+                'unit': unit,
+                'packs': [(record, count) for (_, record), count in zip(packs, counts) if count],
+            }
+    return best
+
+
+def combination_record(combination):
+    """A page-2 style record for a pack combination, priced for the whole quantity"""
+    record, _ = max(combination['packs'], key=lambda pack: pack[1])
+    description = ' + '.join(f"{count} × {pack['quantity']}" for pack, count in combination['packs'])
+    return {
+        **record,
+        'price': combination['price'],
+        'quantity': description,
+        'grams': combination['amount'],
+        'price_per_g': round(combination['price'] / combination['amount'], 3),
+        'pack_combination': [(pack['quantity'], count) for pack, count in combination['packs']],
+    }
+
+
+def combinations_per_platform(records, quantity, platforms):
+    """``{platform: record}`` with the cheapest combination covering ``quantity`` per platform"""
+    by_platform = {}
+    for record in records:
+        if record['platform'] in platforms:
+            by_platform.setdefault(record['platform'], []).append(record)
+    result = {}
+    for platform in platforms:
+        combination = cheapest_combination(by_platform.get(platform, []), quantity)
+        if combination is not None:
+            result[platform] = combination_record(combination)
+    return result
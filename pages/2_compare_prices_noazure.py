@@ -1,13 +1,28 @@
 import streamlit as st
 import pandas as pd
-import requests
 import re
 import json
 import os
 from PIL import Image
 import io
 from collections import defaultdict
-from bs4 import BeautifulSoup
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from image_extraction import get_image_url
+import numpy as np
+from ranking import (candidate_columns, clean_titles, isin, parse_prices, parse_quantities,
+                     select, title_platforms, to_records, top_per_platform)
+from pack_solver import combinations_per_platform
+from product_matcher import match_listings
+from query_memo import QueryMemo
+from resilience import OPEN, Deadline
+from snapshot_index import SnapshotIndex
+from upstream import UPSTREAM_CALLER, fetch_qc_results
+
+# Upper bound on simultaneous upstream lookups while rendering a cart
+MAX_CONCURRENT_LOOKUPS = int(os.environ.get('QC_MAX_CONCURRENT_LOOKUPS', 8))
+# Time all of a cart's lookups may take together, retries included
+CART_DEADLINE_SECONDS = float(os.environ.get('QC_CART_DEADLINE_SECONDS', 30))
 
 PLATFORM_CONFIG = {
     'Blinkit': {'delivery_time': 15, 'logo': "https://d2chhaxkq6tvay.cloudfront.net/platforms/blinkit.webp"},
@@ -18,182 +33,101 @@ PLATFORM_CONFIG = {
     'Bigbasket': {'delivery_time': 11, 'logo': "https://d2chhaxkq6tvay.cloudfront.net/platforms/bigbasket.webp"},
 }
 
-def extract_image_from_html(html_snippet):
-    """Extract image URL from product HTML snippet"""
-    soup = BeautifulSoup(html_snippet, 'html.parser')
-    img_tag = soup.find('img', class_='h-24 w-full bg-transparent object-contain gap-2')
-    return img_tag['src'] if img_tag and img_tag.get('src') else ""
+@st.cache_resource
+def get_query_memo():
+    """Per-query results shared by every rerun and session in this server process"""
+    return QueryMemo()
 
 
-def clean_product_name(name, exclude_keywords):
-    """
-    Clean product name using Azure Cognitive Services key phrase extraction
-    and remove exclude keywords.
+@st.cache_resource
+def get_snapshot_index():
+    """Saved snapshots, shown instead of live prices when the upstream fails"""
+    return SnapshotIndex('./data')
+
+
+def fetch_cart_results(queries, lat=19.0760, lon=72.8777, max_workers=MAX_CONCURRENT_LOOKUPS, deadline=None,
+                       platforms=None):
+    """Fetch all cart queries concurrently on a bounded thread pool.
+
+    Each lookup is retried with backoff (see resilience.py) but all of them
+    finish by ``deadline``, so a degraded upstream cannot stall the cart.
+    Listings from platforms outside ``platforms`` are dropped while the
+    response is parsed.
+    Yields ``(query, data, error)`` tuples in completion order, so callers
+    can render each item as soon as its own lookup finishes.
     """
+    if not queries:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(queries)))) as executor:
+        futures = {
+            executor.submit(fetch_qc_results, query, lat, lon, deadline, platforms): query
+            for query in queries
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
 
-    name_clean = name
-    for kw in exclude_keywords:
-        # Remove keyword as a word or part of a word, case-insensitive
-        name_clean = re.sub(r'\b' + re.escape(kw) + r'\b', '', name_clean, flags=re.IGNORECASE)
-        # Also remove keyword if it's part of a phrase
-        name_clean = re.sub(re.escape(kw), '', name_clean, flags=re.IGNORECASE)
-    # Remove extra spaces
-    name_clean = re.sub(r'\s+', ' ', name_clean)
-    return name_clean.strip()
-def parse_quantity(quantity_str):
-    """Convert quantity string to grams with detailed validation"""
-    try:
-        if not quantity_str or not isinstance(quantity_str, str):
-            st.warning(f"Invalid quantity format: {quantity_str}")
-            return None
-        
-        # Extract multiplier and base quantity
-        multiplier = 1.0
-        if 'x' in quantity_str:
-            parts = quantity_str.lower().split('x')
-            if len(parts) != 2:
-                return None
-            multiplier_str = parts[1].strip()
-            multiplier = float(multiplier_str) if multiplier_str else 1.0
-            base_str = parts[0].strip()
-        else:
-            base_str = quantity_str.strip()
-
-        # Parse base quantity
-        if 'kg' in base_str:
-            grams = float(re.sub(r'[^\d.]', '', base_str)) * 1000
-        elif 'g' in base_str:
-            grams = float(re.sub(r'[^\d.]', '', base_str))
-        else:  # Raw number assuming grams
-            grams = float(re.sub(r'[^\d.]', '', base_str))
-        
-        total_grams = grams * multiplier
-        if total_grams <= 0:
-            st.warning(f"Invalid quantity value: {quantity_str}")
-            return None
-            
-        return total_grams
-        
-    except Exception as e:
-        st.error(f"Quantity parsing failed for '{quantity_str}': {str(e)}")
-        return None
-
-def get_price(item):
-    """Get valid price with strict validation"""
-    price_keys = ['offer_price', 'unit_level_price', 'mrp']
-    for key in price_keys:
-        try:
-            raw_value = item.get(key)
-            if raw_value is None:
-                continue
-                
-            # Convert to string and clean
-            price_str = str(raw_value).strip()
-            if not any(c.isdigit() for c in price_str):
-                continue
-                
-            # Extract numeric value
-            price = float(re.sub(r'[^\d.]', '', price_str))
-            if price <= 0:
-                continue
-                
-            return price
-        except Exception as e:
-            continue
-            
-    st.warning(f"No valid price found in {item.get('name')}")
-    return None
-
-def process_platform_data(product_query, lat=19.0760, lon=72.8777):
-    """Process data with enhanced validation"""
-    processed = []
-    exclude_keywords = ['special', 'rich', 'flavourful', 'roasted', 'salted', 
-                       'mini', 'tasty', 'healthy', 'classic', 'organic', 'new', 
-                       'soft', 'fluffy', 'roti', 'chakki', 'refined', 'box', 'combo']
-    
-    # Fetch data with retries
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(
-                "https://yr338c15si.execute-api.ap-south-1.amazonaws.com/getQCResults",
-                params={'lat': lat, 'lon': lon, 'type': 'groupsearch', 'query': product_query},
-                timeout=10
-            )
-            response.raise_for_status()
-            data = response.json()
-            break
-        except Exception as e:
-            if attempt == max_retries - 1:
-                st.error(f"API request failed after {max_retries} attempts: {str(e)}")
-                return []
-            continue
 
+def process_platform_data(product_query, data, warn=st.warning):
+    """Process data with enhanced validation.
+
+    Validation messages go to ``warn``; pass e.g. ``list.append`` to keep
+    them for replaying along with memoized results.
+    """
     if not isinstance(data, list):
         st.error("Invalid API response format")
         return []
 
-    for platform_data in data:
-        if not isinstance(platform_data, dict):
-            continue
-            
-        for item in platform_data.get('data', []):
-            try:
-                # Mandatory fields check
-                if not all(key in item for key in ['name', 'platform', 'quantity']):
-                    continue
-                    
-                # Product name matching
-                item_name = item.get('name', '').lower()
-                if product_query.lower() not in item_name:
-                    continue
-
-                # Price validation
-                price = get_price(item)
-                if price is None:
-                    continue
-                    
-                # Quantity validation
-                quantity = item.get('quantity', '')
-                grams = parse_quantity(quantity)
-                if grams is None or grams <= 0:
-                    continue
-
-                # Image handling
-                html_image = extract_image_from_html(item.get("html", ""))
-                images = item.get("images", [])
-                image_url = html_image or (images[0] if images else "")
-                
-                # Platform validation
-                platform_name = item['platform'].get('name', '').title()
-                if platform_name not in PLATFORM_CONFIG:
-                    continue
-
-                # Name cleaning
-                name = clean_product_name(item['name'].strip().lower(), exclude_keywords)
-                
-                # Price calculation
-                price_per_g = round(price / grams, 3)
-
-                processed.append({
-                    'title': name,
-                    'platform': platform_name,
-                    'platform_logo': PLATFORM_CONFIG[platform_name]['logo'],
-                    'price': price,
-                    'quantity': quantity,
-                    'grams': grams,
-                    'image_url': image_url,
-                    'delivery_time': '1 day' if PLATFORM_CONFIG[platform_name]['delivery_time'] == 1440 
-                                   else f"{PLATFORM_CONFIG[platform_name]['delivery_time']} mins",
-                    'id': f"{platform_name}_{hash(image_url)}_{hash(name)}",
-                    'price_per_g': price_per_g
-                })
+    columns = candidate_columns(data)
 
-            except Exception as e:
-                st.error(f"Error processing item: {str(e)}")
-                continue
+    # Mandatory fields check and ranked, typo-tolerant product name matching
+    matched = np.array([
+        isinstance(name, str) and platform is not None
+        for name, platform in zip(columns['name'], columns['platform'])
+    ], dtype=bool) & np.array(match_listings(product_query, columns['name'], columns['brand']), dtype=bool)
+    columns = select(columns, matched)
+
+    # Price and quantity validation, warnings in item order
+    price = parse_prices(columns)
+    grams = parse_quantities(columns['quantity'])
+    no_price = np.isnan(price)
+    bad_quantity = ~no_price & np.isnan(grams)
+    for i in np.flatnonzero(no_price | bad_quantity):
+        if no_price[i]:
+            warn(f"No valid price found in {columns['name'][i]}")
+        else:
+            warn(f"Invalid quantity format: {columns['quantity'][i]}")
+
+    # Platform validation
+    platform = title_platforms(columns['platform'])
+    valid = ~no_price & ~bad_quantity & isin(platform, PLATFORM_CONFIG)
+    columns, price, grams, platform = select(columns, valid), price[valid], grams[valid], platform[valid]
+    if not len(platform):
+        return []
 
-    return processed
+    titles = clean_titles(columns['name'])
+    logos = {name: config['logo'] for name, config in PLATFORM_CONFIG.items()}
+    delivery_times = {
+        name: '1 day' if config['delivery_time'] == 1440 else f"{config['delivery_time']} mins"
+        for name, config in PLATFORM_CONFIG.items()
+    }
+    return to_records({
+        'title': titles,
+        'platform': platform,
+        'platform_logo': np.array([logos[p] for p in platform], dtype=object),
+        'price': price,
+        'quantity': columns['quantity'],
+        'grams': grams,
+        'image_url': columns['image_url'],
+        'delivery_time': np.array([delivery_times[p] for p in platform], dtype=object),
+        'id': np.array([f"{p}_{hash(img)}_{hash(t)}"
+                        for p, img, t in zip(platform, columns['image_url'], titles)], dtype=object),
+        'sku_id': np.array([item.get('id') for item in columns['item']], dtype=object),
+        'siblings': np.array([tuple(item.get('siblings') or ()) for item in columns['item']], dtype=object),
+        'price_per_g': np.array([round(p, 3) for p in (price / grams).tolist()]),
+    })
 
 
 def display_product_card(item, preferences):
@@ -218,15 +152,19 @@ def display_product_card(item, preferences):
             
             st.markdown(f"**Quantity:** {item['quantity']}")
             st.markdown(f"**Price/g:** ₹{item['price_per_g']:.3f}")
+            if item.get('pack_combination'):
+                st.markdown(f"**Total:** ₹{item['price']:.2f}")
             st.markdown(f"**Delivery Time:** {item['delivery_time']}")
             
         
         with col3:
-            if st.button("❌", key=f"remove_{item['id']}"):
-                if 'removed_ids' not in st.session_state:
-                    st.session_state['removed_ids'] = set()
-                    st.session_state['removed_ids'].add(item['id'])
-                    st.success(f"Removed {item['title']} from cart.")
+            # Runs before the rerun, which then already leaves the item out
+            st.button("❌", key=f"remove_{item['id']}", on_click=remove_product, args=(item,))
+
+
+def remove_product(item):
+    st.session_state.setdefault('removed_ids', set()).add(item['id'])
+    st.toast(f"Removed {item['title']} from cart.")
 
 
 
@@ -259,52 +197,115 @@ def page_2():
     # Initialize cart matrix
     cart_matrix = {platform: [] for platform in allowed_platforms}
     platform_totals = {platform: 0.0 for platform in allowed_platforms}
+    cart_offers = {}
     
+    # One expander per distinct query, filled in as its lookup completes
+    quantities = {}
     for item in cart:
-        # Use product_title instead of title
-        product_query = f"{item['product_title']}".lower().strip()
-        
+        quantities.setdefault(f"{item['product_title']}".lower().strip(), item.get('quantity'))
+    queries = list(quantities)
+
+    memo = get_query_memo()
+    if st.button("🔄 Refresh prices", help="Fetch fresh prices instead of reusing recent results"):
+        for product_query in queries:
+            memo.invalidate(product_query)
+    keys = {product_query: memo.key(product_query, lat=lat, lon=lon, platforms=allowed_platforms)
+            for product_query in queries}
+    memoized = {product_query: memo.get(key) for product_query, key in keys.items()}
+
+    slots = {}
+    for product_query in queries:
         with st.expander(f"🔍 {product_query}", expanded=True):
-            # Get and process data from cache
-            results = process_platform_data(product_query, lat, lon)
-            
-            if not results:
-                st.info("No prices available")
-                continue
-                
-            filtered_df = [
-                item for item in results
-                if item['platform'] in allowed_platforms
-                and item['id'] not in st.session_state.get('removed_ids', set())
-            ]
-            
-            platform_groups = defaultdict(list)
-            for item in filtered_df:
-                platform_groups[item['platform']].append(item)
-            
-            # Get top items for each platform
-            top_items = {}
-            for platform in allowed_platforms:
-                platform_items = sorted(platform_groups.get(platform, []), key=lambda x: x['price_per_g'])[:5]
-                if platform_items:
-                    top_items[platform] = platform_items[0]  # Get the cheapest item
-                    cart_matrix[platform].append(top_items[platform])
-                    platform_totals[platform] += top_items[platform]['price']
-            
-            if not top_items:
-                st.info("No products match your delivery time filter")
-                continue            
-            
-            # Display products in a grid
-            cols = st.columns(2)
-            for idx, (platform, product) in enumerate(top_items.items()):
-                with cols[idx % 2]:
-                    display_product_card(
-                        product, 
-                        delivery
-                    )
-            
-            st.divider()
+            slots[product_query] = st.empty()
+            slots[product_query].caption("⏳ Fetching prices...")
+
+    def show(product_query, results, messages):
+        with slots[product_query].container():
+            for message in messages:
+                st.warning(message)
+            top_items = render_query_results(results, allowed_platforms, delivery, cart_matrix, platform_totals,
+                                             quantities[product_query])
+            if top_items:
+                cart_offers[product_query] = list(top_items.values())
+
+    # Reruns (e.g. after removing a card) only fetch queries missing from the memo
+    for product_query, entry in memoized.items():
+        if entry is not None:
+            show(product_query, *entry)
+
+    pending = [product_query for product_query, entry in memoized.items() if entry is None]
+    if pending and UPSTREAM_CALLER.breaker.state == OPEN:
+        st.warning("The price service is not responding; showing saved prices where available.")
+    deadline = Deadline(CART_DEADLINE_SECONDS)
+    for product_query, data, error in fetch_cart_results(pending, lat, lon, deadline=deadline,
+                                                         platforms=allowed_platforms):
+        if error is not None:
+            show_saved_prices(product_query, error, slots[product_query], show)
+            continue
+        if not isinstance(data, list):
+            with slots[product_query].container():
+                st.error("Invalid API response format")
+            continue
+        messages = []
+        results = process_platform_data(product_query, data, warn=messages.append)
+        memo.set(keys[product_query], (results, messages))
+        show(product_query, results, messages)
+
+    st.session_state['cart_matrix'] = {plat: items for plat, items in cart_matrix.items() if items}
+    st.session_state['platform_totals'] = {plat: total for plat, total in platform_totals.items() if total}
+    st.session_state['cart_offers'] = cart_offers
+
+
+def show_saved_prices(product_query, error, slot, show):
+    """Fall back to the closest saved snapshot after a failed lookup; not memoized, so the next run retries"""
+    index = get_snapshot_index()
+    filename = index.lookup(product_query)
+    if filename is None:
+        with slot.container():
+            st.error(f"Price lookup failed: {str(error)}")
+        return
+    taken_at = datetime.fromisoformat(index.timestamp(filename)).strftime('%d %b %Y %H:%M')
+    messages = [f"Live prices unavailable ({str(error)}); showing saved prices from {taken_at}."]
+    results = process_platform_data(product_query, index.load(filename), warn=messages.append)
+    show(product_query, results, messages)
+
+
+def render_query_results(results, allowed_platforms, delivery, cart_matrix, platform_totals, quantity=None):
+    """Render the cheapest product per platform for one cart query and return them"""
+    if not results:
+        st.info("No prices available")
+        return {}
+        
+    # Get the cheapest item per gram for each platform
+    removed_ids = st.session_state.get('removed_ids', set())
+    top_items = {
+        platform: items[0] for platform, items in top_per_platform(
+            results, allowed_platforms, exclude_ids=removed_ids
+        ).items()
+    }
+    # Cover the billed quantity with the cheapest pack combination where possible
+    top_items.update(combinations_per_platform(
+        [r for r in results if r['id'] not in removed_ids], quantity, list(top_items)
+    ))
+    for platform, product in top_items.items():
+        cart_matrix[platform].append(product)
+        platform_totals[platform] += product['price']
+    
+    if not top_items:
+        st.info("No products match your delivery time filter")
+        return {}
+    
+    # Display products in a grid
+    cols = st.columns(2)
+    for idx, (platform, product) in enumerate(top_items.items()):
+        with cols[idx % 2]:
+            display_product_card(
+                product, 
+                delivery
+            )
+    
+    st.divider()
+    return top_items
 
 if __name__ == "__main__":
     page_2()
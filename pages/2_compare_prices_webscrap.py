@@ -7,6 +7,15 @@ import os
 from PIL import Image
 import io
 from collections import defaultdict
+import numpy as np
+from ranking import (candidate_columns, clean_titles, isin, parse_prices, parse_quantities,
+                     select, title_platforms, to_records, top_per_platform)
+from pack_solver import combinations_per_platform
+from snapshot_index import SnapshotIndex, parse_snapshot_name
+from columnar_store import STORE_DIRNAME, open_store
+from price_history import PriceHistory
+from purchase_history import purchase_history_for
+from query_memo import QueryMemo
 
 
 PLATFORM_CONFIG = {
@@ -20,152 +29,129 @@ PLATFORM_CONFIG = {
 
 
 
-def load_cached_results(product_query):
-    """Load results from cached JSON file in ./data directory"""
-    sanitized_query = re.sub(r'[^a-z0-9]', '', product_query.lower())
-    json_files = [f for f in os.listdir('./data') if f.startswith('qc_') and f.endswith('.json')]
-    if not json_files:
+@st.cache_resource
+def get_snapshot_index():
+    """Snapshot index shared by every session and rerun in this server process"""
+    return SnapshotIndex('./data')
+
+
+@st.cache_resource(max_entries=1)
+def _open_columnar_store(manifest_mtime):
+    return open_store('./data')
+
+
+def get_columnar_store():
+    """Columnar snapshot store if one has been built, reopened when it is rebuilt"""
+    try:
+        manifest_mtime = os.stat(os.path.join('./data', STORE_DIRNAME, 'manifest.json')).st_mtime_ns
+    except FileNotFoundError:
         return None
+    return _open_columnar_store(manifest_mtime)
 
-    best_match = None
-    best_match_score = 0
-
-    for file in json_files:
-        file_product = file.split('_')[1]
-        file_product_clean = re.sub(r'[^a-z0-9]', '', file_product.lower())
-        query_clean = re.sub(r'[^a-z0-9]', '', sanitized_query.lower())
-        query_words = query_clean.split()
-        matching_words = sum(1 for word in query_words if word in file_product_clean)
-        match_score = matching_words
-        if (matching_words >= 2 or query_clean in file_product_clean) and match_score > best_match_score:
-            best_match = file
-            best_match_score = match_score
-
-    if best_match:
-        file_path = os.path.join('./data', best_match)
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            st.error(f"Error reading cache file: {str(e)}")
-            return None
 
-    return None
-def clean_product_name(name, exclude_keywords):
-    """
-    Clean product name using Azure Cognitive Services key phrase extraction
-    and remove exclude keywords.
-    """
+@st.cache_resource(max_entries=1)
+def _ingested_price_history(snapshot_version):
+    history = PriceHistory()
+    history.ingest('./data')
+    return history
+
+
+def get_price_history():
+    """Price history with every snapshot folded in, re-ingested when the snapshot set changes"""
+    index = get_snapshot_index()
+    index.refresh()
+    return _ingested_price_history(index.version)
+
 
-    name_clean = name
-    for kw in exclude_keywords:
-        # Remove keyword as a word or part of a word, case-insensitive
-        name_clean = re.sub(r'\b' + re.escape(kw) + r'\b', '', name_clean, flags=re.IGNORECASE)
-        # Also remove keyword if it's part of a phrase
-        name_clean = re.sub(re.escape(kw), '', name_clean, flags=re.IGNORECASE)
-    # Remove extra spaces
-    name_clean = re.sub(r'\s+', ' ', name_clean)
-    return name_clean.strip()
-
-def parse_quantity(quantity_str):
-    """Convert quantity string to grams with multiplier support"""
+@st.cache_resource
+def get_query_memo():
+    """Per-query results shared by every rerun and session in this server process"""
+    return QueryMemo()
+
+
+def load_cached_results(product_query):
+    """Load results from the best matching snapshot in ./data directory"""
+    best_match = get_snapshot_index().lookup(product_query)
+    if not best_match:
+        return None
+    return load_snapshot(best_match)
+
+
+def load_snapshot(best_match):
+    """Parsed snapshot, from the columnar store when it holds an up-to-date
+    copy and from the raw JSON file otherwise"""
+    index = get_snapshot_index()
     try:
-        # Handle empty or invalid input
-        if not quantity_str or not isinstance(quantity_str, str):
-            return None
-        
-        # Split into quantity and multiplier parts
-        parts = quantity_str.lower().split('x')
-        base_quantity = parts[0].strip()
-        multiplier = float(parts[1].strip()) if len(parts) > 1 else 1.0
-        
-        # Parse base quantity
-        if 'kg' in base_quantity:
-            grams = float(base_quantity.replace('kg', '').strip()) * 1000
-        elif 'g' in base_quantity:
-            grams = float(base_quantity.replace('g', '').strip())
-        else:  # Handle raw numbers assuming grams
-            grams = float(base_quantity.strip())
-        
-        return grams * multiplier
-        
-    except (ValueError, AttributeError, TypeError):
+        store = get_columnar_store()
+        if store is not None and store.covers(best_match, './data'):
+            return store.platform_data(best_match)
+        return index.load(best_match)
+    except Exception as e:
+        st.error(f"Error reading cache file: {str(e)}")
         return None
-def get_price(item):
-    for key in ['offer_price', 'unit_level_price', 'mrp']:
-        val = item.get(key, None)
-        if val is not None:
-            val_str = str(val).strip()
-            if val_str and any(c.isdigit() for c in val_str):
-                try:
-                    # Remove all non-digit/decimal characters (handles â‚¹, commas, etc.)
-                    price = float(re.sub(r'[^\d.]', '', val_str))
-                    return price
-                except Exception:
-                    continue
-    return 0.0
 
+def query_results(product_query):
+    """Processed records for a query, or None without a matching snapshot.
 
-def process_platform_data(data):
-    """Process platform data into standardized format"""
-    processed = []
-    platform_items = defaultdict(list)
-    platform_top_items = {}
+    Memoized on the snapshot file they come from, so reruns and other
+    sessions skip reading and processing it until the file changes.
+    """
+    index = get_snapshot_index()
+    best_match = index.lookup(product_query)
+    if not best_match:
+        return None
+    memo = get_query_memo()
+    key = memo.key(product_query, data_version=(best_match, index.file_version(best_match)))
+    results = memo.get(key)
+    if results is None:
+        cached_data = load_snapshot(best_match)
+        if not cached_data:
+            return None
+        results = memo.set(key, process_platform_data(cached_data))
+    return results
 
-    exclude_keywords = ['special', 'rich', 'flavourful', 'roasted','salted','mini','tasty','healthy','classic','organic','new','soft','fluffy','roti','chakki', 'refined', 'box','combo']
-    
-    for platform in data:
-        for item in platform.get('data', []):
-            try:
-                image_url = next((img for img in item.get('images', []) 
-                                if img.startswith(('http://', 'https://'))), 
-                            'https://via.placeholder.com/100x100.png?text=No+Image')
-
-                # Platform handling
-                platform_name = item.get('platform', {}).get('name', '').title()
-                if not platform_name or platform_name not in PLATFORM_CONFIG:
-                    continue
-
-                # Get price from item, not platform
-                price = get_price(item)
-
-                quantity = item.get('quantity', '')
-                grams = parse_quantity(quantity) or 1
-
-                name = clean_product_name(item.get('name', '').strip().lower(), exclude_keywords)
-                unique_id = f"{name}_{quantity}_{platform_name}"
-                price_per_g = float(price / grams) if grams and price else 0.0
-
-                entry = {
-                    'title': name,
-                    'platform': platform_name,
-                    'platform_logo': PLATFORM_CONFIG[platform_name]['logo'],
-                    'price': price,
-                    'quantity': quantity,
-                    'grams': grams,
-                    'image_url': image_url,
-                    'delivery_time': '1 day' if PLATFORM_CONFIG[platform_name]['delivery_time']==1440 else f"{PLATFORM_CONFIG[platform_name]['delivery_time']} mins",
-                    'price_per_g': price_per_g
-                }
-                
-                platform_items[platform_name].append(entry)
-                current_top = platform_top_items.get(platform_name, {'price_per_g': float('inf')})
 
-                if not platform_top_items.get(platform_name) or price_per_g < current_top['price_per_g']:
-                    platform_top_items[platform_name] = entry
+def first_http_image(item):
+    """First absolute image URL of an item, or a placeholder"""
+    return next((img for img in item.get('images', []) 
+                 if isinstance(img, str) and img.startswith(('http://', 'https://'))), 
+                'https://via.placeholder.com/100x100.png?text=No+Image')
 
-                processed.append(entry)
 
-            except Exception as e:
-                print(f"Debug - Error processing {item.get('name')}: {str(e)}")
-                continue
-        
-        for platform, config in PLATFORM_CONFIG.items():
-            if platform not in platform_items:
-                continue
-            if not any(item['platform'] == platform for item in processed):
-                processed.append(platform_top_items[platform])
-    return processed
+def process_platform_data(data):
+    """Process platform data into standardized format"""
+    columns = candidate_columns(data, image_url=first_http_image)
+
+    # Platform handling
+    platform = title_platforms(columns['platform'])
+    known = isin(platform, PLATFORM_CONFIG)
+    columns, platform = select(columns, known), platform[known]
+    if not len(platform):
+        return []
+
+    # Get price from item, not platform
+    price = np.nan_to_num(parse_prices(columns), nan=0.0)
+    grams = np.nan_to_num(parse_quantities(columns['quantity']), nan=1.0)
+    price_per_g = np.where(price > 0, price / grams, 0.0)
+
+    logos = {name: config['logo'] for name, config in PLATFORM_CONFIG.items()}
+    delivery_times = {
+        name: '1 day' if config['delivery_time'] == 1440 else f"{config['delivery_time']} mins"
+        for name, config in PLATFORM_CONFIG.items()
+    }
+    return to_records({
+        'title': clean_titles(columns['name']),
+        'platform': platform,
+        'platform_logo': np.array([logos[p] for p in platform], dtype=object),
+        'price': price,
+        'quantity': columns['quantity'],
+        'grams': grams,
+        'image_url': columns['image_url'],
+        'delivery_time': np.array([delivery_times[p] for p in platform], dtype=object),
+        'sku_id': np.array([item.get('id') for item in columns['item']], dtype=object),
+        'siblings': np.array([tuple(item.get('siblings') or ()) for item in columns['item']], dtype=object),
+        'price_per_g': price_per_g,
+    })
 
 
 def display_product_card(item, preferences):
@@ -190,10 +176,44 @@ def display_product_card(item, preferences):
             
             st.markdown(f"**Quantity:** {item['quantity']}")
             st.markdown(f"**Price/g:** ₹{item['price_per_g']:.3f}")
+            if item.get('pack_combination'):
+                st.markdown(f"**Total:** ₹{item['price']:.2f}")
             st.markdown(f"**Delivery Time:** {item['delivery_time']}")
             
 
 
+def display_price_history(product_query, item, top_items):
+    """30-day low and median of each offer, and its drop since the item was last bought"""
+    best_match = get_snapshot_index().lookup(product_query)
+    if not best_match:
+        return
+    product = parse_snapshot_name(best_match)[0]
+    try:
+        history = get_price_history()
+        last_bought = purchase_history_for(st).last_purchase(item['product_title'], item.get('brand'))
+        lines = []
+        for platform, offer in top_items.items():
+            # Mixed pack sizes have no single listing whose history applies
+            packs = offer.get('pack_combination')
+            if (packs and len(packs) > 1) or not offer.get('sku_id'):
+                continue
+            count = packs[0][1] if packs else 1
+            stats = history.rolling(product, 30, sku_id=offer['sku_id'])
+            if not stats:
+                continue
+            line = (f"**{platform}:** 30-day low ₹{stats[0]['min_price'] * count:.2f}, "
+                    f"median ₹{stats[0]['median_price'] * count:.2f}")
+            drops = history.price_drops(product, last_bought, sku_id=offer['sku_id']) if last_bought else []
+            if drops:
+                line += f" · ₹{drops[0]['drop'] * count:.2f} cheaper than when you last bought it ({last_bought})"
+            lines.append(line)
+    except Exception as e:
+        st.warning(f"Price history unavailable: {str(e)}")
+        return
+    if lines:
+        st.caption("📉 Price history  \n" + "  \n".join(lines))
+
+
 def page_2():
     st.title("🛒Price Comparison")
     
@@ -220,41 +240,33 @@ def page_2():
 
     cart_matrix = defaultdict(list)
     platform_totals = defaultdict(float)
+    cart_offers = {}
     
     for item in cart:
         product_query = f"{item['product_title']}".lower().strip()
         
         with st.expander(f"🔍 {product_query}", expanded=True):
             # Get and process data from cache
-            cached_data = load_cached_results(product_query)
-            if not cached_data:
+            results = query_results(product_query)
+            if results is None:
                 st.info("No cached data available for this product")
                 continue
-                
-            results = process_platform_data(cached_data)
             
             if not results:
                 st.info("No prices available")
                 continue
                 
-            filtered_df = [
-            item for item in results
-            if item['platform'] in allowed_platforms
-        ]
-
-            
-            platform_groups = defaultdict(list)
-            for item in filtered_df:
-                platform_groups[item['platform']].append(item)
-            
-            # Get top items for each platform
-            top_items = {}
-            for platform in allowed_platforms:
-                platform_items = sorted(platform_groups.get(platform, []), key=lambda x: x['price_per_g'])[:5]
-                if platform_items:
-                    top_items[platform] = platform_items[0]  # Get the cheapest item
-                    cart_matrix[platform].append(top_items[platform])
-                    platform_totals[platform] += top_items[platform]['price']
+            # Get the cheapest item per gram for each platform
+            top_items = {
+                platform: items[0]
+                for platform, items in top_per_platform(results, allowed_platforms).items()
+            }
+            # Cover the billed quantity with the cheapest pack combination where possible
+            top_items.update(combinations_per_platform(results, item.get('quantity'), list(top_items)))
+            for platform, product in top_items.items():
+                cart_matrix[platform].append(product)
+                platform_totals[platform] += product['price']
+            cart_offers[product_query] = list(top_items.values())
             
 
             if not top_items:
@@ -268,11 +280,13 @@ def page_2():
                         product, 
                         delivery
                     )
+            display_price_history(product_query, item, top_items)
             
             st.divider()
     cart_matrix = {plat: items for plat, items in cart_matrix.items() if items}
     st.session_state['cart_matrix'] = cart_matrix
     st.session_state['platform_totals'] = dict(platform_totals)
+    st.session_state['cart_offers'] = {query: offers for query, offers in cart_offers.items() if offers}
 
     if not cart_matrix:
         st.warning("No cart data found for your selected products and filters.")
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from collections import defaultdict
+from cart_optimizer import optimize_cart
 PLATFORM_CONFIG = {
     'Blinkit': {'delivery_time': 15, 'logo': "https://d2chhaxkq6tvay.cloudfront.net/platforms/blinkit.webp"},
     'Zepto': {'delivery_time': 19, 'logo': "https://d2chhaxkq6tvay.cloudfront.net/platforms/zepto.webp"},
@@ -83,6 +84,34 @@ def create_eisenhower_matrix(products):
     )
     return fig, categories
 
+# Page 1 delivery preference -> longest acceptable delivery in minutes
+DELIVERY_MINUTES = {"11-20 minutes": 20, "20 minutes": 20, "45 minutes": 45, "1 day": 1440}
+
+def display_cart_split(cart_offers):
+    """Cheapest split of the cart across platforms, delivery fees included"""
+    st.header("🧮 Best Cart Split")
+    if not cart_offers:
+        st.info("No per-item offers found. Compare prices on Page 2 first.")
+        return
+    delivery = st.session_state.get('preferences', {}).get('delivery_speed', '1 day')
+    max_orders = st.slider("Maximum number of separate orders", 1, len(PLATFORM_CONFIG), 2)
+    result = optimize_cart(
+        cart_offers,
+        {platform: config['delivery_time'] for platform, config in PLATFORM_CONFIG.items()},
+        max_minutes=DELIVERY_MINUTES.get(delivery, 1440),
+        max_orders=max_orders,
+        subscriptions=st.session_state.get('subscriptions', [])
+    )
+    if result['unassigned']:
+        st.warning(f"No offer within your delivery and order limits for: {', '.join(result['unassigned'])}")
+    for platform, order in result['orders'].items():
+        fee = f"₹{order['fee']:.2f} delivery" if order['fee'] else "free delivery"
+        st.markdown(f"**{platform}** — ₹{order['subtotal']:.2f} + {fee}")
+        for query in order['items']:
+            st.markdown(f"- {result['assignment'][query].get('title', query)}")
+    if result['orders']:
+        st.success(f"Total with fees: ₹{result['total']:.2f} across {len(result['orders'])} order(s)")
+
 def render_page_3():
     st.title("🛒 Optimized Cart")
 
@@ -161,6 +190,8 @@ def render_page_3():
             best_platform = df_matrix.loc[df_matrix['total_cost'].idxmin()]
             st.success(f"Best Option: {best_platform['platform']} - ₹{best_platform['total_cost']:.2f} (Delivery in {best_platform['delivery_time_mins']} mins)")
     
+    display_cart_split(st.session_state.get('cart_offers', {}))
+
     # 3. Cart Summary Table
     st.subheader("🛒 Cart Summary")
     cart_data = []
@@ -0,0 +1,305 @@
+"""Price time series folded from the timestamped ``data/qc_*.json`` snapshots.
+
+Every snapshot contributes one observation per listing, keyed by (product,
+platform, SKU id): the product is the snapshot's slug, the SKU the item's
+``id`` (or ``xid``). Observations are rolled up into one row per series and
+day, and for each day into rolling minimum and median prices over
+``ROLLING_WINDOWS`` days, so queries read those aggregates through an index
+and never re-open raw JSON. History outlives the snapshot files: deleting
+an old snapshot does not remove its prices.
+
+Ingestion is incremental. Only new or modified snapshot files are read, and
+only the days they touch (and the rolling windows after them) are
+recomputed. Run it as a job with:
+    python price_history.py [data_dir]
+"""
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from statistics import median
+
+from normalization import get_price, parse_quantity_unit
+from snapshot_index import parse_snapshot_name
+
+PRICE_HISTORY_DB = os.environ.get('PRICE_HISTORY_DB', './data/price_history.sqlite')
+
+# Rolling aggregate windows, in days
+ROLLING_WINDOWS = (7, 30, 90)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    filename TEXT PRIMARY KEY,
+    product TEXT NOT NULL,
+    taken_at TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS series (
+    series_id INTEGER PRIMARY KEY,
+    product TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    sku_id TEXT NOT NULL,
+    name TEXT,
+    brand TEXT,
+    quantity TEXT,
+    amount REAL,
+    unit TEXT,
+    UNIQUE (product, platform, sku_id)
+);
+CREATE TABLE IF NOT EXISTS observations (
+    series_id INTEGER NOT NULL,
+    taken_at TEXT NOT NULL,
+    price REAL NOT NULL,
+    filename TEXT NOT NULL,
+    PRIMARY KEY (series_id, taken_at)
+);
+CREATE INDEX IF NOT EXISTS observations_file ON observations (filename);
+CREATE TABLE IF NOT EXISTS daily_prices (
+    series_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    min_price REAL NOT NULL,
+    max_price REAL NOT NULL,
+    last_price REAL NOT NULL,
+    observations INTEGER NOT NULL,
+    PRIMARY KEY (series_id, day)
+);
+CREATE TABLE IF NOT EXISTS rolling_prices (
+    series_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    window_days INTEGER NOT NULL,
+    min_price REAL NOT NULL,
+    median_price REAL NOT NULL,
+    PRIMARY KEY (series_id, window_days, day)
+);
+"""
+
+
+def snapshot_prices(data):
+    """``{(platform, sku_id): listing}`` for one parsed snapshot, cheapest listing per SKU"""
+    listings = {}
+    for platform_data in data if isinstance(data, list) else []:
+        if not isinstance(platform_data, dict):
+            continue
+        for item in platform_data.get('data', []):
+            if not isinstance(item, dict):
+                continue
+            sku_id = str(item.get('id') or item.get('xid') or '')
+            platform = (item.get('platform') or {}).get('name', '')
+            price = get_price(item)
+            if not sku_id or not platform or price is None:
+                continue
+            key = (platform, sku_id)
+            if key not in listings or price < listings[key]['price']:
+                parsed = parse_quantity_unit(item.get('quantity'))
+                listings[key] = {
+                    'price': price,
+                    'name': item.get('name') or '',
+                    'brand': item.get('brand') or '',
+                    'quantity': item.get('quantity') or '',
+                    'amount': parsed[0] if parsed else None,
+                    'unit': parsed[1] if parsed else None,
+                }
+    return listings
+
+
+def rolling_rows(series_id, days, from_day='', windows=ROLLING_WINDOWS):
+    """Rolling min/median rows for the ``days`` on or after ``from_day``.
+
+    ``days`` are ``(day, min_price)`` pairs in order, starting early enough
+    to fill the longest window.
+    """
+    rows = []
+    ordinals = [date.fromisoformat(day).toordinal() for day, _ in days]
+    first = next((i for i, (day, _) in enumerate(days) if day >= from_day), len(days))
+    for window in sorted(windows):
+        start = 0
+        for i in range(first, len(days)):
+            while ordinals[start] <= ordinals[i] - window:
+                start += 1
+            prices = [price for _, price in days[start:i + 1]]
+            rows.append((series_id, days[i][0], window, min(prices), median(prices)))
+    return rows
+
+
+class PriceHistory:
+    """SQLite-backed price time series with daily and rolling aggregates.
+
+    A connection is opened (and closed) per call, so one instance can be
+    shared across Streamlit sessions and threads.
+    """
+
+    def __init__(self, path=PRICE_HISTORY_DB):
+        self.path = path
+        self._write_lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """A connection that commits on success, rolls back on error and is always closed"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def ingest(self, data_dir='./data'):
+        """Fold new or modified snapshots into the index; returns how many were read"""
+        with self._write_lock, self._connect() as conn:
+            known = {row['filename']: (row['mtime_ns'], row['size'])
+                     for row in conn.execute("SELECT filename, mtime_ns, size FROM snapshots")}
+            affected = {}  # series_id -> earliest day to recompute
+            ingested = 0
+            with os.scandir(data_dir) as entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    parsed = parse_snapshot_name(entry.name)
+                    if parsed is None or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    if known.get(entry.name) == (stat.st_mtime_ns, stat.st_size):
+                        continue
+                    try:
+                        with open(entry.path, 'r', encoding='utf-8') as f:
+                            data = json.load(f)
+                    except (OSError, ValueError) as e:
+                        logging.warning(f"Skipping unreadable snapshot {entry.name}: {str(e)}")
+                        continue
+                    self._ingest_snapshot(conn, entry.name, stat, *parsed, data, affected)
+                    ingested += 1
+            for series_id, day in affected.items():
+                self._recompute(conn, series_id, day)
+        return ingested
+
+    def _ingest_snapshot(self, conn, filename, stat, product, taken_at, data, affected):
+        # A modified file replaces its earlier observations
+        for row in conn.execute("SELECT series_id, taken_at FROM observations WHERE filename = ?", (filename,)):
+            self._mark(affected, row['series_id'], row['taken_at'][:10])
+        conn.execute("DELETE FROM observations WHERE filename = ?", (filename,))
+
+        for (platform, sku_id), listing in snapshot_prices(data).items():
+            conn.execute(
+                "INSERT INTO series (product, platform, sku_id, name, brand, quantity, amount, unit)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (product, platform, sku_id) DO UPDATE SET"
+                " name = excluded.name, brand = excluded.brand, quantity = excluded.quantity,"
+                " amount = excluded.amount, unit = excluded.unit",
+                (product, platform, sku_id, listing['name'], listing['brand'], listing['quantity'],
+                 listing['amount'], listing['unit'])
+            )
+            series_id = conn.execute(
+                "SELECT series_id FROM series WHERE product = ? AND platform = ? AND sku_id = ?",
+                (product, platform, sku_id)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO observations (series_id, taken_at, price, filename) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (series_id, taken_at) DO UPDATE SET price = min(price, excluded.price)",
+                (series_id, taken_at, listing['price'], filename)
+            )
+            self._mark(affected, series_id, taken_at[:10])
+        conn.execute(
+            "INSERT OR REPLACE INTO snapshots (filename, product, taken_at, mtime_ns, size) VALUES (?, ?, ?, ?, ?)",
+            (filename, product, taken_at, stat.st_mtime_ns, stat.st_size)
+        )
+
+    @staticmethod
+    def _mark(affected, series_id, day):
+        if series_id not in affected or day < affected[series_id]:
+            affected[series_id] = day
+
+    def _recompute(self, conn, series_id, from_day):
+        """Rebuild one series' daily rows from ``from_day`` and its rolling rows after that"""
+        conn.execute("DELETE FROM daily_prices WHERE series_id = ? AND day >= ?", (series_id, from_day))
+        conn.execute(
+            "INSERT INTO daily_prices (series_id, day, min_price, max_price, last_price, observations)"
+            " SELECT series_id, substr(taken_at, 1, 10), min(price), max(price),"
+            " (SELECT o2.price FROM observations o2 WHERE o2.series_id = o.series_id"
+            "  AND substr(o2.taken_at, 1, 10) = substr(o.taken_at, 1, 10) ORDER BY o2.taken_at DESC LIMIT 1),"
+            " count(*) FROM observations o WHERE series_id = ? AND taken_at >= ?"
+            " GROUP BY substr(taken_at, 1, 10)",
+            (series_id, from_day)
+        )
+        # Rolling windows ending on or after from_day need the days before it too
+        window_start = (date.fromisoformat(from_day) - timedelta(days=max(ROLLING_WINDOWS))).isoformat()
+        days = [(row['day'], row['min_price']) for row in conn.execute(
+            "SELECT day, min_price FROM daily_prices WHERE series_id = ? AND day > ? ORDER BY day",
+            (series_id, window_start)
+        )]
+        conn.execute("DELETE FROM rolling_prices WHERE series_id = ? AND day >= ?", (series_id, from_day))
+        conn.executemany(
+            "INSERT INTO rolling_prices (series_id, day, window_days, min_price, median_price) VALUES (?, ?, ?, ?, ?)",
+            rolling_rows(series_id, days, from_day)
+        )
+
+    def _series_filter(self, product, platform=None, sku_id=None):
+        clauses, params = ["s.product = ?"], [product]
+        if platform is not None:
+            clauses.append("s.platform = ?")
+            params.append(platform)
+        if sku_id is not None:
+            clauses.append("s.sku_id = ?")
+            params.append(str(sku_id))
+        return ' AND '.join(clauses), params
+
+    def lowest_price(self, product, days=30, platform=None, sku_id=None, as_of=None):
+        """Lowest observed price per series over the ``days`` days up to ``as_of``, cheapest first"""
+        as_of = as_of or date.today()
+        where, params = self._series_filter(product, platform, sku_id)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT s.*, min(d.min_price) AS lowest_price FROM series s"
+                " JOIN daily_prices d ON d.series_id = s.series_id"
+                f" WHERE {where} AND d.day > ? AND d.day <= ?"
+                " GROUP BY s.series_id ORDER BY lowest_price",
+                (*params, (as_of - timedelta(days=days)).isoformat(), as_of.isoformat())
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def rolling(self, product, window_days=30, platform=None, sku_id=None):
+        """Latest price with its rolling min and median over ``window_days``, per series"""
+        if window_days not in ROLLING_WINDOWS:
+            raise ValueError(f"window_days must be one of {ROLLING_WINDOWS}")
+        where, params = self._series_filter(product, platform, sku_id)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT s.*, r.day, d.last_price AS price, r.min_price, r.median_price FROM series s"
+                " JOIN rolling_prices r ON r.series_id = s.series_id AND r.window_days = ?"
+                " AND r.day = (SELECT max(day) FROM rolling_prices WHERE series_id = s.series_id AND window_days = ?)"
+                " JOIN daily_prices d ON d.series_id = s.series_id AND d.day = r.day"
+                f" WHERE {where} ORDER BY r.min_price",
+                (window_days, window_days, *params)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def price_drops(self, product, since, platform=None, sku_id=None):
+        """Series whose latest price is below their price on ``since`` (ISO date), biggest drop first.
+
+        The price "on" a day is the last one observed on or before it;
+        series first seen after ``since`` are left out.
+        """
+        where, params = self._series_filter(product, platform, sku_id)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM (SELECT s.*,"
+                " (SELECT last_price FROM daily_prices WHERE series_id = s.series_id AND day <= ?"
+                "  ORDER BY day DESC LIMIT 1) AS price_then,"
+                " (SELECT last_price FROM daily_prices WHERE series_id = s.series_id"
+                "  ORDER BY day DESC LIMIT 1) AS price_now"
+                f" FROM series s WHERE {where})"
+                " WHERE price_now < price_then ORDER BY price_then - price_now DESC",
+                (since, *params)
+            ).fetchall()
+        return [{**dict(row), 'drop': row['price_then'] - row['price_now']} for row in rows]
+
+
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else './data'
+    history = PriceHistory(os.environ.get('PRICE_HISTORY_DB', os.path.join(data_dir, 'price_history.sqlite')))
+    print(f"Ingested {history.ingest(data_dir)} new or modified snapshots from {data_dir} into {history.path}")
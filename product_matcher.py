@@ -0,0 +1,167 @@
+"""Ranked, typo-tolerant matching of search queries against product listings.
+
+Listings (a product name plus its brand) go into an inverted index from
+tokens to the listings containing them; a second index maps each token's
+character trigrams back to the token. A query token is expanded to the
+indexed tokens it may stand for: itself, tokens it is a prefix of ("dal" ->
+"dalia"), and tokens sharing enough trigrams with it ("jagery" ->
+"jaggery", "chilly" -> "chilli"), each weighted by its similarity.
+Listings are scored with BM25 over the expanded terms, and a listing's
+coverage is the share of query tokens it matched at all.
+"""
+import heapq
+import math
+import re
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Trigram Dice similarity a vocabulary token needs to stand in for a query token
+FUZZY_MIN_SIMILARITY = 0.5
+# Weight of a vocabulary token that the query token is a prefix of
+PREFIX_WEIGHT = 0.8
+# Query tokens shorter than this are only matched exactly or as prefixes
+FUZZY_MIN_LENGTH = 4
+MAX_EXPANSIONS = 8
+
+# Share of query tokens a listing must match to count as a match
+MIN_COVERAGE = 0.75
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of a query, name or slug"""
+    return _TOKEN.findall(str(text).lower())
+
+
+def trigrams(token):
+    padded = f'${token}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def required_terms(count, min_coverage=MIN_COVERAGE):
+    """How many of ``count`` query tokens a listing must match"""
+    return max(1, math.ceil(count * min_coverage - 1e-9)) if count else 0
+
+
+class ProductMatcher:
+    """BM25 index over product listings with typo-tolerant term expansion.
+
+    ``add`` listings, then ``search``. Adding after searching is allowed:
+    new tokens reach the trigram index (and cached query-token expansions
+    are dropped) on the next search.
+    """
+
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._doc_ids = []
+        self._lengths = []
+        self._total_length = 0
+        self._postings = {}   # token -> {doc: term frequency}
+        self._trigrams = {}   # trigram -> set of tokens
+        self._unindexed = []  # tokens not in the trigram index yet
+        self._expansions = {}
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def add(self, doc_id, *texts):
+        """Index one listing made of ``texts`` (e.g. name and brand) under ``doc_id``"""
+        doc = len(self._doc_ids)
+        tokens = [token for text in texts if text for token in tokenize(text)]
+        self._doc_ids.append(doc_id)
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+        postings = self._postings
+        for token in tokens:
+            if token in postings:
+                token_postings = postings[token]
+                token_postings[doc] = token_postings.get(doc, 0) + 1
+            else:
+                postings[token] = {doc: 1}
+                self._unindexed.append(token)
+        return doc
+
+    def _index_trigrams(self):
+        """Trigrams of tokens added since the last expansion; invalidates cached expansions"""
+        for token in self._unindexed:
+            for gram in trigrams(token):
+                self._trigrams.setdefault(gram, set()).add(token)
+        self._unindexed = []
+        self._expansions.clear()
+
+    def expand(self, token):
+        """``[(indexed_token, weight), ...]`` a query token may stand for, best first"""
+        if self._unindexed:
+            self._index_trigrams()
+        cached = self._expansions.get(token)
+        if cached is not None:
+            return cached
+        weights = {}
+        if token in self._postings:
+            weights[token] = 1.0
+        grams = trigrams(token)
+        shared = {}
+        for gram in grams:
+            for candidate in self._trigrams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        for candidate, count in shared.items():
+            if candidate in weights:
+                continue
+            if len(token) >= 3 and candidate.startswith(token):
+                weights[candidate] = PREFIX_WEIGHT
+            elif len(token) >= FUZZY_MIN_LENGTH:
+                similarity = 2 * count / (len(grams) + len(trigrams(candidate)))
+                if similarity >= FUZZY_MIN_SIMILARITY:
+                    weights[candidate] = similarity * PREFIX_WEIGHT
+        expansions = heapq.nlargest(MAX_EXPANSIONS, weights.items(), key=lambda item: item[1])
+        self._expansions[token] = expansions
+        return expansions
+
+    def _idf(self, token):
+        df = len(self._postings[token])
+        return math.log(1 + (len(self._doc_ids) - df + 0.5) / (df + 0.5))
+
+    def score(self, query):
+        """``{doc: (bm25_score, matched_query_tokens)}`` for every listing matching any query token"""
+        if not self._doc_ids:
+            return {}
+        average_length = self._total_length / len(self._doc_ids) or 1.0
+        lengths, k1, b = self._lengths, self.k1, self.b
+        scores = {}
+        for token in dict.fromkeys(tokenize(query)):
+            # A listing counts each query token once, through its best expansion
+            best = {}
+            for term, weight in self.expand(token):
+                idf = weight * self._idf(term)
+                for doc, tf in self._postings[term].items():
+                    contribution = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[doc] / average_length))
+                    if contribution > best.get(doc, 0.0):
+                        best[doc] = contribution
+            for doc, contribution in best.items():
+                score, matched = scores.get(doc, (0.0, 0))
+                scores[doc] = (score + contribution, matched + 1)
+        return scores
+
+    def search(self, query, k=10, min_coverage=MIN_COVERAGE):
+        """Top ``k`` ``(doc_id, score, coverage)`` listings matching enough of the query, best first"""
+        count = len(set(tokenize(query)))
+        required = required_terms(count, min_coverage)
+        hits = [(score, matched, doc) for doc, (score, matched) in self.score(query).items() if matched >= required]
+        best = heapq.nlargest(k, hits, key=lambda hit: (hit[1], hit[0]))
+        return [(self._doc_ids[doc], score, matched / count) for score, matched, doc in best]
+
+
+def match_listings(query, names, brands=None, min_coverage=MIN_COVERAGE):
+    """Whether each listing (name, optional brand) matches enough of ``query``"""
+    if not tokenize(query):
+        return [True] * len(names)
+    matcher = ProductMatcher()
+    for i, name in enumerate(names):
+        matcher.add(i, name if isinstance(name, str) else '', brands[i] if brands is not None else '')
+    required = required_terms(len(set(tokenize(query))), min_coverage)
+    matched = {doc for doc, (_, count) in matcher.score(query).items() if count >= required}
+    return [i in matched for i in range(len(names))]
@@ -0,0 +1,289 @@
+"""Append-only purchase history and incremental consumption forecasts.
+
+Every parsed invoice is appended to a local SQLite database once (keyed by
+the PDF's content hash, so re-uploads are ignored), one row per item with
+the invoice date, brand, pack size, units bought and price. Alongside the
+rows, each item keeps a small forecast state: its last purchase date and
+exponentially weighted averages of the days between purchases and of the
+amount bought each time. Adding an invoice updates only the states of its
+own items, so forecasting never re-reads past bills; an invoice dated
+before an item's last purchase rebuilds just that item from its own rows.
+
+Bills are personal, so each owner gets a database file of their own under
+``PURCHASE_HISTORY_DIR``; see ``history_path``. A signed-in user owns their
+history; without sign-in every session shares one local history (the app's
+usual single-user setup), so multi-user deployments should enable sign-in
+or run one instance per ``PURCHASE_HISTORY_OWNER``. The file is only
+created once an invoice is recorded.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from normalization import parse_quantity_unit
+
+PURCHASE_HISTORY_DIR = os.environ.get('PURCHASE_HISTORY_DIR', './data/purchase_history')
+# Owner of every history when no user is signed in; sessions then share it
+PURCHASE_HISTORY_OWNER = os.environ.get('PURCHASE_HISTORY_OWNER', 'local')
+
+# Weight of the newest purchase in the interval and amount averages
+FORECAST_ALPHA = float(os.environ.get('FORECAST_ALPHA', 0.5))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    invoice_hash TEXT PRIMARY KEY,
+    invoice_date TEXT NOT NULL,
+    source TEXT,
+    added_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS purchases (
+    id INTEGER PRIMARY KEY,
+    invoice_hash TEXT NOT NULL REFERENCES invoices(invoice_hash),
+    invoice_date TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    product_title TEXT NOT NULL,
+    brand TEXT,
+    quantity TEXT,
+    units REAL NOT NULL,
+    amount REAL NOT NULL,
+    unit TEXT NOT NULL,
+    price REAL
+);
+CREATE INDEX IF NOT EXISTS purchases_item ON purchases (item_key, invoice_date);
+CREATE TABLE IF NOT EXISTS item_forecasts (
+    item_key TEXT PRIMARY KEY,
+    product_title TEXT NOT NULL,
+    brand TEXT,
+    unit TEXT NOT NULL,
+    purchases INTEGER NOT NULL,
+    last_date TEXT NOT NULL,
+    last_amount REAL NOT NULL,
+    avg_interval_days REAL,
+    avg_amount REAL NOT NULL
+);
+"""
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def history_path(owner, history_dir=PURCHASE_HISTORY_DIR):
+    """Database file holding one owner's purchases (the owner id is hashed into the name)"""
+    digest = hashlib.sha256(str(owner).encode('utf-8')).hexdigest()[:32]
+    return os.path.join(history_dir, f'{digest}.sqlite')
+
+
+def history_owner(user):
+    """Owner id for a Streamlit ``st.user``: the signed-in account, else ``PURCHASE_HISTORY_OWNER``"""
+    account = user.get('is_logged_in') and (user.get('email') or user.get('sub'))
+    return f'user:{account}' if account else PURCHASE_HISTORY_OWNER
+
+
+def purchase_history_for(st):
+    """The purchase history of the user behind a Streamlit session"""
+    return PurchaseHistory(history_path(history_owner(st.user)))
+
+
+def item_key(product_title, brand=''):
+    """Identity of an item across invoices: brand and title, case and spacing folded"""
+    return _WHITESPACE.sub(' ', f"{brand or ''}|{product_title or ''}".lower()).strip()
+
+
+def purchased_amount(quantity, units):
+    """``(amount, base_unit)`` bought: pack size times units, or a plain count"""
+    units = units or 1
+    parsed = parse_quantity_unit(quantity) if isinstance(quantity, str) and any(c.isalpha() for c in quantity) else None
+    if parsed is None:
+        return float(units), 'count'
+    return parsed[0] * units, parsed[1]
+
+
+def format_amount(amount, unit):
+    """Human readable amount, e.g. ``1.5 kg``, ``750 ml`` or ``3``"""
+    if unit == 'count':
+        return f"{amount:g}"
+    if amount >= 1000:
+        return f"{amount / 1000:g} {'kg' if unit == 'g' else 'l'}"
+    return f"{amount:g} {unit}"
+
+
+def _advance(state, purchase_date, amount, alpha=FORECAST_ALPHA):
+    """Fold one purchase (not earlier than ``state['last_date']``) into a forecast state"""
+    if state['last_date'] == purchase_date:
+        # Same day: the last purchase simply grew
+        state['avg_amount'] += amount if state['purchases'] == 1 else alpha * amount
+        state['last_amount'] += amount
+        return state
+    interval = (date.fromisoformat(purchase_date) - date.fromisoformat(state['last_date'])).days
+    state['avg_interval_days'] = (interval if state['avg_interval_days'] is None
+                                  else alpha * interval + (1 - alpha) * state['avg_interval_days'])
+    state['avg_amount'] = alpha * amount + (1 - alpha) * state['avg_amount']
+    state['purchases'] += 1
+    state['last_date'], state['last_amount'] = purchase_date, amount
+    return state
+
+
+def _new_state(key, row, purchase_date, amount, unit):
+    return {
+        'item_key': key, 'product_title': row['product_title'], 'brand': row.get('brand', ''),
+        'unit': unit, 'purchases': 1, 'last_date': purchase_date, 'last_amount': amount,
+        'avg_interval_days': None, 'avg_amount': amount,
+    }
+
+
+class PurchaseHistory:
+    """One owner's SQLite-backed purchase history with per-item forecast states.
+
+    A connection is opened (and closed) per call, so one instance can be
+    shared across threads. Reads of a history with no invoices yet find
+    nothing without creating the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._write_lock = threading.Lock()
+        self._created = False
+
+    @contextmanager
+    def _connect(self):
+        """A connection that commits on success, rolls back on error and is always closed"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _create(self):
+        if self._created:
+            return
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        self._created = True
+
+    def add_invoice(self, invoice_hash, items, invoice_date=None, source=None):
+        """Append one invoice's items and update their forecasts.
+
+        ``invoice_date`` defaults to the items' own ``invoice_date``, then to
+        today. Returns False (and changes nothing) if the invoice is already
+        recorded.
+        """
+        self._create()
+        with self._connect() as conn:
+            # Reruns re-send the same uploads; answer those without a write transaction
+            if conn.execute("SELECT 1 FROM invoices WHERE invoice_hash = ?", (invoice_hash,)).fetchone():
+                return False
+        invoice_date = (invoice_date or next((i.get('invoice_date') for i in items if i.get('invoice_date')), None)
+                        or date.today().isoformat())
+        # One purchase per item per invoice
+        purchases = {}
+        for item in items:
+            amount, unit = purchased_amount(item.get('quantity'), item.get('units'))
+            key = item_key(item.get('product_title'), item.get('brand'))
+            if key in purchases and purchases[key]['unit'] == unit:
+                purchases[key]['amount'] += amount
+                purchases[key]['units'] += item.get('units') or 1
+                if item.get('price') is not None:
+                    purchases[key]['price'] = (purchases[key]['price'] or 0.0) + item['price']
+            else:
+                purchases[key] = {**item, 'amount': amount, 'unit': unit, 'units': item.get('units') or 1}
+
+        with self._write_lock, self._connect() as conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO invoices (invoice_hash, invoice_date, source, added_at) VALUES (?, ?, ?, ?)",
+                (invoice_hash, invoice_date, source, date.today().isoformat())
+            ).rowcount
+            if not inserted:
+                return False
+            conn.executemany(
+                "INSERT INTO purchases (invoice_hash, invoice_date, item_key, product_title, brand, quantity,"
+                " units, amount, unit, price) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(invoice_hash, invoice_date, key, p.get('product_title'), p.get('brand', ''), p.get('quantity'),
+                  p['units'], p['amount'], p['unit'], p.get('price')) for key, p in purchases.items()]
+            )
+            for key, purchase in purchases.items():
+                self._update_forecast(conn, key, purchase, invoice_date)
+        return True
+
+    def _update_forecast(self, conn, key, purchase, purchase_date):
+        row = conn.execute("SELECT * FROM item_forecasts WHERE item_key = ?", (key,)).fetchone()
+        if row is None:
+            state = _new_state(key, purchase, purchase_date, purchase['amount'], purchase['unit'])
+        elif row['unit'] != purchase['unit'] or purchase_date < row['last_date']:
+            state = self._rebuild_forecast(conn, key)
+        else:
+            state = _advance(dict(row), purchase_date, purchase['amount'])
+        conn.execute(
+            "INSERT OR REPLACE INTO item_forecasts (item_key, product_title, brand, unit, purchases, last_date,"
+            " last_amount, avg_interval_days, avg_amount) VALUES (:item_key, :product_title, :brand, :unit,"
+            " :purchases, :last_date, :last_amount, :avg_interval_days, :avg_amount)",
+            state
+        )
+
+    def _rebuild_forecast(self, conn, key):
+        """Forecast state of one item replayed from its own rows, in date order"""
+        rows = conn.execute(
+            "SELECT * FROM purchases WHERE item_key = ? ORDER BY invoice_date, id", (key,)
+        ).fetchall()
+        # Keep the most recent unit if the item was bought by weight and by count
+        unit = rows[-1]['unit']
+        state = None
+        for row in rows:
+            if row['unit'] != unit:
+                continue
+            if state is None:
+                state = _new_state(key, dict(row), row['invoice_date'], row['amount'], unit)
+            else:
+                _advance(state, row['invoice_date'], row['amount'])
+        return state
+
+    def last_purchase(self, product_title, brand=''):
+        """ISO date an item was last bought, or None"""
+        if not os.path.exists(self.path):
+            return None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT max(invoice_date) FROM purchases WHERE item_key = ?", (item_key(product_title, brand),)
+            ).fetchone()
+        return row[0]
+
+    def forecast(self, horizon_days=30, as_of=None):
+        """Predicted purchases over the next ``horizon_days``, soonest first.
+
+        Each entry has the item's title, brand and unit, ``next_purchase``
+        (None after a single purchase), ``amount_per_purchase`` and
+        ``expected_amount`` over the horizon.
+        """
+        as_of = as_of or date.today()
+        if not os.path.exists(self.path):
+            return []
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM item_forecasts").fetchall()
+        forecasts = []
+        for row in rows:
+            interval = row['avg_interval_days']
+            if interval:
+                cycles = max(1.0, horizon_days / interval)
+                next_purchase = date.fromisoformat(row['last_date']) + timedelta(days=round(interval))
+            else:
+                cycles, next_purchase = 1.0, None
+            forecasts.append({
+                'item_key': row['item_key'],
+                'product_title': row['product_title'],
+                'brand': row['brand'],
+                'unit': row['unit'],
+                'purchases': row['purchases'],
+                'last_purchase': row['last_date'],
+                'next_purchase': next_purchase.isoformat() if next_purchase else None,
+                'due': next_purchase is None or next_purchase <= as_of + timedelta(days=horizon_days),
+                'amount_per_purchase': row['avg_amount'],
+                'expected_amount': row['avg_amount'] * cycles,
+            })
+        forecasts.sort(key=lambda f: (f['next_purchase'] is None, f['next_purchase'] or '', f['product_title']))
+        return forecasts
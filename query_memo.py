@@ -0,0 +1,63 @@
+"""Memo of processed per-query results for the compare pages.
+
+Every widget interaction reruns a Streamlit page from the top, so without a
+memo each rerun re-fetched (or re-read) and re-ranked every cart item. The
+memo keeps each query's processed records, keyed on the normalized query,
+the geohash bucket of the user's location, the platforms the results were
+limited to and the version of the data they came from, and lives for the
+whole server process so reruns and other sessions in the same area share
+it. Entries are bounded by count and size (LRU eviction) and expire after
+``QUERY_MEMO_TTL_SECONDS``.
+
+Invalidation is explicit: ``invalidate(query)`` retires one query's entries
+at every location and version, ``invalidate()`` drops everything.
+"""
+import os
+import threading
+
+from cache_keys import bucket_precision, geohash_encode, normalize_query
+from ttl_cache import TTLCache
+
+QUERY_MEMO_MAX_ENTRIES = int(os.environ.get('QUERY_MEMO_MAX_ENTRIES', 2048))
+QUERY_MEMO_MAX_BYTES = int(os.environ.get('QUERY_MEMO_MAX_BYTES', 128 * 1024 * 1024))
+QUERY_MEMO_TTL_SECONDS = int(os.environ.get('QUERY_MEMO_TTL_SECONDS', 900))
+
+
+class QueryMemo:
+    """Process-wide, size-bounded memo of per-query results"""
+
+    def __init__(self, max_entries=QUERY_MEMO_MAX_ENTRIES, max_bytes=QUERY_MEMO_MAX_BYTES,
+                 ttl=QUERY_MEMO_TTL_SECONDS):
+        self._cache = TTLCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+        # Bumped by invalidate(query); retired entries age out of the LRU
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def key(self, query, data_version=None, lat=None, lon=None, platforms=None):
+        """Memo key for a query; results that do not depend on location pass no coordinates,
+        results fetched for every platform pass no ``platforms``"""
+        normalized = normalize_query(query)
+        bucket = ('' if lat is None or lon is None
+                  else geohash_encode(float(lat), float(lon), bucket_precision(platforms)))
+        platform_set = tuple(sorted({str(p).lower() for p in platforms})) if platforms else None
+        return normalized, bucket, platform_set, data_version, self._generations.get(normalized, 0)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        if key[-1] == self._generations.get(key[0], 0):
+            self._cache.set(key, value)
+        return value
+
+    def invalidate(self, query=None):
+        """Retire one query's results, or every result when no query is given"""
+        if query is None:
+            self._cache.clear()
+            return
+        normalized = normalize_query(query)
+        with self._lock:
+            self._generations[normalized] = self._generations.get(normalized, 0) + 1
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,139 @@
+"""Columnar candidate pipeline for the compare pages.
+
+An upstream response (or snapshot) is flattened once into NumPy columns;
+price and quantity parsing, per-gram prices and the per-platform ranking then
+run on whole arrays instead of one dict at a time. Plain arrays are used
+rather than pandas because a single response holds only tens to hundreds of
+items, where pandas' per-operation overhead outweighs the vectorized work.
+"""
+import numpy as np
+
+from image_extraction import get_image_url
+from normalization import PRICE_KEYS, key_price, to_price, clean_product_name, parse_quantity
+
+CANDIDATE_COLUMNS = ('item', 'name', 'brand', 'platform', 'quantity', 'image_url')
+
+
+def candidate_columns(data, image_url=get_image_url):
+    """Columns of raw item fields, plus the image chosen by ``image_url``.
+
+    The ``item`` column keeps the source dicts for fields that are only read
+    for some rows, such as the fallback price keys.
+    """
+    items = [
+        item
+        for platform_data in (data if isinstance(data, list) else [])
+        if isinstance(platform_data, dict)
+        for item in platform_data.get('data', [])
+        if isinstance(item, dict)
+    ]
+    platforms = [item.get('platform') for item in items]
+    return {name: _object_array(values) for name, values in (
+        ('item', items),
+        ('name', [item.get('name') for item in items]),
+        ('brand', [item.get('brand', '') for item in items]),
+        ('platform', [p.get('name', '') if isinstance(p, dict) else None for p in platforms]),
+        ('quantity', [item.get('quantity') for item in items]),
+        ('image_url', [image_url(item) for item in items]),
+    )}
+
+
+def _object_array(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def select(columns, mask):
+    """Rows of every column where ``mask`` holds"""
+    return {name: values[mask] for name, values in columns.items()}
+
+
+def isin(values, allowed):
+    """Boolean mask of ``values`` found in ``allowed`` (a hash lookup per row, no sort)"""
+    return np.fromiter((v in allowed for v in values), dtype=bool, count=len(values))
+
+
+def _price_array(values):
+    return np.fromiter(
+        (float(v) if type(v) in (int, float) else (np.nan if v is None else (to_price(v) or np.nan))
+         for v in values),
+        dtype=float, count=len(values)
+    )
+
+
+def parse_prices(columns):
+    """First positive price among ``PRICE_KEYS`` per row, NaN when there is none.
+
+    Each fallback key is only read for the rows still missing a price;
+    ``unit_level_price`` rates are scaled to the pack size (``key_price``).
+    """
+    items = columns['item']
+    price = np.full(len(items), np.nan)
+    pending = np.arange(len(items))
+    for key in PRICE_KEYS:
+        if key == 'unit_level_price':
+            values = np.array([key_price(item, key) or np.nan for item in items[pending]] or [], dtype=float)
+        else:
+            values = _price_array([item.get(key) for item in items[pending]])
+        found = values > 0
+        price[pending[found]] = values[found]
+        pending = pending[~found]
+        if not len(pending):
+            break
+    return price
+
+
+def _factorize(values):
+    """``(codes, uniques)`` so that work on ``uniques`` is done once per distinct value"""
+    lookup = {}
+    codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in values), dtype=np.intp, count=len(values))
+    return codes, list(lookup)
+
+
+def parse_quantities(quantities):
+    """Pack sizes in base units, NaN when unparseable; each distinct string is parsed once"""
+    codes, uniques = _factorize(quantities)
+    parsed = np.array([parse_quantity(q) or np.nan for q in uniques] or [np.nan], dtype=float)
+    return parsed[codes] if len(codes) else np.empty(0)
+
+
+def title_platforms(platforms):
+    """Platform names title-cased to match ``PLATFORM_CONFIG``, once per distinct name"""
+    codes, uniques = _factorize(platforms)
+    titled = _object_array([str(p or '').title() for p in uniques])
+    return titled[codes] if len(codes) else _object_array([])
+
+
+def clean_titles(names):
+    """``clean_product_name`` over a column of names, once per distinct name"""
+    codes, uniques = _factorize(names)
+    cleaned = _object_array([clean_product_name(str(n or '').strip().lower()) for n in uniques])
+    return cleaned[codes] if len(codes) else _object_array([])
+
+
+def to_records(columns):
+    """Row dicts, keys in column order, with NumPy scalars turned into Python ones"""
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(columns[name].tolist() for name in names))]
+
+
+def top_per_platform(records, platforms, k=1, exclude_ids=()):
+    """The ``k`` cheapest-per-gram records for each platform, in ``platforms`` order"""
+    codes = {platform: i for i, platform in enumerate(platforms)}
+    platform_codes = np.fromiter((codes.get(r['platform'], -1) for r in records), dtype=np.intp, count=len(records))
+    price_per_g = np.fromiter((r['price_per_g'] for r in records), dtype=float, count=len(records))
+    keep = platform_codes >= 0
+    if exclude_ids:
+        keep &= np.fromiter((r.get('id') not in exclude_ids for r in records), dtype=bool, count=len(records))
+
+    # Sort by platform, then price per gram (stable, so ties keep input order)
+    candidates = np.flatnonzero(keep)
+    order = candidates[np.lexsort((price_per_g[candidates], platform_codes[candidates]))]
+    sorted_codes = platform_codes[order]
+    group_codes, starts, sizes = np.unique(sorted_codes, return_index=True, return_counts=True)
+
+    return {
+        platforms[code]: [records[i] for i in order[start:start + min(k, size)]]
+        for code, start, size in zip(group_codes.tolist(), starts.tolist(), sizes.tolist())
+    }
@@ -0,0 +1,292 @@
+"""Retries, deadlines and a circuit breaker for calls to a flaky upstream.
+
+``ResilientCaller.call`` (``call_async`` for coroutine functions) runs a
+function that may fail transiently:
+
+- failed attempts are retried after a jittered exponential backoff, as
+  long as the retry budget (a token bucket refilled by a share of first
+  attempts) has a token, so retries cannot multiply load on an upstream
+  that is already struggling;
+- every call has a deadline, the earlier of its own request budget and
+  one passed in by the caller (e.g. a whole cart's), and each attempt is
+  given only the time left;
+- consecutive failures open a circuit breaker, which fails calls at once
+  with ``CircuitOpenError`` until a cool-down has passed and a single
+  probe call gets through.
+
+Callers fall back to cached or saved data when a call raises. ``stats()``
+reports breaker state and counters for monitoring.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+
+RETRY_ATTEMPTS = int(os.environ.get('UPSTREAM_RETRY_ATTEMPTS', 3))
+RETRY_BASE_DELAY = float(os.environ.get('UPSTREAM_RETRY_BASE_DELAY_SECONDS', 0.2))
+RETRY_MAX_DELAY = float(os.environ.get('UPSTREAM_RETRY_MAX_DELAY_SECONDS', 2.0))
+# Each first attempt earns this share of a retry; the bucket holds at most RETRY_BUDGET_MAX_TOKENS
+RETRY_BUDGET_RATIO = float(os.environ.get('UPSTREAM_RETRY_BUDGET_RATIO', 0.2))
+RETRY_BUDGET_MAX_TOKENS = float(os.environ.get('UPSTREAM_RETRY_BUDGET_MAX_TOKENS', 10))
+# Time one call may take across all of its attempts and backoffs
+REQUEST_DEADLINE_SECONDS = float(os.environ.get('UPSTREAM_REQUEST_DEADLINE_SECONDS', 12))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('UPSTREAM_BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_SECONDS = float(os.environ.get('UPSTREAM_BREAKER_RESET_SECONDS', 30))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitOpenError(RuntimeError):
+    """The breaker is open; the upstream is not being called"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Upstream circuit open; retrying in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(TimeoutError):
+    """No time was left for another attempt"""
+
+
+class Deadline:
+    """A point in time work must be finished by"""
+
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def within(self, seconds):
+        """This deadline, or one ``seconds`` from now if that comes first"""
+        nearer = Deadline(seconds)
+        return nearer if nearer.expires < self.expires else self
+
+
+def is_retryable(error):
+    """Whether a failed attempt may succeed if repeated.
+
+    Responses with a client error status (other than 408 and 429) would
+    fail the same way again; connection errors, timeouts, server errors and
+    undecodable bodies are worth another try.
+    """
+    response = getattr(error, 'response', None)
+    # requests and httpx errors carry the response, aiohttp's the status
+    status = getattr(response, 'status_code', None) or getattr(error, 'status', None)
+    return status is None or status >= 500 or status in (408, 429)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half open -> closed.
+
+    After ``failure_threshold`` failures in a row it opens and rejects
+    calls for ``reset_timeout`` seconds; then one probe is let through,
+    closing the breaker on success and reopening it on failure.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._stats = {'opened': 0, 'rejected': 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and self._retry_after() <= 0:
+                return HALF_OPEN
+            return self._state
+
+    def _retry_after(self):
+        return self._opened_at + self.reset_timeout - time.monotonic()
+
+    def allow(self):
+        """Admit a call now, or raise ``CircuitOpenError``.
+
+        Returns True when the call is the half-open probe: its outcome must
+        then be recorded, or the probe released with ``release_probe``.
+        """
+        with self._lock:
+            if self._state == OPEN and self._retry_after() <= 0:
+                self._state = HALF_OPEN
+            if self._state == CLOSED or (self._state == HALF_OPEN and not self._probing):
+                self._probing = self._state == HALF_OPEN
+                return self._probing
+            self._stats['rejected'] += 1
+            raise CircuitOpenError(max(0.0, self._retry_after()))
+
+    def release_probe(self):
+        """Let another probe through after one ended without an outcome (e.g. it was cancelled)"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._stats['opened'] += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return dict(self._stats, state=state, consecutive_failures=self._failures)
+
+
+class RetryBudget:
+    """Token bucket capping retries at a share of first attempts"""
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, max_tokens=RETRY_BUDGET_MAX_TOKENS):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """Take a token for one retry; False when the budget is spent"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self):
+        with self._lock:
+            return self._tokens
+
+
+class ResilientCaller:
+    """Retry, deadline and breaker policy around calls to one upstream; safe to share between threads"""
+
+    def __init__(self, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 request_deadline=REQUEST_DEADLINE_SECONDS, breaker=None, budget=None):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_deadline = request_deadline
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget or RetryBudget()
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'successes': 0, 'failures': 0, 'retries': 0,
+                       'retries_denied': 0, 'deadline_exceeded': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def backoff(self, retry):
+        """Full-jitter delay before the ``retry``-th retry (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+    def call(self, fn, *args, deadline=None, **kwargs):
+        """``fn(*args, timeout=seconds_left, **kwargs)`` under the retry, deadline and breaker policy.
+
+        Raises ``CircuitOpenError`` without calling ``fn`` while the breaker
+        is open, ``DeadlineExceeded`` when time runs out between attempts,
+        and otherwise the last attempt's error.
+        """
+        deadline = self._start(deadline)
+        for attempt in range(1, self.attempts + 1):
+            probe = self._admit(deadline)
+            try:
+                result = fn(*args, timeout=deadline.remaining(), **kwargs)
+            except Exception as e:
+                time.sleep(self._retry_delay(e, attempt, deadline))
+            except BaseException:
+                # Interrupted: no verdict on the upstream, but the probe slot must not stay taken
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            else:
+                return self._succeeded(result)
+
+    async def call_async(self, fn, *args, deadline=None, **kwargs):
+        """``call`` for a coroutine function, backing off without blocking the event loop"""
+        deadline = self._start(deadline)
+        for attempt in range(1, self.attempts + 1):
+            probe = self._admit(deadline)
+            try:
+                result = await fn(*args, timeout=deadline.remaining(), **kwargs)
+            except Exception as e:
+                await asyncio.sleep(self._retry_delay(e, attempt, deadline))
+            except BaseException:
+                # Cancelled (host timeout, client gone, wait_for): free the probe slot
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            else:
+                return self._succeeded(result)
+
+    def _start(self, deadline):
+        self._count('calls')
+        self.budget.deposit()
+        return deadline.within(self.request_deadline) if deadline else Deadline(self.request_deadline)
+
+    def _admit(self, deadline):
+        """Raise unless another attempt may start now; True when it is the breaker's probe"""
+        if deadline.expired():
+            self._count('deadline_exceeded')
+            raise DeadlineExceeded("No time left to call the upstream")
+        return self.breaker.allow()
+
+    def _retry_delay(self, error, attempt, deadline):
+        """Backoff before retrying after ``error``; raises it again when no retry is due"""
+        if not is_retryable(error):
+            # The upstream answered; it is up, the request is at fault
+            self.breaker.record_success()
+            self._count('failures')
+            raise error
+        self.breaker.record_failure()
+        if attempt == self.attempts or self.breaker.state == OPEN:
+            self._count('failures')
+            raise error
+        if not self.budget.withdraw():
+            self._count('retries_denied')
+            self._count('failures')
+            raise error
+        delay = self.backoff(attempt)
+        if delay >= deadline.remaining():
+            self._count('deadline_exceeded')
+            self._count('failures')
+            raise error
+        self._count('retries')
+        return delay
+
+    def _succeeded(self, result):
+        self.breaker.record_success()
+        self._count('successes')
+        return result
+
+    def stats(self):
+        """Counters plus breaker state and retry tokens, for metrics reporting"""
+        with self._lock:
+            stats = dict(self._stats)
+        breaker = self.breaker.stats()
+        stats.update({'breaker_state': breaker['state'], 'breaker_opened': breaker['opened'],
+                      'breaker_rejected': breaker['rejected'],
+                      'consecutive_failures': breaker['consecutive_failures'],
+                      'retry_tokens': round(self.budget.tokens, 2)})
+        return stats
@@ -0,0 +1,153 @@
+"""Incremental parsing of QuickCompare responses, keeping only what pricing reads.
+
+A response is a JSON array of groups, ``[{"data": [item, ...]}, ...]``,
+whose items carry HTML snippets, image arrays, deep links and inventory
+details next to the handful of fields the compare page and the function
+use. With ``ijson`` (in requirements.txt) the body is parsed
+incrementally, one group at a time: each group's items are cut down to the
+wanted fields, or dropped when their platform is filtered out, before the
+next group is read, so the full payload never exists in memory. Peak memory
+is then the kept items plus a parser overhead that stays flat as responses
+grow (about 0.15-0.2 MB for 0.5-34 MB bodies in
+``benchmarks/bench_stream_parse.py``); the kept items grow with the
+response, less so with a platform filter. Without ijson the body is decoded
+whole and slimmed the same way afterwards, and a warning is logged once.
+``parse_qc_response_async`` reads async streams.
+
+Either way items come out in the same shape with fewer keys: the HTML
+snippet is replaced by the product image it carries (first in
+``images``), so ``get_image_url`` and the validation code work unchanged.
+"""
+import io
+import json
+import logging
+from itertools import chain
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+    logging.warning("ijson is not installed; upstream responses are decoded whole (pip install ijson)")
+
+from image_extraction import get_image_url
+from normalization import PRICE_KEYS
+
+_PEEK_BYTES = 256
+_CHUNK_BYTES = 64 * 1024
+
+# Scalar item fields read by pricing, ranking and validation
+ITEM_FIELDS = frozenset(('id', 'name', 'brand', 'quantity', 'html') + PRICE_KEYS)
+PLATFORM_FIELDS = frozenset(('name', 'sla'))
+
+
+class ChunkReader:
+    """Binary file interface over an iterator of byte chunks"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def wanted_platforms(platforms):
+    """Lowercased platform names to keep, or None to keep every platform"""
+    return {str(p).lower() for p in platforms} if platforms else None
+
+
+def _finish(item):
+    """Swap the HTML snippet for the image it shows"""
+    image = get_image_url(item)
+    item.pop('html', None)
+    item['images'] = [image] if image else []
+    return item
+
+
+def slim_item(item, wanted=None):
+    """The fields of one decoded item that pricing reads, or None when its platform is not wanted"""
+    platform = item.get('platform')
+    if wanted is not None and str(platform.get('name', '') if isinstance(platform, dict) else '').lower() not in wanted:
+        return None
+    slim = {key: value for key, value in item.items() if key in ITEM_FIELDS}
+    if isinstance(platform, dict):
+        slim['platform'] = {key: value for key, value in platform.items() if key in PLATFORM_FIELDS}
+    images = item.get('images')
+    if isinstance(images, list) and images:
+        slim['images'] = images[:1]
+    if 'siblings' in item:
+        slim['siblings'] = item['siblings']
+    return _finish(slim)
+
+
+def parse_qc_response(source, platforms=None):
+    """Groups of slimmed items from a response body, as ``[{'data': [item, ...]}, ...]``.
+
+    ``source`` is a binary file-like object (e.g. a streamed HTTP body).
+    Items from platforms outside ``platforms`` (case-insensitive; all when
+    None) are dropped, as are groups left empty. Raises ``ValueError`` when
+    the body is not a JSON array, and the parser's own error when it is not
+    valid JSON.
+    """
+    wanted = wanted_platforms(platforms)
+    if ijson is not None:
+        # Groups are built by ijson's C backend one at a time (a group holds
+        # one product's listings), which beats handling every parse event here
+        head = source.read(_PEEK_BYTES)
+        if head.lstrip()[:1] != b'[':
+            raise ValueError("QuickCompare response is not a JSON array")
+        data = ijson.items(ChunkReader(chain([head], iter(lambda: source.read(_CHUNK_BYTES), b''))),
+                           'item', use_float=True)
+    else:
+        data = json.load(source)
+        if not isinstance(data, list):
+            raise ValueError("QuickCompare response is not a JSON array")
+    groups = (slim_group(platform_data, wanted) for platform_data in data)
+    return [group for group in groups if group is not None]
+
+
+async def parse_qc_response_async(source, platforms=None):
+    """``parse_qc_response`` for an async binary stream, such as an aiohttp response's ``content``"""
+    if ijson is None:
+        return parse_qc_response(io.BytesIO(await source.read()), platforms)
+    wanted = wanted_platforms(platforms)
+    head = await source.read(_PEEK_BYTES)
+    if head.lstrip()[:1] != b'[':
+        raise ValueError("QuickCompare response is not a JSON array")
+    groups = []
+    async for platform_data in ijson.items(_AsyncPrepended(head, source), 'item', use_float=True):
+        group = slim_group(platform_data, wanted)
+        if group is not None:
+            groups.append(group)
+    return groups
+
+
+def slim_group(platform_data, wanted=None):
+    """One decoded group with its items slimmed, or None when no wanted item is left"""
+    if not isinstance(platform_data, dict) or not isinstance(platform_data.get('data'), list):
+        return None
+    group = [slim for slim in (slim_item(item, wanted) for item in platform_data['data'] if isinstance(item, dict))
+             if slim is not None]
+    return {'data': group} if group else None
+
+
+class _AsyncPrepended:
+    """Async binary stream that replays ``head`` before reading on from ``source``"""
+
+    def __init__(self, head, source):
+        self._head = head
+        self._source = source
+
+    async def read(self, size=-1):
+        if self._head and size != 0:
+            data, self._head = self._head, b''
+            return data
+        return await self._source.read(size)
@@ -0,0 +1,104 @@
+"""Request coalescing: one in-flight call per key, shared by all callers."""
+import asyncio
+import threading
+from concurrent.futures import Future
+from functools import partial
+
+
+class SingleFlightTimeout(TimeoutError):
+    """A waiter gave up before the in-flight call for its key finished"""
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls that share a key.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait for and share its result or exception.
+    Once the call completes the key is released, so later callers start a
+    fresh call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> Future
+        self._stats = {'leaders': 0, 'coalesced': 0, 'timeouts': 0}
+
+    def do(self, key, fn, *args, timeout=None, **kwargs):
+        """Run ``fn(*args, **kwargs)`` once for all concurrent callers of ``key``.
+
+        Waiters raise ``SingleFlightTimeout`` after ``timeout`` seconds; the
+        leader itself is never cut short.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self._stats['leaders'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if leader:
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise SingleFlightTimeout(f"Timed out waiting for in-flight call {key!r}") from None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
+
+
+class AsyncSingleFlight:
+    """``SingleFlight`` for coroutines sharing one event loop.
+
+    The leader's call runs as a task, so a waiter that times out (or is
+    cancelled) leaves it running for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> Task
+        self._stats = {'leaders': 0, 'coalesced': 0, 'timeouts': 0}
+
+    async def do(self, key, fn, *args, timeout=None, **kwargs):
+        """Await ``fn(*args, **kwargs)`` once for all concurrent callers of ``key``.
+
+        Every caller, the leader included, raises ``SingleFlightTimeout``
+        after ``timeout`` seconds.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self._stats['leaders'] += 1
+            task = self._calls[key] = asyncio.ensure_future(fn(*args, **kwargs))
+            task.add_done_callback(partial(self._release, key))
+        else:
+            self._stats['coalesced'] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            self._stats['timeouts'] += 1
+            raise SingleFlightTimeout(f"Timed out waiting for in-flight call {key!r}") from None
+
+    def _release(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the error seen even if every waiter gave up on it
+            task.exception()
+
+    def stats(self):
+        return dict(self._stats, in_flight=len(self._calls))
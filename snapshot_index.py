@@ -0,0 +1,206 @@
+"""Persistent search index over the ``data/qc_*.json`` price snapshots.
+
+Snapshot files are named ``qc_<product>_<YYYYMMDD_HHMMSS>.json``. The index
+keeps each file's product slug, snapshot timestamp and listings (product
+name and brand), and ranks files for a query with a ``ProductMatcher`` over
+those listings. It is saved next to the snapshots and refreshed
+incrementally: only files whose mtime or size changed are re-read. A lookup
+stats the directory and each indexed file (rewriting a snapshot in place
+leaves the directory mtime alone), and lists the directory only when its
+mtime shows files were added or removed; then it costs a few postings
+probes per query token.
+"""
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+
+from product_matcher import ProductMatcher, tokenize
+from ttl_cache import TTLCache
+
+INDEX_VERSION = 2
+INDEX_FILENAME = '.snapshot_index.json'
+
+_SNAPSHOT_NAME = re.compile(r'^qc_(.+?)_(\d{8}_\d{6})\.json$')
+
+# Added per query token found in the slug the snapshot was scraped for
+# (slugs are squashed, e.g. "fortunesugar", hence substrings)
+SLUG_BONUS = 1.0
+
+
+def parse_snapshot_name(filename):
+    """``(slug, timestamp)`` for a snapshot file name, or None"""
+    match = _SNAPSHOT_NAME.match(filename)
+    if not match:
+        return None
+    slug, stamp = match.groups()
+    return slug, datetime.strptime(stamp, '%Y%m%d_%H%M%S').isoformat()
+
+
+def snapshot_listings(data):
+    """``"brand name"`` of every product in a parsed snapshot"""
+    listings = []
+    for platform_data in data if isinstance(data, list) else []:
+        if not isinstance(platform_data, dict):
+            continue
+        for item in platform_data.get('data', []):
+            if isinstance(item, dict):
+                listings.append(f"{item.get('brand') or ''} {item.get('name') or ''}".strip())
+    return listings
+
+
+class SnapshotIndex:
+    """Ranked snapshot file search with incremental, mtime-based refresh"""
+
+    def __init__(self, data_dir='./data', index_path=None, max_loaded=32):
+        self.data_dir = data_dir
+        self.index_path = index_path or os.path.join(data_dir, INDEX_FILENAME)
+        self._lock = threading.RLock()
+        self._files = {}      # filename -> entry (mtime_ns, size, slug, timestamp, listings)
+        self._matcher = ProductMatcher()
+        self._dir_mtime = None
+        self._generation = 0
+        # Parsed snapshots, keyed by (filename, mtime_ns) so edits invalidate them
+        self._loaded = TTLCache(max_entries=max_loaded, max_bytes=512 * 1024 * 1024, ttl=float('inf'))
+        self._load_index()
+
+    @property
+    def version(self):
+        """Changes whenever a snapshot is added, removed or rewritten"""
+        return self._generation
+
+    def refresh(self, force=False):
+        """Re-index new or modified snapshots and drop deleted ones"""
+        with self._lock:
+            try:
+                dir_mtime = os.stat(self.data_dir).st_mtime_ns
+            except FileNotFoundError:
+                return
+
+            if force or dir_mtime != self._dir_mtime:
+                # Files were added or removed: list the directory
+                with os.scandir(self.data_dir) as entries:
+                    found = {entry.name: (entry.path, entry.stat()) for entry in entries
+                             if parse_snapshot_name(entry.name) is not None and entry.is_file()}
+            else:
+                found = {}
+                for filename in self._files:
+                    path = os.path.join(self.data_dir, filename)
+                    try:
+                        found[filename] = (path, os.stat(path))
+                    except FileNotFoundError:
+                        pass
+
+            changed = False
+            for filename, (path, stat) in found.items():
+                current = self._files.get(filename)
+                if current and current['mtime_ns'] == stat.st_mtime_ns and current['size'] == stat.st_size:
+                    continue
+                self._index_file(filename, path, stat, *parse_snapshot_name(filename))
+                changed = True
+
+            for filename in set(self._files) - set(found):
+                del self._files[filename]
+                changed = True
+
+            if changed:
+                self._generation += 1
+                self._rebuild_matcher()
+                self._save_index()
+            self._dir_mtime = dir_mtime
+
+    def lookup(self, query):
+        """Best snapshot file name for a query, or None.
+
+        A file qualifies with a listing (or its slug) matching enough of the
+        query tokens, allowing for typos. Among those the best coverage
+        wins, then the mean score of the file's listings plus the slug
+        bonus, then the newest snapshot.
+        """
+        self.refresh()
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+
+        with self._lock:
+            coverage, totals = {}, {}
+            for filename, score, listing_coverage in self._matcher.search(query, k=len(self._matcher)):
+                coverage[filename] = max(coverage.get(filename, 0.0), listing_coverage)
+                totals[filename] = totals.get(filename, 0.0) + score
+            if not totals:
+                return None
+
+            def rank(filename):
+                entry = self._files[filename]
+                squashed_slug = ''.join(tokenize(entry['slug']))
+                bonus = SLUG_BONUS * sum(token in squashed_slug for token in set(tokens))
+                # Mean over the file's listings: snapshots scraped for the query are mostly matches
+                return coverage[filename], totals[filename] / (len(entry['listings']) + 1) + bonus, entry['timestamp']
+
+            return max(totals, key=rank)
+
+    def timestamp(self, filename):
+        """ISO timestamp a snapshot was taken at"""
+        return self._files[filename]['timestamp']
+
+    def file_version(self, filename):
+        """Modification time of an indexed snapshot; changes when the file is rewritten"""
+        self.refresh()
+        return self._files[filename]['mtime_ns']
+
+    def load(self, filename):
+        """Parsed snapshot contents, reused until the file changes"""
+        path = os.path.join(self.data_dir, filename)
+        stat = os.stat(path)
+        key = (filename, stat.st_mtime_ns)
+        data = self._loaded.get(key)
+        if data is None:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._loaded.set(key, data, size=stat.st_size)
+        return data
+
+    def _index_file(self, filename, path, stat, slug, timestamp):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                listings = snapshot_listings(json.load(f))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Skipping unreadable snapshot {filename}: {str(e)}")
+            listings = []
+        self._files[filename] = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'slug': slug,
+            'timestamp': timestamp,
+            'listings': listings,
+        }
+
+    def _rebuild_matcher(self):
+        matcher = ProductMatcher()
+        for filename, entry in self._files.items():
+            # The slug is a listing of its own, so a file can match on it alone
+            matcher.add(filename, entry['slug'].replace('_', ' '))
+            for listing in entry['listings']:
+                matcher.add(filename, listing)
+        self._matcher = matcher
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if saved.get('version') == INDEX_VERSION:
+            self._files = saved.get('files', {})
+            self._rebuild_matcher()
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'files': self._files}, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logging.warning(f"Could not save snapshot index: {str(e)}")
@@ -0,0 +1,73 @@
+"""Circuit breaker probes in resilience.py.
+
+Run from the repository root with:
+    python -m unittest discover tests
+"""
+import asyncio
+import unittest
+
+from resilience import HALF_OPEN, CircuitBreaker, CircuitOpenError, ResilientCaller
+
+
+def half_open_caller():
+    """A caller whose breaker has just tripped and is due for a probe"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    return ResilientCaller(attempts=1, request_deadline=5, breaker=breaker)
+
+
+class CancelledProbeTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_cancelled_probe_frees_the_slot(self):
+        caller = half_open_caller()
+        started = asyncio.Event()
+
+        async def hang(timeout=None):
+            started.set()
+            await asyncio.sleep(60)
+
+        async def answer(timeout=None):
+            return 'ok'
+
+        probe = asyncio.ensure_future(caller.call_async(hang))
+        await started.wait()
+        # While the probe is out, other calls are turned away
+        with self.assertRaises(CircuitOpenError):
+            await caller.call_async(answer)
+        probe.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await probe
+
+        self.assertEqual(caller.breaker.state, HALF_OPEN)
+        self.assertEqual(await caller.call_async(answer), 'ok')
+        self.assertEqual(caller.stats()['breaker_state'], 'closed')
+
+    async def test_timed_out_probe_frees_the_slot(self):
+        caller = half_open_caller()
+
+        async def hang(timeout=None):
+            await asyncio.sleep(60)
+
+        async def answer(timeout=None):
+            return 'ok'
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(caller.call_async(hang), 0.01)
+        self.assertEqual(await caller.call_async(answer), 'ok')
+
+
+class InterruptedSyncProbeTest(unittest.TestCase):
+
+    def test_interrupted_probe_frees_the_slot(self):
+        caller = half_open_caller()
+
+        def interrupted(timeout=None):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            caller.call(interrupted)
+        self.assertEqual(caller.call(lambda timeout=None: 'ok'), 'ok')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""Bounded in-process cache with per-entry expiry and LRU eviction."""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def json_size(value):
+    """Approximate in-memory cost of a value by its JSON-encoded length"""
+    return len(json.dumps(value, default=str))
+
+
+class TTLCache:
+    """Thread-safe LRU cache bounded by entry count and total byte size.
+
+    Each entry expires ``ttl`` seconds after it is stored (or after its own
+    ``ttl`` if one is given to ``set``). When either bound is exceeded the
+    least recently used entries are evicted first. Cached values are shared
+    between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=86400, sizeof=json_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key, default=None):
+        """Return a live entry and mark it most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl=None, size=None):
+        """Store a value, evicting least recently used entries to make room"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        size = self.sizeof(value) if size is None else size
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, key):
+        """Drop a single entry if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Counters plus current size, for metrics reporting"""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
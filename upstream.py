@@ -0,0 +1,207 @@
+"""Shared, connection-pooled HTTP client for the QuickCompare upstream.
+
+Every lookup goes to the same ``execute-api`` host, so paying DNS, TCP and
+TLS setup per call is pure overhead. One client per process keeps
+connections alive and reuses them across calls and threads: a
+``requests.Session`` with a sized connection pool, or, when the optional
+``httpx`` package is installed with HTTP/2 support (``pip install
+'httpx[http2]'``), an HTTP/2 client multiplexing concurrent lookups over one
+connection. ``AsyncUpstreamClient`` is the aiohttp counterpart for
+coroutines (``pip install aiohttp``; the async Cosmos client needs it too),
+one per event loop, closed when that loop shuts down.
+
+``fetch_qc_results`` (and ``fetch_qc_results_async``) goes through
+``UPSTREAM_CALLER`` (see resilience.py), which retries with backoff within
+a deadline and trips a circuit breaker when the upstream keeps failing, and
+streams the body through ``response_parser`` so only the fields and
+platforms the caller needs are ever held in memory. Pool sizes, timeouts
+and HTTP/2 are configured through the environment.
+"""
+import asyncio
+import os
+import threading
+from functools import partial
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from resilience import ResilientCaller
+from response_parser import ChunkReader, parse_qc_response, parse_qc_response_async
+
+try:
+    import httpx
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+except ImportError:
+    httpx = None
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+QC_API_URL = os.environ.get('QC_API_URL', "https://yr338c15si.execute-api.ap-south-1.amazonaws.com/getQCResults")
+
+# Connections kept alive per host, and distinct hosts with their own pool
+UPSTREAM_POOL_MAXSIZE = int(os.environ.get('UPSTREAM_POOL_MAXSIZE', 16))
+UPSTREAM_POOL_HOSTS = int(os.environ.get('UPSTREAM_POOL_HOSTS', 4))
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT_SECONDS', 3.05))
+UPSTREAM_READ_TIMEOUT = float(os.environ.get('UPSTREAM_READ_TIMEOUT_SECONDS', 10))
+# Use HTTP/2 when httpx and h2 are installed; set to 0 to force HTTP/1.1
+UPSTREAM_HTTP2 = os.environ.get('UPSTREAM_HTTP2', '1').lower() not in ('0', 'false', 'no')
+
+_client = None
+_client_lock = threading.Lock()
+# Event loop -> (async client, the generator closing it at the loop's shutdown)
+_async_clients = {}
+
+# Retry, deadline and breaker state for the QuickCompare API, shared by every caller in the process
+UPSTREAM_CALLER = ResilientCaller()
+
+
+class UpstreamClient:
+    """Keep-alive HTTP client, safe to share between threads"""
+
+    def __init__(self, pool_maxsize=UPSTREAM_POOL_MAXSIZE, pool_hosts=UPSTREAM_POOL_HOSTS,
+                 connect_timeout=UPSTREAM_CONNECT_TIMEOUT, read_timeout=UPSTREAM_READ_TIMEOUT,
+                 http2=UPSTREAM_HTTP2):
+        self.timeout = (connect_timeout, read_timeout)
+        self.http2 = bool(http2 and httpx is not None)
+        if self.http2:
+            self._client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=pool_maxsize * pool_hosts,
+                                    max_keepalive_connections=pool_maxsize),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            )
+        else:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_maxsize)
+            self._session.mount('https://', adapter)
+            self._session.mount('http://', adapter)
+
+    def get_json(self, url, params=None, timeout=None, parse=None):
+        """GET ``url`` and decode its JSON body; raises on connection errors and HTTP error statuses.
+
+        ``timeout`` (seconds) caps the configured connect and read timeouts.
+        With ``parse``, the body is not decoded whole but streamed into
+        ``parse(binary_file)`` as it arrives, and its result returned.
+        """
+        connect_timeout, read_timeout = self.timeout
+        if timeout is not None:
+            connect_timeout, read_timeout = min(connect_timeout, timeout), min(read_timeout, timeout)
+        if self.http2:
+            with self._client.stream('GET', url, params=params,
+                                     timeout=httpx.Timeout(read_timeout, connect=connect_timeout)) as response:
+                response.raise_for_status()
+                if parse is None:
+                    response.read()
+                    return response.json()
+                return parse(ChunkReader(response.iter_bytes()))
+        # Closing returns a fully read connection to the pool and discards a partly read one
+        with self._session.get(url, params=params, timeout=(connect_timeout, read_timeout),
+                               stream=parse is not None) as response:
+            response.raise_for_status()
+            if parse is None:
+                return response.json()
+            response.raw.decode_content = True
+            return parse(response.raw)
+
+    def close(self):
+        (self._client if self.http2 else self._session).close()
+
+
+class AsyncUpstreamClient:
+    """``UpstreamClient`` for coroutines: one aiohttp session with a keep-alive pool.
+
+    The session belongs to the event loop it was created on; create the
+    client from a coroutine running on that loop, and close it there.
+    """
+
+    def __init__(self, pool_maxsize=UPSTREAM_POOL_MAXSIZE, pool_hosts=UPSTREAM_POOL_HOSTS,
+                 connect_timeout=UPSTREAM_CONNECT_TIMEOUT, read_timeout=UPSTREAM_READ_TIMEOUT):
+        if aiohttp is None:
+            raise RuntimeError("AsyncUpstreamClient needs aiohttp: pip install aiohttp")
+        self.timeout = (connect_timeout, read_timeout)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_maxsize * pool_hosts, limit_per_host=pool_maxsize)
+        )
+
+    async def get_json(self, url, params=None, timeout=None, parse=None):
+        """``UpstreamClient.get_json`` without blocking the loop; ``parse`` is awaited on the async body stream"""
+        connect_timeout, read_timeout = self.timeout
+        if timeout is not None:
+            connect_timeout, read_timeout = min(connect_timeout, timeout), min(read_timeout, timeout)
+        client_timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=connect_timeout, sock_read=read_timeout)
+        async with self._session.get(url, params=params, timeout=client_timeout) as response:
+            response.raise_for_status()
+            if parse is None:
+                return await response.json(content_type=None)
+            return await parse(response.content)
+
+    async def close(self):
+        await self._session.close()
+
+
+def get_client():
+    """Client shared by every caller in this process, created on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = UpstreamClient()
+    return _client
+
+
+async def get_async_client():
+    """Async client shared by the coroutines of the running event loop, created on first use.
+
+    The client is closed when its loop shuts down its async generators, as
+    ``asyncio.run`` does before closing the loop.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        client = AsyncUpstreamClient()
+        closer = _close_at_shutdown(loop, client)
+        _async_clients[loop] = entry = (client, closer)
+        # Runs to the yield, registering the generator with the loop's shutdown
+        await closer.__anext__()
+    return entry[0]
+
+
+async def _close_at_shutdown(loop, client):
+    try:
+        yield
+    finally:
+        _async_clients.pop(loop, None)
+        await client.close()
+
+
+def get_json(url, params=None, timeout=None, parse=None):
+    return get_client().get_json(url, params, timeout, parse)
+
+
+async def get_json_async(url, params=None, timeout=None, parse=None):
+    client = await get_async_client()
+    return await client.get_json(url, params, timeout, parse)
+
+
+def fetch_qc_results(product_query, lat=19.0760, lon=72.8777, deadline=None, platforms=None):
+    """QuickCompare group-search results for a query at a location.
+
+    Items keep only the fields pricing reads (see response_parser.py) and,
+    when ``platforms`` is given, only those platforms. Retried under
+    ``UPSTREAM_CALLER``, finishing by ``deadline`` (a
+    ``resilience.Deadline``) at the latest; raises ``CircuitOpenError`` at
+    once while the upstream is marked unhealthy.
+    """
+    params = {'lat': lat, 'lon': lon, 'type': 'groupsearch', 'query': product_query}
+    return UPSTREAM_CALLER.call(get_json, QC_API_URL, params, deadline=deadline,
+                                parse=partial(parse_qc_response, platforms=platforms))
+
+
+async def fetch_qc_results_async(product_query, lat=19.0760, lon=72.8777, deadline=None, platforms=None):
+    """``fetch_qc_results`` for coroutines, sharing its retry budget and circuit breaker"""
+    params = {'lat': lat, 'lon': lon, 'type': 'groupsearch', 'query': product_query}
+    return await UPSTREAM_CALLER.call_async(get_json_async, QC_API_URL, params, deadline=deadline,
+                                            parse=partial(parse_qc_response_async, platforms=platforms))